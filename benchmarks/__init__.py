@@ -0,0 +1 @@
+# Benchmark suite and synthetic campaign generator (not part of the rda_toolbox package)
@@ -0,0 +1,113 @@
+"""
+Fixtures for the benchmark suite.
+
+Run the benchmarks with `pytest benchmarks/` (statistics via pytest-benchmark, if installed).
+The campaign sizes are selected with the environment variable `RDA_BENCHMARK_SCALES`
+(comma separated, default: "small"), e.g.:
+
+    RDA_BENCHMARK_SCALES=small,medium,large pytest benchmarks/
+"""
+
+import os
+import time
+
+import pytest
+
+from benchmarks.synthetic import make_mic_campaign, make_primary_campaign
+
+# Number of reader files (AcD plates) in brackets
+SCALES = {
+    "small": {
+        "mic": dict(n_substances=94, n_organisms=2, n_replicates=2),  # 12 plates
+        "primary": dict(n_substances=352, n_organisms=2, n_replicates=1),  # 2 plates
+    },
+    "medium": {
+        "mic": dict(n_substances=940, n_organisms=3, n_replicates=2),  # 180 plates
+        "primary": dict(n_substances=35_200, n_organisms=2, n_replicates=1),  # 200 plates
+    },
+    "large": {
+        "mic": dict(n_substances=4_700, n_organisms=4, n_replicates=2),  # 1200 plates
+        "primary": dict(n_substances=176_000, n_organisms=2, n_replicates=1),  # 1000 plates
+    },
+}
+
+
+def _selected_scales() -> list[str]:
+    scales = os.environ.get("RDA_BENCHMARK_SCALES", "small").split(",")
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        raise ValueError(f"Unknown benchmark scale(s) {unknown}, expected: {list(SCALES)}")
+    return scales
+
+
+@pytest.fixture(scope="session", params=_selected_scales())
+def scale(request) -> str:
+    return request.param
+
+
+@pytest.fixture(scope="session")
+def mic_campaign(scale, tmp_path_factory):
+    return make_mic_campaign(
+        str(tmp_path_factory.mktemp(f"mic_{scale}")),
+        result_tables=["Results", "Read 2"],
+        n_datasets=2,
+        precipitation=True,
+        **SCALES[scale]["mic"],
+    )
+
+
+@pytest.fixture(scope="session")
+def primary_campaign(scale, tmp_path_factory):
+    return make_primary_campaign(
+        str(tmp_path_factory.mktemp(f"primary_{scale}")),
+        n_datasets=2,
+        precipitation=True,
+        **SCALES[scale]["primary"],
+    )
+
+
+try:
+    import pytest_benchmark  # noqa: F401
+except ImportError:
+
+    class _SimpleBenchmark:
+        """
+        Minimal stand-in for the `benchmark` fixture of pytest-benchmark:
+        runs the function (once per round) and reports the fastest round.
+        """
+
+        def __init__(self):
+            self.timings: list[float] = []
+
+        def __call__(self, func, *args, **kwargs):
+            return self.pedantic(func, args=args, kwargs=kwargs)
+
+        def pedantic(self, func, args=(), kwargs=None, setup=None, rounds=1, iterations=1, warmup_rounds=0):
+            result = None
+            for _ in range(rounds):
+                round_args, round_kwargs = args, kwargs or {}
+                if setup is not None:
+                    setup_result = setup()
+                    if setup_result is not None:
+                        round_args, round_kwargs = setup_result
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    result = func(*round_args, **round_kwargs)
+                self.timings.append((time.perf_counter() - start) / iterations)
+            return result
+
+    _timings: dict[str, float] = {}
+
+    @pytest.fixture
+    def benchmark(request):
+        bench = _SimpleBenchmark()
+        yield bench
+        if bench.timings:
+            _timings[request.node.nodeid] = min(bench.timings)
+
+    def pytest_terminal_summary(terminalreporter):
+        if _timings:
+            terminalreporter.write_sep("-", "benchmarks (pytest-benchmark not installed, fastest round)")
+            for nodeid, seconds in _timings.items():
+                terminalreporter.write_line(f"{seconds:10.4f} s  {nodeid}")
+
@@ -0,0 +1,511 @@
+#!/usr/bin/env python3
+"""
+Synthetic campaign generator.
+
+Writes the same kind of files the lab produces for a real campaign so that the
+toolbox can be exercised (and timed) at arbitrary scale:
+
+- Cytation C10 reader files (one per AcD plate, optionally with several result
+  tables and sporadic OVRFLW tokens)
+- an Input.xlsx (Substances, Organisms, Dilutions, Controls)
+- the barcode reader mappingfiles (MP -> AsT and AsT -> AcD)
+- optionally precipitation reader files
+
+Example:
+    ```Python
+    from benchmarks.synthetic import make_mic_campaign
+
+    campaign = make_mic_campaign("/tmp/mic", n_substances=320, n_organisms=3, n_replicates=2)
+    mic = rda.MIC(**campaign.mic_kwargs())
+    ```
+"""
+
+import math
+import os
+import pathlib
+import string
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+ROWS_384 = list(string.ascii_uppercase[:16])
+COLS_384 = list(range(1, 25))
+ROWS_96 = list(string.ascii_uppercase[:8])
+COLS_96 = list(range(1, 13))
+
+DEFAULT_CONCENTRATIONS = [50.0, 25.0, 12.5, 6.25, 3.13, 1.56, 0.78, 0.39, 0.2, 0.1, 0.05]
+NEGATIVE_CONTROL = "Bacteria + Medium"
+BLANK = "Medium"
+REFERENCES = [
+    "Amphotericin B",
+    "Voriconazole",
+    "Cefepime",
+    "Chloramphenicol",
+    "Doxycycline",
+    "Linezolid",
+    "Rifampicin",
+    "Vancomycin",
+]
+
+
+@dataclass
+class SyntheticCampaign:
+    """
+    Paths and parameters of a generated campaign.
+    """
+
+    root: str
+    rawfiles_folderpath: str
+    inputfile_path: str
+    mappingfile_paths: dict[str, str]
+    precipitation_rawfilepath: str | None = None
+    resultmatrix_header_mapping: dict[str, str] = field(
+        default_factory=lambda: {"Results": "Optical Density"}
+    )
+    n_plates: int = 0
+
+    def mic_kwargs(self) -> dict:
+        return {
+            "rawfiles_folderpath": self.rawfiles_folderpath,
+            "inputfile_path": self.inputfile_path,
+            "mp_ast_mapping_filepath": self.mappingfile_paths["MP_AsT"],
+            "ast_acd_mapping_filepath": self.mappingfile_paths["AsT_AcD"],
+            "precipitation_rawfilepath": self.precipitation_rawfilepath,
+            "cyt10_matrixheader_mapping": self.resultmatrix_header_mapping,
+        }
+
+    def primary_kwargs(self) -> dict:
+        return {
+            "rawfiles_folderpath": self.rawfiles_folderpath,
+            "inputfile_path": self.inputfile_path,
+            "mappingfile_path": self.mappingfile_paths["AsT_AcD"],
+            "needs_mapping": False,
+            "precipitation_rawfilepath": self.precipitation_rawfilepath,
+            "cyt10_matrixheader_mapping": self.resultmatrix_header_mapping,
+        }
+
+
+def _barcode(prefix: str, campaign_nr: int, plate_nr: int) -> str:
+    # Matches the reader barcode regex: three digits, assay code, two digits, three digits
+    return f"{campaign_nr:03d}{prefix}{(plate_nr // 1000) + 1:02d}{plate_nr % 1000:03d}"
+
+
+def write_readerfile(
+    path: str,
+    barcode: str,
+    tables: dict[str, np.ndarray],
+    overflow_mask: np.ndarray | None = None,
+    read_label: str = "600",
+) -> None:
+    """
+    Write a single Cytation C10 reader file (384-well plate) with one block per result table.
+    `overflow_mask` marks wells written as OVRFLW in every table.
+    """
+    lines = [
+        "Software Version;3.14.03",
+        "Experiment File Path:;C:\\Experiments\\synthetic.xpt",
+        "Protocol File Path:;C:\\Protocols\\synthetic.prt",
+        "Plate Number;Plate 1",
+        "Date;2025-01-01",
+        "Time;12:00:00",
+        "Reader Type:;Cytation C10",
+        "Reader Serial Number:;00000000",
+        "Reading Type;Reader",
+        "Plate Type;384 WELL PLATE",
+        f"Barcode;{barcode}",
+        "",
+    ]
+    for header, values in tables.items():
+        lines.append(header)
+        lines.append(";" + ";".join(map(str, COLS_384)))
+        for row_idx, row in enumerate(ROWS_384):
+            tokens = []
+            for col_idx in range(len(COLS_384)):
+                if overflow_mask is not None and overflow_mask[row_idx, col_idx]:
+                    tokens.append("OVRFLW")
+                else:
+                    tokens.append(f"{values[row_idx, col_idx]:.3f}")
+            lines.append(f"{row};" + ";".join(tokens) + f";{header} {read_label}")
+        lines.append("")
+    with open(path, "w") as fh:
+        fh.write("\n".join(lines) + "\n")
+
+
+def write_mappingfile(path: str, mapping: list[tuple[str, list[str]]]) -> None:
+    """
+    Write a barcode reader mappingfile (mother barcode line followed by child barcodes line).
+    """
+    with open(path, "w") as fh:
+        for mother, children in mapping:
+            fh.write(f"{mother}\n{';'.join(children)}\n")
+
+
+def _controls_df() -> pd.DataFrame:
+    negative = [
+        ("Negative Control", NEGATIVE_CONTROL, f"{row}23") for row in ROWS_384[::2]
+    ]
+    blanks = [("Blank", BLANK, f"{row}24") for row in ROWS_384]
+    references = [
+        ("Reference", ref, f"{row}23") for ref, row in zip(REFERENCES, ROWS_384[1::2])
+    ]
+    return pd.DataFrame(
+        negative + blanks + references, columns=["Dataset", "Internal ID", "Position"]
+    )
+
+
+def _organisms_df(n_organisms: int) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "Organism": [
+                f"Organism {string.ascii_uppercase[i % 26]}{i // 26 or ''} ST{1000 + i}"
+                for i in range(n_organisms)
+            ],
+            "Rack": list(range(1, n_organisms + 1)),
+        }
+    )
+
+
+def write_inputfile(
+    path: str,
+    substances: pd.DataFrame,
+    organisms: pd.DataFrame,
+    dilutions: pd.DataFrame,
+    controls: pd.DataFrame,
+) -> None:
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        substances.to_excel(writer, sheet_name="Substances", index=False)
+        organisms.to_excel(writer, sheet_name="Organisms", index=False)
+        dilutions.to_excel(writer, sheet_name="Dilutions", index=False)
+        controls.to_excel(writer, sheet_name="Controls", index=False)
+
+
+def _plate_values(
+    rng: np.random.Generator,
+    inhibition: np.ndarray,
+    controls: pd.DataFrame,
+    negative_od: float = 0.9,
+    blank_od: float = 0.05,
+    noise: float = 0.02,
+) -> np.ndarray:
+    """
+    Optical densities for a single plate, `inhibition` is a (16, 24) array in [0, 1].
+    """
+    values = blank_od + (negative_od - blank_od) * (1.0 - inhibition)
+    for _, control in controls.iterrows():
+        row = ROWS_384.index(control["Position"][0])
+        col = int(control["Position"][1:]) - 1
+        if control["Internal ID"] == BLANK:
+            values[row, col] = blank_od
+        elif control["Internal ID"] == NEGATIVE_CONTROL:
+            values[row, col] = negative_od
+        else:
+            values[row, col] = blank_od * 1.5
+    return np.clip(values + rng.normal(0, noise, values.shape), 0.001, None)
+
+
+def _write_rawfiles(
+    rng: np.random.Generator,
+    folder: pathlib.Path,
+    plates: list[tuple[str, np.ndarray]],
+    controls: pd.DataFrame,
+    result_tables: list[str],
+    overflow_fraction: float,
+) -> None:
+    folder.mkdir(parents=True, exist_ok=True)
+    for acd_barcode, inhibition in plates:
+        tables = {
+            header: _plate_values(rng, inhibition, controls) * (1 + 0.5 * i)
+            for i, header in enumerate(result_tables)
+        }
+        overflow_mask = None
+        if overflow_fraction > 0:
+            overflow_mask = rng.random((len(ROWS_384), len(COLS_384))) < overflow_fraction
+            # never overflow the controls, otherwise normalization can break
+            overflow_mask[:, 22:] = False
+        write_readerfile(
+            str(folder / f"Synthetic_{acd_barcode}.txt"),
+            acd_barcode,
+            tables,
+            overflow_mask=overflow_mask,
+        )
+
+
+def _write_precipitation(
+    rng: np.random.Generator,
+    folder: pathlib.Path,
+    acd_barcodes: list[str],
+    precipitation_fraction: float = 0.05,
+) -> None:
+    folder.mkdir(parents=True, exist_ok=True)
+    for acd_barcode in acd_barcodes:
+        values = rng.normal(0.04, 0.002, (len(ROWS_384), len(COLS_384)))
+        precipitated = rng.random(values.shape) < precipitation_fraction
+        precipitated[:, 23] = False  # column 24 is the default background
+        values[precipitated] += rng.uniform(0.1, 0.6, precipitated.sum())
+        write_readerfile(
+            str(folder / f"Precipitation_{acd_barcode}.txt"),
+            acd_barcode,
+            {"Results": values},
+        )
+
+
+def make_mic_campaign(
+    outdir: str,
+    n_substances: int = 96,
+    n_organisms: int = 2,
+    n_replicates: int = 2,
+    n_datasets: int = 1,
+    result_tables: list[str] | None = None,
+    concentrations: list[float] | None = None,
+    overflow_fraction: float = 0.001,
+    active_fraction: float = 0.2,
+    references_per_motherplate: int = 2,
+    precipitation: bool = False,
+    seed: int = 0,
+) -> SyntheticCampaign:
+    """
+    Generate a MIC campaign: substances on 96-well motherplates are split onto
+    three AsT plates per motherplate (11 concentrations each) and every AsT plate
+    is stamped onto one AcD plate per organism and replicate.
+    """
+    rng = np.random.default_rng(seed)
+    root = pathlib.Path(outdir)
+    root.mkdir(parents=True, exist_ok=True)
+    result_tables = result_tables or ["Results"]
+    concentrations = concentrations or DEFAULT_CONCENTRATIONS
+    # only 11 dilution columns fit next to the controls in columns 23/24
+    concentrations = concentrations[:11]
+
+    positions_96 = [f"{row}{col}" for col in COLS_96 for row in ROWS_96]
+    # the last wells of every motherplate hold reference substances
+    substance_positions = positions_96[: len(positions_96) - references_per_motherplate]
+    n_motherplates = max(1, math.ceil(n_substances / len(substance_positions)))
+    substance_rows = []
+    for i in range(n_substances):
+        mp_nr, pos_nr = divmod(i, len(substance_positions))
+        substance_rows.append(
+            {
+                "Dataset": f"Dataset {(i % n_datasets) + 1}",
+                "External ID": f"EXT-{i:06d}",
+                "Internal ID": f"SUB{i:06d}",
+                "Origin Rack": mp_nr + 1,
+                "Origin Position 96": substance_positions[pos_nr],
+                "MP Barcode 96": f"55{mp_nr:08d}",
+                "MP Position 96": substance_positions[pos_nr],
+            }
+        )
+    for mp_nr in range(n_motherplates):
+        for ref_nr, position in enumerate(positions_96[len(substance_positions) :]):
+            reference = REFERENCES[ref_nr % len(REFERENCES)]
+            substance_rows.append(
+                {
+                    "Dataset": "Reference",
+                    "External ID": reference,
+                    "Internal ID": reference,
+                    "Origin Rack": mp_nr + 1,
+                    "Origin Position 96": position,
+                    "MP Barcode 96": f"55{mp_nr:08d}",
+                    "MP Position 96": position,
+                }
+            )
+    substances = pd.DataFrame(substance_rows)
+    organisms = _organisms_df(n_organisms)
+    dilutions = pd.DataFrame({"Concentration": concentrations, "Unit": "µM"})
+    controls = _controls_df()
+    inputfile_path = str(root / "MIC_Input.xlsx")
+    write_inputfile(inputfile_path, substances, organisms, dilutions, controls)
+
+    # MP -> AsT: each third of a motherplate (4 columns) goes to its own AsT plate
+    mp_ast = []
+    ast_nr = 1
+    ast_of_position: dict[tuple[str, str], str] = {}
+    for mp_barcode, mp_grp in substances.groupby("MP Barcode 96", sort=False):
+        ast_barcodes = [_barcode("AsT", 1, ast_nr + third) for third in range(3)]
+        ast_nr += 3
+        mp_ast.append((mp_barcode, ast_barcodes))
+        for _, substance in mp_grp.iterrows():
+            col_96 = int(substance["MP Position 96"][1:])
+            position = (mp_barcode, substance["MP Position 96"])
+            ast_of_position[position] = ast_barcodes[(col_96 - 1) // 4]
+    mappingfile_paths = {
+        "MP_AsT": str(root / "MP_AsT_mapping.txt"),
+        "AsT_AcD": str(root / "AsT_AcD_mapping.txt"),
+    }
+    write_mappingfile(mappingfile_paths["MP_AsT"], mp_ast)
+
+    # AsT -> AcD: one line per replicate, one AcD barcode per organism (rack)
+    # every AsT plate of a motherplate is stamped, even if (partially) empty
+    used_ast = [ast for _, ast_barcodes in mp_ast for ast in ast_barcodes]
+    ast_acd = []
+    acd_nr = 1
+    acd_of_ast: dict[str, list[str]] = {ast: [] for ast in used_ast}
+    for _replicate in range(n_replicates):
+        for ast in used_ast:
+            acd_barcodes = [_barcode("AcD", 1, acd_nr + org) for org in range(n_organisms)]
+            acd_nr += n_organisms
+            ast_acd.append((ast, acd_barcodes))
+            acd_of_ast[ast].extend(acd_barcodes)
+    write_mappingfile(mappingfile_paths["AsT_AcD"], ast_acd)
+
+    # Inhibition per AsT plate: active substances inhibit above their MIC,
+    # references are always active (with a different MIC each)
+    log_conc = np.log2(np.asarray(concentrations, dtype=float))
+    inhibition_of_ast = {
+        ast: np.zeros((len(ROWS_384), len(COLS_384))) for ast in acd_of_ast
+    }
+    for _, substance in substances.iterrows():
+        row_96 = ROWS_96.index(substance["MP Position 96"][0])
+        col_in_third = (int(substance["MP Position 96"][1:]) - 1) % 4
+        # the four 96-well columns of a third are interleaved on the AsT plate (Z order)
+        row_idx = 2 * row_96 + col_in_third // 2
+        col_offset = col_in_third % 2
+        if substance["Dataset"] == "Reference":
+            ref_nr = REFERENCES.index(substance["Internal ID"])
+            fraction = (ref_nr + 0.5) / len(REFERENCES)
+            mic = log_conc.min() + fraction * (log_conc.max() - log_conc.min())
+        elif rng.random() < active_fraction:
+            mic = rng.uniform(log_conc.min(), log_conc.max())
+        else:
+            continue
+        curve = 1 / (1 + np.exp(-4 * (log_conc - mic)))
+        ast = ast_of_position[(substance["MP Barcode 96"], substance["MP Position 96"])]
+        inhibition_of_ast[ast][row_idx, col_offset : col_offset + 2 * len(concentrations) : 2] = curve
+    plates = [
+        (acd, inhibition_of_ast[ast])
+        for ast, acd_barcodes in acd_of_ast.items()
+        for acd in acd_barcodes
+    ]
+
+    rawfolder = root / "raw"
+    _write_rawfiles(rng, rawfolder, plates, controls, result_tables, overflow_fraction)
+
+    precipitation_folder = None
+    if precipitation:
+        precipitation_folder = root / "precipitation"
+        _write_precipitation(
+            rng, precipitation_folder, [acds[0] for acds in acd_of_ast.values()]
+        )
+
+    return SyntheticCampaign(
+        root=str(root),
+        rawfiles_folderpath=str(rawfolder),
+        inputfile_path=inputfile_path,
+        mappingfile_paths=mappingfile_paths,
+        precipitation_rawfilepath=str(precipitation_folder) if precipitation_folder else None,
+        resultmatrix_header_mapping={
+            header: ("Optical Density" if i == 0 else f"Measurement {i + 1}")
+            for i, header in enumerate(result_tables)
+        },
+        n_plates=len(plates),
+    )
+
+
+def make_primary_campaign(
+    outdir: str,
+    n_substances: int = 320,
+    n_organisms: int = 2,
+    n_replicates: int = 1,
+    n_datasets: int = 1,
+    result_tables: list[str] | None = None,
+    overflow_fraction: float = 0.001,
+    active_fraction: float = 0.05,
+    precipitation: bool = False,
+    seed: int = 0,
+) -> SyntheticCampaign:
+    """
+    Generate a primary screen campaign: substances are placed (already mapped)
+    on 384-well AsT plates at a single concentration, columns 23/24 hold controls.
+    """
+    rng = np.random.default_rng(seed)
+    root = pathlib.Path(outdir)
+    root.mkdir(parents=True, exist_ok=True)
+    result_tables = result_tables or ["Results"]
+
+    positions = [f"{row}{col}" for col in range(1, 23) for row in ROWS_384]
+    n_ast = max(1, math.ceil(n_substances / len(positions)))
+    ast_barcodes = [_barcode("AsT", 2, i + 1) for i in range(n_ast)]
+    substance_rows = []
+    for i in range(n_substances):
+        ast_idx, pos_nr = divmod(i, len(positions))
+        substance_rows.append(
+            {
+                "Dataset": f"Dataset {(i % n_datasets) + 1}",
+                "External ID": f"EXT-{i:06d}",
+                "Internal ID": f"SUB{i:06d}",
+                "AsT Barcode 384": ast_barcodes[ast_idx],
+                "AsT Position 384": positions[pos_nr],
+            }
+        )
+    substances = pd.DataFrame(substance_rows)
+    organisms = _organisms_df(n_organisms)
+    dilutions = pd.DataFrame(
+        {
+            "Dataset": [f"Dataset {i + 1}" for i in range(n_datasets)]
+            + ["Negative Control", "Blank", "Reference"],
+            "Concentration": 10.0,
+            "Unit": "µM",
+        }
+    )
+    controls = _controls_df()
+    inputfile_path = str(root / "PrS_Input.xlsx")
+    write_inputfile(inputfile_path, substances, organisms, dilutions, controls)
+
+    ast_acd = []
+    acd_nr = 1
+    plates = []
+    for _replicate in range(n_replicates):
+        for ast in ast_barcodes:
+            acd_barcodes = [_barcode("AcD", 2, acd_nr + org) for org in range(n_organisms)]
+            acd_nr += n_organisms
+            ast_acd.append((ast, acd_barcodes))
+            inhibition = np.zeros((len(ROWS_384), len(COLS_384)))
+            inhibition[:, :22] = rng.random((len(ROWS_384), 22)) < active_fraction
+            plates.extend((acd, inhibition) for acd in acd_barcodes)
+    mappingfile_paths = {"AsT_AcD": str(root / "AsT_AcD_mapping.txt")}
+    write_mappingfile(mappingfile_paths["AsT_AcD"], ast_acd)
+
+    rawfolder = root / "raw"
+    _write_rawfiles(rng, rawfolder, plates, controls, result_tables, overflow_fraction)
+
+    precipitation_folder = None
+    if precipitation:
+        precipitation_folder = root / "precipitation"
+        _write_precipitation(
+            rng, precipitation_folder, [acds[0] for _, acds in ast_acd[:n_ast]]
+        )
+
+    return SyntheticCampaign(
+        root=str(root),
+        rawfiles_folderpath=str(rawfolder),
+        inputfile_path=inputfile_path,
+        mappingfile_paths=mappingfile_paths,
+        precipitation_rawfilepath=str(precipitation_folder) if precipitation_folder else None,
+        resultmatrix_header_mapping={
+            header: ("Optical Density" if i == 0 else f"Measurement {i + 1}")
+            for i, header in enumerate(result_tables)
+        },
+        n_plates=len(plates),
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    argparser = argparse.ArgumentParser(description="Generate a synthetic campaign.")
+    argparser.add_argument("outdir")
+    argparser.add_argument("--assay", choices=["mic", "primary"], default="mic")
+    argparser.add_argument("--substances", type=int, default=96)
+    argparser.add_argument("--organisms", type=int, default=2)
+    argparser.add_argument("--replicates", type=int, default=2)
+    argparser.add_argument("--precipitation", action="store_true")
+    args = argparser.parse_args()
+    make = make_mic_campaign if args.assay == "mic" else make_primary_campaign
+    campaign = make(
+        os.path.abspath(args.outdir),
+        n_substances=args.substances,
+        n_organisms=args.organisms,
+        n_replicates=args.replicates,
+        precipitation=args.precipitation,
+    )
+    print(f"Wrote {campaign.n_plates} plates to {campaign.root}")
@@ -0,0 +1,24 @@
+"""
+Import time of the package (startup cost of CLI tools and worker processes).
+"""
+
+import subprocess
+import sys
+
+import pytest
+
+
+@pytest.mark.parametrize(
+    "statement",
+    [
+        "import rda_toolbox",
+        "from rda_toolbox import parse_readerfiles, preprocess",
+        "from rda_toolbox import MIC",
+        "from rda_toolbox import plateheatmaps",
+    ],
+)
+def test_import_time(benchmark, statement):
+    # A fresh interpreter per round, imports are cached within a process
+    benchmark.pedantic(
+        subprocess.run, args=([sys.executable, "-c", statement],), kwargs={"check": True}, rounds=3
+    )
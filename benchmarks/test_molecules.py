@@ -0,0 +1,60 @@
+"""
+Benchmarks of the molecule conversions (InChI and structure images) of a synthetic compound library.
+"""
+
+import pytest
+
+import pandas as pd
+
+from rda_toolbox.molecules import MoleculeCache, molecule_identifiers, molecule_images
+from rda_toolbox.utility import to_excel_molimages
+
+Chem = pytest.importorskip("rdkit.Chem")
+
+LIBRARY_SIZES = {"small": 200, "medium": 5_000, "large": 50_000}
+
+
+@pytest.fixture(scope="session")
+def compound_library(scale):
+    # Unique chains like CCN...CO...C
+    return [
+        Chem.MolFromSmiles(f"{'C' * (i % 25 + 1)}N{'C' * (i // 25 % 25 + 1)}O{'C' * (i // 625 + 1)}")
+        for i in range(LIBRARY_SIZES[scale])
+    ]
+
+
+@pytest.mark.parametrize("n_jobs", [1, 4])
+def test_molecule_identifiers(benchmark, compound_library, n_jobs):
+    identifiers = benchmark.pedantic(
+        molecule_identifiers, args=(compound_library,), kwargs={"n_jobs": n_jobs}, rounds=1
+    )
+    assert all(inchi_key for _, inchi_key in identifiers)
+
+
+@pytest.mark.parametrize("n_jobs", [1, 4])
+def test_molecule_images(benchmark, compound_library, n_jobs):
+    images = benchmark.pedantic(
+        molecule_images, args=(compound_library,), kwargs={"n_jobs": n_jobs}, rounds=1
+    )
+    assert all(images)
+
+
+def test_molecule_images_cached(benchmark, compound_library, tmp_path):
+    cache = MoleculeCache(tmp_path / "molecules.sqlite")
+    molecule_images(compound_library, cache=cache)
+    images = benchmark(molecule_images, compound_library, cache=cache)
+    assert all(images)
+
+
+def test_export_hitlist_with_images(benchmark, compound_library, tmp_path):
+    # Every structure appears for several organisms
+    hits = pd.DataFrame(
+        {
+            "mol": compound_library * 4,
+            "ID": [f"E{i % len(compound_library)}" for i in range(4 * len(compound_library))],
+            "Organism": [f"Organism {i // len(compound_library)}" for i in range(4 * len(compound_library))],
+        }
+    )
+    filepath = tmp_path / "hits.xlsx"
+    benchmark.pedantic(to_excel_molimages, args=(hits, str(filepath), ["ID", "Organism"]), rounds=1)
+    assert filepath.is_file()
@@ -0,0 +1,150 @@
+"""
+Benchmarks of the pipeline steps (parsing, mapping, preprocessing, B-scores, MIC determination,
+figures and export) on synthetic campaigns, see conftest.py for the scales.
+"""
+
+import pytest
+
+from rda_toolbox.experiment_classes import MIC, PrimaryScreen
+from rda_toolbox.parser import parse_readerfiles
+from rda_toolbox.process import add_b_score, preprocess
+from rda_toolbox.utility import _save_figures, _save_tables
+
+
+def _recompute(experiment, *attributes):
+    """
+    Drops cached stages/properties so that the next access recomputes them.
+    """
+    for attribute in attributes:
+        experiment.__dict__.pop(attribute, None)
+    return experiment
+
+
+@pytest.fixture(scope="session")
+def mic_experiment(mic_campaign):
+    return MIC(**mic_campaign.mic_kwargs()).run(until="mic")
+
+
+@pytest.fixture(scope="session")
+def primary_experiment(primary_campaign):
+    return PrimaryScreen(**primary_campaign.primary_kwargs()).run(until="processed")
+
+
+def test_parse_readerfiles(benchmark, mic_campaign):
+    rawdata, _ = benchmark(
+        parse_readerfiles,
+        mic_campaign.rawfiles_folderpath,
+        resultmatrix_header_mapping=mic_campaign.resultmatrix_header_mapping,
+    )
+    assert len(rawdata) == mic_campaign.n_plates * 384 * len(mic_campaign.resultmatrix_header_mapping)
+
+
+def test_precipitation(benchmark, mic_experiment):
+    precipitation = mic_experiment.precipitation
+    results = benchmark.pedantic(
+        lambda: _recompute(
+            precipitation, "results", "_background", "limit_of_quantification", "limits_of_quantification"
+        ).results,
+        rounds=1,
+    )
+    assert "Precipitated" in results
+
+
+def test_mic_mapping(benchmark, mic_experiment):
+    mapped = benchmark.pedantic(
+        lambda: _recompute(mic_experiment, "mapped_input_df").mapped_input_df,
+        rounds=3,
+    )
+    assert not mapped.empty
+
+
+def test_primary_mapping(benchmark, primary_experiment):
+    mapped = benchmark.pedantic(
+        lambda: _recompute(primary_experiment, "mapped_input_df").mapped_input_df,
+        rounds=3,
+    )
+    assert not mapped.empty
+
+
+def test_preprocess(benchmark, mic_experiment):
+    processed = benchmark(
+        preprocess,
+        mic_experiment.mapped_input_df,
+        substance_id="Internal ID",
+        negative_controls=mic_experiment._negative_controls,
+        blanks=mic_experiment._blanks,
+        norm_by_barcode="AcD Barcode 384",
+    )
+    assert len(processed) == len(mic_experiment.processed)
+
+
+def test_b_scores(benchmark, primary_experiment):
+    processed = primary_experiment.processed
+    plates = processed[
+        ~processed["Internal ID"].isin([primary_experiment._negative_controls, primary_experiment._blanks])
+        & (processed["Measurement Type"] == next(iter(primary_experiment._measurement_labels)))
+    ]
+
+    def b_scores():
+        return plates.groupby("AcD Barcode 384")[
+            ["AcD Barcode 384", "Row_384", "Col_384", "Measurement"]
+        ].apply(lambda plate: add_b_score(plate, measurement_header="Measurement"))
+
+    assert "Measurement b_scores" in benchmark(b_scores)
+
+
+def test_mic_determination(benchmark, mic_experiment):
+    mic_df = benchmark(lambda: _recompute(mic_experiment, "mic_df").mic_df)
+    assert not mic_df.empty
+
+
+def test_mic_figures(benchmark, mic_experiment):
+    figures = benchmark.pedantic(
+        lambda: _recompute(mic_experiment, "_resultfigures")._resultfigures,
+        rounds=1,
+    )
+    assert figures
+
+
+def test_primary_figures(benchmark, primary_experiment):
+    figures = benchmark.pedantic(
+        lambda: _recompute(primary_experiment, "_resultfigures")._resultfigures,
+        rounds=1,
+    )
+    assert figures
+
+
+@pytest.mark.parametrize(
+    "fileformat, workbook_per_dataset",
+    [("xlsx", False), ("xlsx", True), ("csv", False), ("parquet", False)],
+)
+def test_export_tables(benchmark, mic_experiment, tmp_path, fileformat, workbook_per_dataset):
+    resulttables = mic_experiment.run(until="results")._resulttables
+    benchmark.pedantic(
+        _save_tables,
+        args=(str(tmp_path), resulttables),
+        kwargs={"fileformats": [fileformat], "workbook_per_dataset": workbook_per_dataset},
+        rounds=1,
+    )
+    assert any(tmp_path.rglob(f"*.{fileformat}"))
+
+
+@pytest.mark.parametrize("n_jobs", [1, 4])
+@pytest.mark.parametrize("fileformat", ["svg", "html"])
+def test_export_figures(benchmark, mic_experiment, tmp_path, fileformat, n_jobs):
+    resultfigures = mic_experiment.run(until="figures")._resultfigures
+    benchmark.pedantic(
+        _save_figures,
+        args=(str(tmp_path), resultfigures),
+        kwargs={"fileformats": [fileformat], "n_jobs": n_jobs},
+        rounds=1,
+    )
+    assert any(tmp_path.rglob(f"*.{fileformat}"))
+
+
+def test_raster_plateheatmaps(benchmark, mic_experiment, tmp_path):
+    mic_experiment.run(until="processed")
+    filepaths = benchmark.pedantic(
+        mic_experiment.save_raster_plateheatmaps, args=(str(tmp_path),), rounds=1
+    )
+    assert filepaths
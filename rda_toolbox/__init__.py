@@ -3,34 +3,64 @@
 # expose functions here to be able to:
 # import rda_toolbox as rda
 # rda.readerfiles_to_df()
+#
+# The submodules are imported lazily on first attribute access (PEP 562),
+# `import rda_toolbox` does not import Altair, RDKit or SciPy.
 
-from .parser import (
-        readerfiles_metadf,
-        readerfiles_rawdf,
-        process_inputfile,
-        parse_readerfiles,
-        parse_mappingfile,
-        )
-
-from .plot import (
-        plateheatmaps,
-        UpSetAltair,
-        lineplots_facet,
-        mic_hitstogram,
-        )
-
-from .process import (
-        preprocess,
-        mic_results,
-        primary_process_inputs,
-        )
-
-from .utility import (
-        mapapply_96_to_384,
-        )
-
-from .experiment_classes import(
-        Precipitation,
-        PrimaryScreen,
-        MIC,
-)
+import importlib
+
+_LAZY_ATTRIBUTES = {
+    # parser
+    "readerfiles_metadf": "parser",
+    "readerfiles_rawdf": "parser",
+    "process_inputfile": "parser",
+    "parse_readerfiles": "parser",
+    "parse_mappingfile": "parser",
+    # plot
+    "plateheatmaps": "plot",
+    "UpSetAltair": "plot",
+    "lineplots_facet": "plot",
+    "mic_hitstogram": "plot",
+    # process
+    "preprocess": "process",
+    "mic_results": "process",
+    "primary_process_inputs": "process",
+    # utility
+    "mapapply_96_to_384": "utility",
+    "FigureBudget": "utility",
+    # experiment_classes
+    "Precipitation": "experiment_classes",
+    "PrimaryScreen": "experiment_classes",
+    "MIC": "experiment_classes",
+}
+
+_SUBMODULES = {
+    "cache",
+    "experiment_classes",
+    "marimo",
+    "molecules",
+    "parser",
+    "plot",
+    "process",
+    "profiling",
+    "raster",
+    "utility",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name: str):
+    if name in _LAZY_ATTRIBUTES:
+        module = importlib.import_module(f".{_LAZY_ATTRIBUTES[name]}", __name__)
+        value = getattr(module, name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(f".{name}", __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value  # only resolve once
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES) | _SUBMODULES)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Persistent (disk) cache for the stages of an experiment.
+
+Stage outputs (DataFrames or tuples of DataFrames) are stored as Parquet files
+in a folder per stage, keyed by a hash of everything the stage depends on
+(file contents, parameters, the keys of upstream stages and the toolbox code).
+Writing Parquet files requires `pyarrow`.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+import uuid
+import warnings
+from importlib.metadata import version, PackageNotFoundError
+
+import numpy as np
+import pandas as pd
+
+
+def file_digest(filepath: str | os.PathLike, chunksize: int = 1 << 20) -> str:
+    """
+    sha256 hex digest of the contents of a file.
+    """
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as file:
+        for chunk in iter(lambda: file.read(chunksize), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _fingerprint_path(path: pathlib.Path) -> str:
+    if path.is_file():
+        return f"file:{file_digest(path)}"
+    if path.is_dir():
+        # Only the files directly in the folder (like parse_readerfiles)
+        files = sorted(child for child in path.iterdir() if child.is_file())
+        return "dir:" + ";".join(f"{child.name}={file_digest(child)}" for child in files)
+    return f"missing:{path}"
+
+
+def _fingerprint_df(df: pd.DataFrame) -> str:
+    try:
+        hashed = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    except TypeError:  # unhashable objects, e.g. RDKit molecules
+        hashed = pd.util.hash_pandas_object(df.astype(str), index=True).to_numpy()
+    return f"df:{list(df.columns)}:{hashlib.sha256(hashed.tobytes()).hexdigest()}"
+
+
+def fingerprint(obj) -> str:
+    """
+    Returns a string describing `obj` for hashing.
+    Paths (`pathlib.Path`) are described by the contents of the file (or the files in the folder),
+    DataFrames by their values, containers recursively and everything else by its `repr`.
+    """
+    if isinstance(obj, pathlib.Path):
+        return _fingerprint_path(obj)
+    if isinstance(obj, pd.DataFrame):
+        return _fingerprint_df(obj)
+    if isinstance(obj, dict):
+        return "{" + ",".join(f"{key!r}:{fingerprint(value)}" for key, value in obj.items()) + "}"
+    if isinstance(obj, (list, tuple)):
+        return "[" + ",".join(fingerprint(value) for value in obj) + "]"
+    return repr(obj)
+
+
+def _toolbox_version() -> str:
+    try:
+        return version("rda-toolbox")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+@functools.cache
+def _toolbox_code_digest() -> str:
+    """
+    Hash of the source files of the toolbox, so that editable installs do not load outputs of older code.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(pathlib.Path(__file__).parent.rglob("*.py")):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+class StageCache:
+    """
+    Disk cache for experiment stages in `cache_dir`.
+
+    Each entry is a folder `<cache_dir>/<stage>/<key>/` with one Parquet file per DataFrame.
+    Entries are written to a temporary folder first and renamed afterwards,
+    so interrupted runs never leave incomplete entries behind.
+    """
+
+    def __init__(self, cache_dir: str | os.PathLike):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as exc:
+            raise ImportError(
+                "The stage cache stores Parquet files and requires 'pyarrow' (pip install pyarrow)."
+            ) from exc
+        self.cache_dir = pathlib.Path(cache_dir)
+
+    def key(self, stage: str, inputs: dict) -> str:
+        """
+        Hash of the stage name, the toolbox version and source code and all inputs of the stage.
+        """
+        description = f"{_toolbox_version()}|{_toolbox_code_digest()}|{stage}|{fingerprint(inputs)}"
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    def _entry_dir(self, stage: str, key: str) -> pathlib.Path:
+        return self.cache_dir / stage / key
+
+    def load(self, stage: str, key: str) -> pd.DataFrame | tuple[pd.DataFrame, ...] | None:
+        """
+        Returns the cached output of a stage or None if there is no (readable) entry.
+        """
+        entry_dir = self._entry_dir(stage, key)
+        meta_path = entry_dir / "meta.json"
+        if not meta_path.is_file():
+            return None
+        try:
+            with open(meta_path) as file:
+                meta = json.load(file)
+            parts = []
+            for i, object_columns in enumerate(meta["object_columns"]):
+                part = pd.read_parquet(entry_dir / f"part-{i}.parquet")
+                # Parquet has no object dtype, restore it (strings would be read as str dtype)
+                # and use NaN for missing values (read as None)
+                for column in object_columns:
+                    values = part[column].astype(object)
+                    part[column] = values.where(values.notna(), np.nan)
+                parts.append(part)
+        except Exception as exc:
+            warnings.warn(
+                f"Could not read cached stage '{stage}' ({exc}), recomputing it.",
+                RuntimeWarning,
+                stacklevel=2,
+            )
+            return None
+        return tuple(parts) if meta["tuple"] else parts[0]
+
+    def store(self, stage: str, key: str, value) -> bool:
+        """
+        Stores the output of a stage (a DataFrame or a tuple of DataFrames).
+        Outputs that can not be written as Parquet are not cached (with a warning).
+        Returns whether the output was cached.
+        """
+        is_tuple = isinstance(value, tuple)
+        parts = list(value) if is_tuple else [value]
+        if not all(isinstance(part, pd.DataFrame) for part in parts):
+            return False
+        entry_dir = self._entry_dir(stage, key)
+        tmp_dir = entry_dir.parent / f".tmp-{uuid.uuid4().hex}"
+        try:
+            tmp_dir.mkdir(parents=True)
+            for i, part in enumerate(parts):
+                part.to_parquet(tmp_dir / f"part-{i}.parquet")
+            with open(tmp_dir / "meta.json", "w") as file:
+                json.dump(
+                    {
+                        "stage": stage,
+                        "parts": len(parts),
+                        "tuple": is_tuple,
+                        "object_columns": [
+                            [column for column, dtype in part.dtypes.items() if dtype == object]
+                            for part in parts
+                        ],
+                    },
+                    file,
+                )
+            if entry_dir.exists():  # e.g. written concurrently by another run
+                shutil.rmtree(tmp_dir)
+            else:
+                os.replace(tmp_dir, entry_dir)
+        except Exception as exc:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            warnings.warn(
+                f"Could not cache stage '{stage}' ({exc}).",
+                RuntimeWarning,
+                stacklevel=2,
+            )
+            return False
+        return True
+
+    def clear(self, stage: str | None = None) -> None:
+        """
+        Removes all cached entries (of a single stage if `stage` is given).
+        """
+        shutil.rmtree(
+            self.cache_dir if stage is None else self.cache_dir / stage, ignore_errors=True
+        )
@@ -1,12 +1,14 @@
 #!/usr/bin/env python
 
 import pandas as pd
-import altair as alt
+import fnmatch
+import functools
 from functools import cached_property
 from dataclasses import dataclass
 import numpy as np
 import logging
-from typing import Optional, List, Dict
+from collections.abc import Callable, Sequence
+from typing import Optional, List, Dict, TYPE_CHECKING
 
 import warnings
 
@@ -14,19 +16,23 @@ import os
 import pathlib
 
 import string
+import time
 
 
 from .utility import (
     get_rows_cols,
     position_to_rowcol,
     mapapply_96_to_384,
-    get_upsetplot_df,
+    get_upset_intersections,
     get_mapping_dict,
     add_precipitation,
     _save_tables,
     _save_figures,
+    FigureBudget,
     mic_assaytransfer_mapping,
-    get_minimum_precipitation_conc,
+    expand_mic_layout,
+    map_primary_layout,
+    minimum_precipitation_concentrations,
     check_activity_conditions,
     split_position,
     add_molecule_data
@@ -38,23 +44,51 @@ from .parser import (
     read_platemapping,
 )
 from .process import preprocess, get_thresholded_subset, add_b_score
-from .plot import (
-    plateheatmaps,
-    UpSetAltair,
-    lineplots_facet,
-    potency_distribution,
-    measurement_vs_bscore_scatter,
-    ChartLike,
-    get_zfactor_heatmap,
-)
+from .cache import StageCache, _toolbox_version
+from .molecules import MoleculeCache
+from .profiling import StageProfiler, count_rows
+
+# .plot (Altair) is imported where the figures are built, importing the experiments stays cheap
+if TYPE_CHECKING:
+    from .plot import ChartLike
 
 logger = logging.getLogger(__name__)
 
+
+def stage(name: str):
+    """
+    Decorator for the pipeline stages of an experiment.
+    A stage is computed lazily on first access and cached afterwards (like `cached_property`).
+    All stages are computed via `Experiment._compute_stage`.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self):
+            return self._compute_stage(name, func)
+
+        return cached_property(wrapper)
+
+    return decorator
+
+
+def _as_path(path: str | None) -> pathlib.Path | None:
+    return None if not path else pathlib.Path(path)
+
+
 class Experiment:
     """
     Superclass for all experiments.
     Reads rawdata into a DataFrame.
 
+    All intermediate results (rawdata, mapped input, processed data, results, ...)
+    are computed lazily on first access and cached afterwards.
+    Use `run(until=...)` to compute the pipeline stages explicitly up to a given stage.
+    If `cache_dir` is given, the stage outputs are additionally cached on disk (as Parquet files)
+    and reused by later runs as long as the input files and parameters of a stage did not change.
+    Identifiers and images of molecules are cached there as well (see `molecules.MoleculeCache`).
+    Time, memory (with `trace_memory`) and row counts of each stage are recorded in `profile`.
+
     Attributes
     ----------
     rawdata : pd.DataFrame
@@ -62,6 +96,8 @@ class Experiment:
 
     Methods
     ----------
+    run
+        Compute the pipeline stages up to (and including) a given stage
     save_plots
         Save all the resulting plots to figuredir
     save_tables
@@ -70,24 +106,261 @@ class Experiment:
         Save all plots and tables to resultdir
     """
 
+    # Pipeline stages in order of computation like {stage name: attribute}
+    _stages: Dict[str, str] = {"rawdata": "rawdata"}
+    # Prefix of the stage names in the profile (e.g. for the precipitation test of an assay)
+    _profile_prefix: str = ""
+    # File name of the plate heatmaps figure of a measurement ("{measurement}" is replaced),
+    # None if the experiment has no plate heatmaps (no raster fallback)
+    _plateheatmaps_file_basename: str | None = None
+
     def __init__(
         self,
         rawfiles_folderpath: Optional[str],
         plate_type: int,
         resultmatrix_header_mapping: Dict[str, str] = {"Results": "Optical Density"},
+        cache_dir: str | None = None,
+        trace_memory: bool = False,
     ):
         self._plate_type = plate_type
         self._rows, self._columns = get_rows_cols(plate_type)
         self._rawfiles_folderpath = rawfiles_folderpath
+        self._resultmatrix_header_mapping = resultmatrix_header_mapping
+        self._stage_cache = None if cache_dir is None else StageCache(cache_dir)
+        # InChIs and structure images are reused across runs (and stages which are not cached)
+        self._molecule_cache = (
+            None if cache_dir is None else MoleculeCache(os.path.join(cache_dir, "molecules.sqlite"))
+        )
+        self._profiler = StageProfiler(trace_memory=trace_memory)
+
+    @property
+    def stages(self) -> List[str]:
+        """
+        Names of the pipeline stages in order of computation.
+        """
+        return list(self._stages)
+
+    def run(self, until: str | None = None):
+        """
+        Computes the pipeline stages in order up to (and including) stage `until`
+        (all stages if `until` is None) and returns the experiment.
+        Already computed stages are not computed again.
+
+        Example: `mic.run(until="mapped")` only parses the rawdata and maps the inputfile,
+        e.g. to validate the inputs before processing.
+        """
+        stages = self.stages
+        if until is None:
+            until = stages[-1]
+        if until not in self._stages:
+            raise ValueError(
+                f"Unknown stage '{until}', expected one of: {', '.join(stages)}"
+            )
+        for stage_name in stages[: stages.index(until) + 1]:
+            getattr(self, self._stages[stage_name])
+        return self
+
+    def _compute_stage(self, name: str, func):
+        with self._profiler.stage(self._profile_prefix + name) as record:
+            if self._stage_cache is None or self._stage_inputs(name) is None:
+                value = func(self)
+            else:
+                key = self._stage_key(name)
+                value = self._stage_cache.load(name, key)
+                record["from_cache"] = value is not None
+                if value is None:
+                    value = func(self)
+                    self._stage_cache.store(name, key, value)
+            record["rows"] = count_rows(value)
+        return value
+
+    @property
+    def profile(self) -> pd.DataFrame:
+        """
+        Wall time, CPU time, peak memory (if traced, see `trace_memory`) and number of rows
+        of every computed stage (including saving the results) in order of completion.
+        """
+        return self._profiler.to_frame()
+
+    def save_profile(self, filepath: str) -> None:
+        """
+        Saves `profile` as JSON file (together with the toolbox version)
+        to track the performance across toolbox versions.
+        """
+        pathlib.Path(filepath).parent.mkdir(parents=True, exist_ok=True)
+        self._profiler.to_json(
+            filepath,
+            experiment=type(self).__name__,
+            rda_toolbox_version=_toolbox_version(),
+        )
+
+    def _stage_key(self, name: str) -> str:
+        """
+        Cache key of a stage, hashed from the inputs of the stage (see `_stage_inputs`).
+        """
+        if "_stage_keys" not in self.__dict__:
+            self._stage_keys = {}
+        if name not in self._stage_keys:
+            self._stage_keys[name] = self._stage_cache.key(
+                f"{type(self).__name__}.{name}", self._stage_inputs(name)
+            )
+        return self._stage_keys[name]
+
+    def _stage_inputs(self, name: str) -> dict | None:
+        """
+        Everything a stage depends on (files, parameters and the keys of upstream stages)
+        to key the stage cache. Files are given as `pathlib.Path` and hashed by content.
+        Stages without inputs (None) are not cached.
+        """
+        if name == "rawdata":
+            return {
+                "rawfiles": _as_path(self._rawfiles_folderpath),
+                "resultmatrix_header_mapping": self._resultmatrix_header_mapping,
+            }
+        return None
+
+    @stage("rawdata")
+    def _readerdata(self) -> tuple[pd.DataFrame, pd.DataFrame]:
         # If no path is provided, initialize empty placeholders instead of calling parse_readerfiles
-        if not rawfiles_folderpath:
-            self.rawdata = pd.DataFrame()
-            self.metadata = pd.DataFrame()
-        else:
-            self.rawdata, self.metadata = parse_readerfiles(
-                rawfiles_folderpath,
-                resultmatrix_header_mapping=resultmatrix_header_mapping,
-            )  # Get rawdata, this will later be overwritten by adding precipitation, if available
+        if not self._rawfiles_folderpath:
+            return pd.DataFrame(), pd.DataFrame()
+        return parse_readerfiles(
+            self._rawfiles_folderpath,
+            resultmatrix_header_mapping=self._resultmatrix_header_mapping,
+        )
+
+    @cached_property
+    def rawdata(self) -> pd.DataFrame:
+        return self._readerdata[0]
+
+    @cached_property
+    def metadata(self) -> pd.DataFrame:
+        return self._readerdata[1]
+
+    def _figure_builders(self) -> Dict[tuple[str, str], Callable[[], "ChartLike"]]:
+        """
+        Result figures of the experiment as {(dataset, file_basename): callable building the figure}.
+        Only the names are determined here, the figures are built when requested (see `figures`).
+        """
+        return {}
+
+    def _figure_fallbacks(self) -> Dict[tuple[str, str], Callable[[], "ChartLike"]]:
+        """
+        Lighter versions of result figures as {(dataset, file_basename): callable building the figure},
+        saved instead of figures exceeding the figure budget (see `utility.FigureBudget`):
+        raster images (see `raster_plateheatmap`) for the plate heatmaps.
+        """
+        if self._plateheatmaps_file_basename is None:
+            return {}
+        fallbacks = {}
+        for measurement_label in self._measurement_labels:
+            measurement_processed = self.processed[self.processed["Measurement Type"] == measurement_label]
+            file_basename = self._plateheatmaps_file_basename.format(measurement=measurement_label)
+            fallbacks["QualityControl", file_basename] = functools.partial(
+                self.raster_plateheatmap, measurement_processed, measurement=measurement_label
+            )
+        return fallbacks
+
+    @cached_property
+    def _figure_registry(
+        self,
+    ) -> Dict[str, tuple[str, str, Callable[[], "ChartLike"], Callable[[], "ChartLike"] | None]]:
+        # {"<dataset>/<file_basename>": (dataset, file_basename, builder, fallback builder)}
+        fallbacks = self._figure_fallbacks()
+        return {
+            f"{dataset}/{file_basename}": (dataset, file_basename, build, fallbacks.get((dataset, file_basename)))
+            for (dataset, file_basename), build in self._figure_builders().items()
+        }
+
+    @property
+    def figure_names(self) -> List[str]:
+        """
+        Names ("<dataset>/<file_basename>") of all result figures, without building them.
+        """
+        return list(self._figure_registry)
+
+    def figures(
+        self,
+        include: str | Sequence[str] | None = None,
+        exclude: str | Sequence[str] | None = None,
+    ) -> List["Result"]:
+        """
+        Builds the result figures whose names (see `figure_names`) match any of the `include` patterns
+        (default: all figures) and none of the `exclude` patterns, e.g. `include="QualityControl/*"`.
+        Patterns are shell-style wildcards (`fnmatch`). Built figures are cached.
+        Without patterns, this is the "figures" stage (all figures).
+        """
+        if include is None and exclude is None:
+            return self.run(until="figures")._resultfigures
+        include = [include] if isinstance(include, str) else include
+        exclude = [exclude] if isinstance(exclude, str) else (exclude or [])
+        names = self.figure_names
+        if include is not None:
+            for pattern in include:
+                if not fnmatch.filter(names, pattern):
+                    warnings.warn(f"No figure matches '{pattern}'.", RuntimeWarning, stacklevel=2)
+            names = [name for name in names if any(fnmatch.fnmatchcase(name, pattern) for pattern in include)]
+        names = [name for name in names if not any(fnmatch.fnmatchcase(name, pattern) for pattern in exclude)]
+        return [self._build_figure(name) for name in names]
+
+    def _build_figure(self, name: str) -> "Result":
+        if "_built_figures" not in self.__dict__:
+            self._built_figures = {}
+        if name not in self._built_figures:
+            dataset, file_basename, build, fallback = self._figure_registry[name]
+            start = time.perf_counter()
+            figure = build()
+            self._built_figures[name] = Result(
+                dataset,
+                file_basename,
+                figure=figure,
+                build_seconds=time.perf_counter() - start,
+                fallback=fallback,
+            )
+        return self._built_figures[name]
+
+    def raster_plateheatmap(self, df, measurement="Raw Optical Density"):
+        """
+        Raster version of `plateheatmap` (one image of all plates), saved instead of too large plate heatmaps.
+        Raises a ValueError if `df` has no plates.
+        """
+        from .raster import raster_plateheatmaps, image_chart
+
+        images = raster_plateheatmaps(
+            df,
+            substance_id="Internal ID",
+            barcode=self._norm_by_barcode,
+            negative_control=self._negative_controls,
+            blank=self._blanks,
+        )
+        if not images:
+            raise ValueError(f"No plates with {measurement} to draw.")
+        (image,) = images
+        return image_chart(image, title=measurement)
+
+    def save_raster_plateheatmaps(self, resultpath, plates_per_tile: int | None = None) -> list[str]:
+        """
+        Saves PNG heatmaps of all plates per measurement (see `raster.raster_plateheatmaps`),
+        for campaigns with too many plates for the plateheatmaps figures (PrimaryScreen and MIC).
+        Returns the written filepaths.
+        """
+        from .raster import raster_plateheatmaps, save_plate_mosaics
+
+        processed = self.run(until="processed").processed
+        folder = pathlib.Path(resultpath) / "QualityControl"
+        folder.mkdir(parents=True, exist_ok=True)
+        filepaths = []
+        for measurement_label in self._measurement_labels:
+            images = raster_plateheatmaps(
+                processed[processed["Measurement Type"] == measurement_label],
+                substance_id="Internal ID",
+                barcode=self._norm_by_barcode,
+                negative_control=self._negative_controls,
+                blank=self._blanks,
+                plates_per_tile=plates_per_tile,
+            )
+            filepaths += save_plate_mosaics(images, folder / f"{measurement_label}_plateheatmaps_raster")
+        return filepaths
 
 # TODO: Add a Report with the following specifications:
 # - Add Report to MIC and PrimaryScreen classes
@@ -136,10 +409,14 @@ class Result:
     dataset: str
     file_basename: str
     table: pd.DataFrame | None = None
-    figure: ChartLike | None = None
+    figure: "ChartLike | None" = None
+    build_seconds: float | None = None
+    fallback: Callable[[], "ChartLike"] | None = None
 
 
 class Precipitation(Experiment):
+    _stages = {"rawdata": "rawdata", "results": "results"}
+
     def __init__(
         self,
         rawfiles_folderpath: str | None,
@@ -147,9 +424,11 @@ class Precipitation(Experiment):
         plate_type: int = 384,  # Define default plate_type for experiment
         measurement_label: str = "Optical Density",
         exclude_outlier: bool = False,
+        loq_per_plate: bool = False,
     ):
         super().__init__(rawfiles_folderpath, plate_type)
         self._measurement_label = measurement_label
+        self._loq_per_plate = loq_per_plate
 
         if type(background_locations) is list:
             self.background_locations = pd.DataFrame(
@@ -173,9 +452,17 @@ class Precipitation(Experiment):
             # {"Barcode": "", "Position": }
             pass
 
+        self._exclude_outlier = exclude_outlier
+
+    @cached_property
+    def rawdata_w_layout(self) -> pd.DataFrame:
+        """
+        Rawdata with the background locations (`Layout` column).
+        Background outliers (> 2 * median of the background) are excluded if `exclude_outlier` is set.
+        """
         if not self._rawfiles_folderpath:
             # return early with placeholder results
-            self.rawdata_w_layout = pd.DataFrame(
+            rawdata_w_layout = pd.DataFrame(
                 {
                     "Row_384": [],
                     "Col_384": [],
@@ -188,32 +475,32 @@ class Precipitation(Experiment):
                 }
             )
         else:
-            self.rawdata_w_layout = pd.merge(
+            rawdata_w_layout = pd.merge(
                 self.rawdata, self.background_locations, how="outer"
             ).fillna({"Layout": "Substance"})
 
-        self._background_median = self.rawdata_w_layout[
-            (self.rawdata_w_layout["Layout"] == "Background") &
-            (self.rawdata_w_layout["Measurement Type"] == self._measurement_label)
+        self._background_median = rawdata_w_layout[
+            (rawdata_w_layout["Layout"] == "Background") &
+            (rawdata_w_layout["Measurement Type"] == self._measurement_label)
         ]["Measurement"].median()
         # Determine the outlier using 2*median of background samples
-        self._outlier = self.rawdata_w_layout[
-            (self.rawdata_w_layout["Layout"] == "Background") &
-            (self.rawdata_w_layout["Measurement Type"] == self._measurement_label)
+        self._outlier = rawdata_w_layout[
+            (rawdata_w_layout["Layout"] == "Background") &
+            (rawdata_w_layout["Measurement Type"] == self._measurement_label)
             & (
-                self.rawdata_w_layout["Measurement"]
+                rawdata_w_layout["Measurement"]
                 > self._background_median * 2
             )
         ]
         if not self._outlier.empty:
-            if exclude_outlier:
+            if self._exclude_outlier:
                 # Print some info on exluded outliers:
                 print("For precipitation test:")
                 for index, row in self._outlier.iterrows():
                     print(
                         f"    Exluding outlier on plate {row['AcD Barcode 384']}, position {row['Row_384']}{row['Col_384']}"
                     )
-                self.rawdata_w_layout.drop(self._outlier.index, inplace=True)
+                rawdata_w_layout.drop(self._outlier.index, inplace=True)
             else:
                 warnings.warn(
                     "Precipitation background outliers detected,\n"
@@ -222,37 +509,92 @@ class Precipitation(Experiment):
                     RuntimeWarning,
                     stacklevel=2,
                 )
+        return rawdata_w_layout
 
     @property
-    def limit_of_quantification(self):  # "Bestimmungsmaß"
-        background = self.rawdata_w_layout[
+    def _cache_inputs(self) -> dict:
+        """
+        Everything the precipitation results depend on, to key the stage cache of the experiments using it.
+        """
+        return {
+            "rawfiles": _as_path(self._rawfiles_folderpath),
+            "background_locations": self.background_locations,
+            "exclude_outlier": self._exclude_outlier,
+            "measurement_label": self._measurement_label,
+            "loq_per_plate": self._loq_per_plate,
+        }
+
+    @cached_property
+    def _background(self) -> pd.DataFrame:
+        return self.rawdata_w_layout[
             (self.rawdata_w_layout["Layout"] == "Background") &
             (self.rawdata_w_layout["Measurement Type"] == self._measurement_label)
-        ]["Measurement"]
-        loq = round(background.mean() + 10 * background.std(), 3)
-        self.rawdata_w_layout["Limit of Quantification"] = loq
-        return loq
+        ]
+
+    @cached_property
+    def limit_of_quantification(self) -> float:  # "Bestimmungsmaß"
+        """
+        Limit of quantification over the background samples of all plates:
+        mean(background) + 10 * std(background)
+        """
+        background = self._background["Measurement"]
+        return round(background.mean() + 10 * background.std(), 3)
 
     @cached_property
+    def limits_of_quantification(self) -> pd.Series:
+        """
+        Limit of quantification per plate (AcD barcode), computed from the background samples of each plate.
+        Plates without (enough) background samples get the limit of quantification over all plates.
+        """
+        background = self._background.groupby("AcD Barcode 384")["Measurement"].agg(["mean", "std"])
+        loq = (background["mean"] + 10 * background["std"]).round(3)
+        plates = self.rawdata_w_layout["AcD Barcode 384"].unique()
+        return loq.reindex(plates).fillna(self.limit_of_quantification)
+
+    @stage("results")
     def results(self):
-        self.rawdata_w_layout["Precipitated"] = self.rawdata_w_layout[
-            self.rawdata_w_layout["Measurement Type"] == self._measurement_label
-        ]["Measurement"].apply(lambda x: x > self.limit_of_quantification)
-        self.rawdata_w_layout[f"Precipitated at {self._measurement_label}"] = (
-            self.rawdata_w_layout[self.rawdata_w_layout["Measurement Type"] == self._measurement_label]["Measurement"].apply(
-                lambda x: x if x > self.limit_of_quantification else None
-            )
-        )
-        return self.rawdata_w_layout
+        """
+        Rawdata with the limit of quantification and the precipitated wells (measurement above the limit).
+        The limit is computed over all plates or per plate (`loq_per_plate`).
+        """
+        results = self.rawdata_w_layout
+        if self._loq_per_plate:
+            loq = results["AcD Barcode 384"].map(self.limits_of_quantification)
+        else:
+            loq = self.limit_of_quantification
+        results["Limit of Quantification"] = loq
+        measured = results["Measurement Type"] == self._measurement_label
+        precipitated = results["Measurement"] > results["Limit of Quantification"]
+        results["Precipitated"] = precipitated[measured]
+        results[f"Precipitated at {self._measurement_label}"] = results["Measurement"].where(
+            precipitated
+        )[measured]
+        return results
 
     # let it have its own heatmap function for now:
     def plateheatmap(self):
-        base = alt.Chart(
+        import altair as alt
+
+        from .plot import _tooltip_columns
+
+        tooltip = _tooltip_columns(
             self.results,
+            None,
+            required=[
+                "AcD Barcode 384",
+                "Row_384",
+                "Col_384",
+                "Measurement Type",
+                "Measurement",
+                f"Precipitated at {self._measurement_label}",
+            ],
+        )
+        base = alt.Chart(
+            self.results[tooltip],
         ).encode(
             alt.X("Col_384:O").axis(labelAngle=0, orient="top").title(None),
             alt.Y("Row_384:O").title(None),
-            tooltip=list(self.results.columns),
+            tooltip=tooltip,
         )
 
         heatmap = base.mark_rect().encode(
@@ -287,7 +629,9 @@ class Precipitation(Experiment):
                 title=alt.Title(
                     "Precipitation Test",
                     subtitle=[
-                        f"Limit of Quantification: {self.limit_of_quantification}"
+                        "Limit of Quantification: per plate (see tooltip)"
+                        if self._loq_per_plate
+                        else f"Limit of Quantification: {self.limit_of_quantification}"
                     ],
                 ),
                 columns=col_num,
@@ -301,6 +645,16 @@ class PrimaryScreen(Experiment):
     Primary screen experiment. Usually done using only 1 concentration.
     """
 
+    _stages = {
+        "rawdata": "rawdata",
+        "input": "_inputdata",
+        "mapped": "mapped_input_df",
+        "processed": "processed",
+        "results": "results",
+        "figures": "_resultfigures",
+    }
+    _plateheatmaps_file_basename = "{measurement} plateheatmaps"
+
     def __init__(
         self,
         rawfiles_folderpath: str,
@@ -322,71 +676,32 @@ class PrimaryScreen(Experiment):
         precipitation_rawfilepath: str | None = None,
         background_locations: pd.DataFrame | list[str] | None = None,
         precip_exclude_outlier: bool = False,
+        precip_loq_per_plate: bool = False,
         needs_mapping: bool = True,
         molecule_df: pd.DataFrame | None = None,
         molecule_external_id_column: str = "External ID",
         molecule_column: str = "mol",
         cyt10_matrixheader_mapping: Dict[str, str] = {"Results": "Raw Optical Density"},
+        cache_dir: str | None = None,
+        trace_memory: bool = False,
     ):
         super().__init__(
             rawfiles_folderpath,
             plate_type,
             resultmatrix_header_mapping=cyt10_matrixheader_mapping,
+            cache_dir=cache_dir,
+            trace_memory=trace_memory,
         )
         self._measurement_labels = cyt10_matrixheader_mapping.values()
         self._mappingfile_path = mappingfile_path
         self._inputfile_path = inputfile_path
-        self._substances_unmapped, self._organisms, self._dilutions, self._controls = (
-            read_inputfile(inputfile_path, substance_id)
-        )
-        if needs_mapping and (
-            not map_rowname
-            or not map_colname
-            or map_rowname not in self._substances_unmapped.columns
-            or map_colname not in self._substances_unmapped.columns
-        ):
-            self._substances_unmapped = split_position(
-                self._substances_unmapped,
-                position="Origin Position 96",
-                row="Row_96",
-                col="Col_96",
-                copy=False,
-            )
-            map_rowname = "Row_96"
-            map_colname = "Col_96"
-
-        self.substances = (
-            mapapply_96_to_384(
-                self._substances_unmapped,
-                rowname=map_rowname,
-                colname=map_colname,
-                q_name=q_name,
-            )
-            if needs_mapping
-            else split_position(
-                self._substances_unmapped,
-                position=ast_position_header,  # "MP Position 384",
-                row="Row_384",
-                col="Col_384"
-            )
-        )
-
-        self._mapping_df = parse_mappingfile(
-            mappingfile_path,
-            motherplate_column=ast_barcode_header,
-            childplate_column=norm_by_barcode,  # "AcD Barcode 384",
-        )
-        self._mapping_dict = get_mapping_dict(self._mapping_df, mother_column=ast_barcode_header)
-        # self._substance_id = substance_id
-        if negative_controls not in self._controls["Internal ID"].values:
-            raise ValueError(
-                f"negative_controls '{negative_controls}' not found in controls 'Internal ID' column.\nConsider changing the 'negative_controls' keyword to a value in the input excel."
-            )
+        self._substance_id = substance_id
+        self._needs_mapping = needs_mapping
+        self._map_rowname = map_rowname
+        self._map_colname = map_colname
+        self._q_name = q_name
+        self._ast_position_header = ast_position_header
         self._negative_controls = negative_controls
-        if blanks not in self._controls["Internal ID"].values:
-            raise ValueError(
-                f"blanks '{blanks}' not found in controls 'Internal ID' column.\nConsider changing the 'blanks' keyword to a value in the input excel."
-            )
         self._blanks = blanks
         self._norm_by_barcode = norm_by_barcode
         self._ast_barcode_header = ast_barcode_header
@@ -409,22 +724,152 @@ class PrimaryScreen(Experiment):
                 precipitation_rawfilepath,
                 background_locations=background_locations,
                 exclude_outlier=precip_exclude_outlier,
+                loq_per_plate=precip_loq_per_plate,
                 measurement_label="Optical Density",  # As of yet, we expect to use ONLY OD for precipitation detection
             )
         )
-        self.rawdata = (  # Overwrite rawdata if precipitation data is available
-            self.rawdata
+        if self.precipitation is not None:
+            # Record the precipitation stages in the profile of this experiment
+            self.precipitation._profiler = self._profiler
+            self.precipitation._profile_prefix = "precipitation_"
+
+    @cached_property
+    def rawdata(self) -> pd.DataFrame:
+        return (  # Add precipitation to the rawdata if precipitation data is available
+            self._readerdata[0]
             if self.precipitation is None
             else add_precipitation(
-                self.rawdata, self.precipitation.results, self._mapping_dict
+                self._readerdata[0], self.precipitation.results, self._mapping_dict
+            )
+        )
+
+    def _stage_inputs(self, name: str) -> dict | None:
+        if name == "input":
+            return {
+                "inputfile": _as_path(self._inputfile_path),
+                "substance_id": self._substance_id,
+                "negative_controls": self._negative_controls,
+                "blanks": self._blanks,
+            }
+        if name == "mapped":
+            return {
+                "rawdata": self._stage_key("rawdata"),
+                "input": self._stage_key("input"),
+                "mappingfile": _as_path(self._mappingfile_path),
+                "precipitation": None if self.precipitation is None else self.precipitation._cache_inputs,
+                "needs_mapping": self._needs_mapping,
+                "map_rowname": self._map_rowname,
+                "map_colname": self._map_colname,
+                "q_name": self._q_name,
+                "ast_barcode_header": self._ast_barcode_header,
+                "ast_position_header": self._ast_position_header,
+                "norm_by_barcode": self._norm_by_barcode,
+                "molecule_df": self._molecule_df,
+                "molecule_external_id_column": self._molecule_external_id_column,
+                "molecule_column": self._molecule_column,
+            }
+        if name == "processed":
+            return {
+                "mapped": self._stage_key("mapped"),
+                "negative_controls": self._negative_controls,
+                "blanks": self._blanks,
+                "norm_by_barcode": self._norm_by_barcode,
+                "measurement_labels": list(self._measurement_labels),
+            }
+        return super()._stage_inputs(name)
+
+    @stage("input")
+    def _inputdata(self) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        substances, organisms, dilutions, controls = read_inputfile(
+            self._inputfile_path, self._substance_id
+        )
+        if self._negative_controls not in controls["Internal ID"].values:
+            raise ValueError(
+                f"negative_controls '{self._negative_controls}' not found in controls 'Internal ID' column.\nConsider changing the 'negative_controls' keyword to a value in the input excel."
+            )
+        if self._blanks not in controls["Internal ID"].values:
+            raise ValueError(
+                f"blanks '{self._blanks}' not found in controls 'Internal ID' column.\nConsider changing the 'blanks' keyword to a value in the input excel."
+            )
+        return substances, organisms, dilutions, controls
+
+    @cached_property
+    def _substances_unmapped(self) -> pd.DataFrame:
+        return self._inputdata[0]
+
+    @cached_property
+    def _organisms(self) -> pd.DataFrame:
+        return self._inputdata[1]
+
+    @cached_property
+    def _dilutions(self) -> pd.DataFrame:
+        return self._inputdata[2]
+
+    @cached_property
+    def _controls(self) -> pd.DataFrame:
+        return self._inputdata[3]
+
+    @cached_property
+    def substances(self) -> pd.DataFrame:
+        """
+        Substances of the inputfile with their positions on the AsT plates (`Row_384`, `Col_384`).
+        """
+        map_rowname, map_colname = self._map_rowname, self._map_colname
+        if self._needs_mapping and (
+            not map_rowname
+            or not map_colname
+            or map_rowname not in self._substances_unmapped.columns
+            or map_colname not in self._substances_unmapped.columns
+        ):
+            split_position(
+                self._substances_unmapped,
+                position="Origin Position 96",
+                row="Row_96",
+                col="Col_96",
+                copy=False,
+            )
+            map_rowname = "Row_96"
+            map_colname = "Col_96"
+
+        return (
+            mapapply_96_to_384(
+                self._substances_unmapped,
+                rowname=map_rowname,
+                colname=map_colname,
+                q_name=self._q_name,
+            )
+            if self._needs_mapping
+            else split_position(
+                self._substances_unmapped,
+                position=self._ast_position_header,  # "MP Position 384",
+                row="Row_384",
+                col="Col_384"
             )
         )
-        self._processed_only_substances = self.processed[
+
+    @cached_property
+    def _mapping_df(self) -> pd.DataFrame:
+        return parse_mappingfile(
+            self._mappingfile_path,
+            motherplate_column=self._ast_barcode_header,
+            childplate_column=self._norm_by_barcode,  # "AcD Barcode 384",
+        )
+
+    @cached_property
+    def _mapping_dict(self):
+        return get_mapping_dict(self._mapping_df, mother_column=self._ast_barcode_header)
+
+    @cached_property
+    def _processed_only_substances(self) -> pd.DataFrame:
+        return self.processed[
             (self.processed["Dataset"] != "Reference")
             & (self.processed["Dataset"] != "Positive Control")
             & (self.processed["Dataset"] != "Blank")
         ]
-        self.substances_precipitation = (
+
+    @cached_property
+    def substances_precipitation(self) -> pd.DataFrame | None:
+        return (
             None
             if self.precipitation is None or self.precipitation.results.empty
             else (
@@ -461,63 +906,48 @@ class PrimaryScreen(Experiment):
         """
 
 
-    @cached_property
+    @stage("mapped")
     def mapped_input_df(self):
         """
         Does mapping of the inputfile describing the tested substances with the
         corresponding mappingfile(s).
         *Basically replaces rda.process.primary_process_inputs() function so all the variables and intermediate results are available via the class*
         """
-        control_wbarcodes = []
-        # multiply controls with number of AsT plates to later merge them with substances df
-        for origin_barcode in list(self.substances[self._ast_barcode_header].unique()):
-            controls_subdf = self._controls.copy()
-            controls_subdf[self._ast_barcode_header] = origin_barcode
-            control_wbarcodes.append(controls_subdf)
-        controls_n_barcodes = pd.concat(control_wbarcodes)
-
-        ast_plate_df = pd.merge(
-            pd.concat([self.substances, controls_n_barcodes]), # concatenate substances and controls
-            self._dilutions,  # merge with dilutions on column "Dataset"
-            how="outer",
-            on="Dataset",  # Explicitly define on which column to merge
+        result_df = map_primary_layout(
+            self.rawdata,
+            self._mapping_df,
+            self._organisms,
+            self.substances,
+            self._controls,
+            self._dilutions,
+            ast_barcode_header=self._ast_barcode_header,
+            acd_barcode_header=self._norm_by_barcode,
         )
-
-        mapped_organisms = pd.merge(self._mapping_df, self._organisms, on="Rack")
-        rawdata_mapped_organism = pd.merge(mapped_organisms, self.rawdata)
-        # print(rawdata_mapped_organism["Measurement Type"].unique())
-        result_df = pd.concat(
-            [
-                pd.merge(org_df, ast_plate_df, how="inner")
-                for _, org_df in rawdata_mapped_organism.groupby(
-                    "Organism formatted"
-                )
-            ]
-        )
-        # print(result_df["Measurement Type"].unique())
         if result_df.empty:
             raise ValueError(
                 "After mapping the input substances to the rawdata, the resulting DataFrame is empty.\nThis means that no data points could be attributed to any substance.\nPlease check if the mappingfiles and inputfile are correct and consistent with each other."
             )
 
-        for ast_barcode, ast_plate in result_df.groupby(self._ast_barcode_header):
-            logger.info(
-                f"AsT Plate {ast_barcode} has size: {
-                    len(ast_plate) // len(ast_plate['AcD Barcode 384'].unique())
-                }"
-            )
-            logger.info(f"{ast_barcode} -> {ast_plate['AcD Barcode 384'].unique()}")
+        if logger.isEnabledFor(logging.INFO):
+            for ast_barcode, ast_plate in result_df.groupby(self._ast_barcode_header):
+                logger.info(
+                    f"AsT Plate {ast_barcode} has size: {
+                        len(ast_plate) // len(ast_plate['AcD Barcode 384'].unique())
+                    }"
+                )
+                logger.info(f"{ast_barcode} -> {ast_plate['AcD Barcode 384'].unique()}")
         if self._molecule_df is not None:
             result_df = add_molecule_data(
                 result_df,
                 self._molecule_df,
                 external_id=self._molecule_external_id_column,
                 mol_column=self._molecule_column,
+                cache=self._molecule_cache,
             )
         # result_df = result_df.rename({self._substance_id: "Internal ID"}) # rename whatever substance ID was given to Internal ID
         return result_df
 
-    @cached_property
+    @stage("processed")
     def processed(self):
         processed = preprocess(
             self.mapped_input_df,
@@ -529,22 +959,26 @@ class PrimaryScreen(Experiment):
 
         # Add B-Scores to plates without negative controls and blanks
         # We add b_scores here since we only want them in a primary screen and preprocess() is used generally
-        for label in self._measurement_labels:
-            proc_wo_controls = processed[
-                (~processed["Internal ID"].isin([self._negative_controls, self._blanks])) &
-                (processed["Measurement Type"] == label)
-            ]
-            b_scores = (
-                proc_wo_controls.groupby(self._norm_by_barcode)[
-                    [self._norm_by_barcode, "Row_384", "Col_384", "Measurement"]
+        with self._profiler.stage("b_scores") as record:
+            for label in self._measurement_labels:
+                proc_wo_controls = processed[
+                    (~processed["Internal ID"].isin([self._negative_controls, self._blanks])) &
+                    (processed["Measurement Type"] == label)
                 ]
-                .apply(lambda plate_grp: add_b_score(plate_grp, measurement_header="Measurement"))
-                .reset_index(drop=True)
-            )
-            processed = pd.merge(processed, b_scores, how="outer")
+                b_scores = (
+                    proc_wo_controls.groupby(self._norm_by_barcode)[
+                        [self._norm_by_barcode, "Row_384", "Col_384", "Measurement"]
+                    ]
+                    .apply(lambda plate_grp: add_b_score(plate_grp, measurement_header="Measurement"))
+                    .reset_index(drop=True)
+                )
+                processed = pd.merge(processed, b_scores, how="outer")
+            record["rows"] = len(processed)
         return processed
 
     def plateheatmap(self, df, measurement="Raw Optical Density"):
+        from .plot import plateheatmaps
+
         return plateheatmaps(
             df.fillna(""),
             substance_id="Internal ID",
@@ -554,69 +988,76 @@ class PrimaryScreen(Experiment):
             barcode=self._norm_by_barcode,
         )
 
-    @cached_property
-    def _resultfigures(self):
-        result_figures = []
+    @stage("figures")
+    def _resultfigures(self) -> list[Result]:
+        return [self._build_figure(name) for name in self.figure_names]
+
+    def _figure_builders(self):
+        from .plot import UpSetAltair, measurement_vs_bscore_scatter, get_zfactor_heatmap
+
+        def faceted_scatter(df, **kwargs):
+            return measurement_vs_bscore_scatter(df, **kwargs).facet(row="Organism", column="Dataset")
+
+        def upset(sub_df, title):
+            intersections = get_upset_intersections(sub_df, counts_column="Internal ID")
+            return UpSetAltair(intersections, title=title, counts="count")
+
+        def actives_scatter(dataset_name, measurement_label, threshold):
+            all_results = self.results[f"{dataset_name}_{measurement_label}_all_results"]
+            only_actives = all_results[
+                all_results.groupby("Organism")[f"Relative Measurement mean"].transform(lambda x: x < threshold)
+            ]
+            return measurement_vs_bscore_scatter(
+                only_actives,
+                measurement_header=f"Relative {measurement_label} mean",
+                measurement_title=f"Relative {measurement_label}",
+                show_area=False
+            )
+
+        builders = {}
         # Add QualityControl overview of the plates as heatmaps:
         for measurement_label in self._measurement_labels:
-            result_figures.append(
-                Result("QualityControl", f"{measurement_label} plateheatmaps", figure=self.plateheatmap(
-                    self.processed[self.processed["Measurement Type"] == measurement_label],
-                    measurement=measurement_label)
-                )
+            measurement_processed = self.processed[self.processed["Measurement Type"] == measurement_label]
+            file_basename = self._plateheatmaps_file_basename.format(measurement=measurement_label)
+            builders["QualityControl", file_basename] = functools.partial(
+                self.plateheatmap, measurement_processed, measurement=measurement_label
             )
-            result_figures.append(
-                Result("QualityControl", f"{measurement_label} zfactor_heatmap", figure=get_zfactor_heatmap(
-                    self.processed[self.processed["Measurement Type"] == measurement_label],
-                    y_rows=self._ast_barcode_header
-                    )
-                )
+            builders["QualityControl", f"{measurement_label} zfactor_heatmap"] = functools.partial(
+                get_zfactor_heatmap, measurement_processed, y_rows=self._ast_barcode_header
             )
         # If precipitation testing was done, add it to QC result figures:
         if self.precipitation is not None and not self.precipitation.results.empty:
-            result_figures.append(
-                Result(
-                    "QualityControl",
-                    "Heatmap_Precipitation",
-                    figure=self.precipitation.plateheatmap(),
-                )
-            )
+            builders["QualityControl", "Heatmap_Precipitation"] = self.precipitation.plateheatmap
 
         for measurement_label in self._measurement_labels:
             measurement_processed_only_substances = self._processed_only_substances[self._processed_only_substances["Measurement Type"] == measurement_label]
             for threshold in self.thresholds:
-                result_figures.append(
-                    Result(
-                        "QualityControl",
-                        f"Scatter_{measurement_label}_vs_BScore_Substances_{threshold}",
-                        figure=measurement_vs_bscore_scatter(
-                            measurement_processed_only_substances,
-                            measurement_header=f"Relative Measurement",
-                            measurement_title=f"Relative {measurement_label}",
-                            bscore_header="b_scores",
-                            bscore_title="B-Score",
-                            color_header="Dataset",
-                            measurement_threshold=threshold,
-                            b_score_threshold=self.b_score_threshold,
-                        ).facet(row="Organism", column="Dataset"),
+                builders["QualityControl", f"Scatter_{measurement_label}_vs_BScore_Substances_{threshold}"] = (
+                    functools.partial(
+                        faceted_scatter,
+                        measurement_processed_only_substances,
+                        measurement_header=f"Relative Measurement",
+                        measurement_title=f"Relative {measurement_label}",
+                        bscore_header="b_scores",
+                        bscore_title="B-Score",
+                        color_header="Dataset",
+                        measurement_threshold=threshold,
+                        b_score_threshold=self.b_score_threshold,
                     )
                 )
-                result_figures.append(
-                    Result(
-                        "QualityControl",
-                        f"Scatter_{measurement_label}_vs_BScore_References_{threshold}",
-                        figure=measurement_vs_bscore_scatter(
-                            self.processed[
-                                self.processed["Dataset"] == "Reference"
-                            ].replace({np.nan: None}),
-                            measurement_header=f"Relative {measurement_label}",
-                            measurement_title=f"Relative {measurement_label}",
-                            bscore_header="b_scores",
-                            bscore_title="B-Score",
-                            color_header="Dataset",
-                            measurement_threshold=threshold,
-                            b_score_threshold=self.b_score_threshold,
-                        ).facet(row="Organism", column="Dataset"),
+                builders["QualityControl", f"Scatter_{measurement_label}_vs_BScore_References_{threshold}"] = (
+                    functools.partial(
+                        faceted_scatter,
+                        self.processed[
+                            self.processed["Dataset"] == "Reference"
+                        ].replace({np.nan: None}),
+                        measurement_header=f"Relative {measurement_label}",
+                        measurement_title=f"Relative {measurement_label}",
+                        bscore_header="b_scores",
+                        bscore_title="B-Score",
+                        color_header="Dataset",
+                        measurement_threshold=threshold,
+                        b_score_threshold=self.b_score_threshold,
                     )
                 )
 
@@ -629,34 +1070,13 @@ class PrimaryScreen(Experiment):
                 )
                 for dataset, sub_df in subset.groupby("Dataset"):
                     dataset_name = str(dataset)
-                    dummy_df = get_upsetplot_df(sub_df, counts_column="Internal ID")
-
-                    result_figures.append(
-                        Result(
-                            dataset_name,
-                            f"UpSetPlot_{measurement_label}_{dataset_name}_{threshold}",
-                            figure=UpSetAltair(dummy_df, title=dataset_name),
-                        )
+                    builders[dataset_name, f"UpSetPlot_{measurement_label}_{dataset_name}_{threshold}"] = (
+                        functools.partial(upset, sub_df, dataset_name)
                     )
-                    # ---
-                    only_actives = self.results[f"{dataset_name}_{measurement_label}_all_results"][
-                        self.results[f"{dataset_name}_{measurement_label}_all_results"]
-                        .groupby("Organism")[f"Relative Measurement mean"]
-                        .transform(lambda x: x < threshold)
-                    ]
-                    result_figures.append(
-                        Result(
-                            dataset_name,
-                            f"Scatterplot_BScores_{measurement_label}_{dataset_name}_{threshold}",
-                            figure=measurement_vs_bscore_scatter(
-                                only_actives,
-                                measurement_header=f"Relative {measurement_label} mean",
-                                measurement_title=f"Relative {measurement_label}",
-                                show_area=False
-                            ),
-                        )
+                    builders[dataset_name, f"Scatterplot_BScores_{measurement_label}_{dataset_name}_{threshold}"] = (
+                        functools.partial(actives_scatter, dataset_name, measurement_label, threshold)
                     )
-        return result_figures
+        return builders
 
     @cached_property
     def _resulttables(self):
@@ -845,7 +1265,7 @@ class PrimaryScreen(Experiment):
                     )
         return result_tables
 
-    @cached_property
+    @stage("results")
     def results(self):
         """
         Retrieves result tables (from self._resulttables)
@@ -854,17 +1274,68 @@ class PrimaryScreen(Experiment):
         """
         return {tbl.file_basename: tbl.table for tbl in self._resulttables}
 
-    def save_figures(self, resultpath, fileformats: list[str] = ["svg", "html"]):
-        _save_figures(resultpath, self._resultfigures, fileformats=fileformats)
+    def save_figures(
+        self,
+        resultpath,
+        fileformats: list[str] = ["svg", "html"],
+        n_jobs: int | None = 1,
+        skip_unchanged: bool = False,
+        data_files: bool = False,
+        include: str | Sequence[str] | None = None,
+        exclude: str | Sequence[str] | None = None,
+        budget: FigureBudget | None = None,
+    ) -> pd.DataFrame:
+        """
+        Saves the figures, optionally rendered by `n_jobs` processes, skipping unchanged figures
+        and with the data of "html" and "json" figures in shared files (see `utility._save_figures`).
+        With `include`/`exclude` patterns, only the matching figures are built and saved (see `figures`),
+        e.g. `include="QualityControl/*"` for the quality control figures only.
+        Figures exceeding the `budget` are reported, too large plate heatmaps are saved as raster images.
+        Returns the build and rendering time, the data rows and the specification size of each file.
+        """
+        resultfigures = self.figures(include=include, exclude=exclude)
+        with self._profiler.stage("save_figures") as record:
+            timings = _save_figures(
+                resultpath,
+                resultfigures,
+                fileformats=fileformats,
+                n_jobs=n_jobs,
+                skip_unchanged=skip_unchanged,
+                data_files=data_files,
+                budget=budget,
+            )
+            record["rows"] = len(resultfigures)
+        return timings
 
     def save_tables(
-        self, result_path, processed_path, fileformats: list[str] = ["xlsx", "csv"]
+        self,
+        result_path,
+        processed_path,
+        fileformats: list[str] = ["xlsx", "csv"],
+        skip_unchanged: bool = False,
+        workbook_per_dataset: bool = False,
     ):
-        pathlib.Path(processed_path).mkdir(parents=True, exist_ok=True)
-        self.processed.to_csv(os.path.join(processed_path, "processed.csv"))
-        self.rawdata.to_csv(os.path.join(processed_path, "rawdata.csv"))
-        self.metadata.to_csv(os.path.join("../data/meta/", "metadata.csv"))
-        _save_tables(result_path, self._resulttables, fileformats=fileformats)
+        """
+        Saves the result tables in `fileformats` ("xlsx", "csv", "parquet", "feather"), optionally skipping
+        tables that did not change since the last save (see `utility._save_tables`), and the processed data.
+        With `workbook_per_dataset`, the Excel tables of each dataset are saved as sheets of one workbook.
+        """
+        self.run(until="results")
+        processed, rawdata, metadata = self.processed, self.rawdata, self.metadata
+        resulttables = self._resulttables
+        with self._profiler.stage("save_tables") as record:
+            pathlib.Path(processed_path).mkdir(parents=True, exist_ok=True)
+            processed.to_csv(os.path.join(processed_path, "processed.csv"))
+            rawdata.to_csv(os.path.join(processed_path, "rawdata.csv"))
+            metadata.to_csv(os.path.join("../data/meta/", "metadata.csv"))
+            _save_tables(
+                result_path,
+                resulttables,
+                fileformats=fileformats,
+                skip_unchanged=skip_unchanged,
+                workbook_per_dataset=workbook_per_dataset,
+            )
+            record["rows"] = len(resulttables)
 
     def save_results(
         self,
@@ -873,12 +1344,51 @@ class PrimaryScreen(Experiment):
         processed_path: str,
         figureformats: list[str] = ["svg", "html"],
         tableformats: list[str] = ["xlsx", "csv"],
+        save_profile: bool = False,
+        n_jobs: int | None = 1,
+        skip_unchanged_figures: bool = False,
+        skip_unchanged_tables: bool = False,
+        workbook_per_dataset: bool = False,
+        figure_data_files: bool = False,
+        figure_budget: FigureBudget | None = None,
     ):
-        self.save_figures(figures_path, fileformats=figureformats)
-        self.save_tables(tables_path, processed_path, fileformats=tableformats)
+        """
+        Saves figures and tables. With `save_profile`, the profile of all stages is saved
+        as `profile.json` next to the result tables.
+        `n_jobs`, `skip_unchanged_figures`, `figure_data_files` (as `data_files`) and `figure_budget` (as `budget`)
+        are passed on to `save_figures`, `skip_unchanged_tables` and `workbook_per_dataset` to `save_tables`.
+        """
+        self.save_figures(
+            figures_path,
+            fileformats=figureformats,
+            n_jobs=n_jobs,
+            skip_unchanged=skip_unchanged_figures,
+            data_files=figure_data_files,
+            budget=figure_budget,
+        )
+        self.save_tables(
+            tables_path,
+            processed_path,
+            fileformats=tableformats,
+            skip_unchanged=skip_unchanged_tables,
+            workbook_per_dataset=workbook_per_dataset,
+        )
+        if save_profile:
+            self.save_profile(os.path.join(tables_path, "profile.json"))
 
 
 class MIC(Experiment):  # Minimum Inhibitory Concentration
+    _stages = {
+        "rawdata": "rawdata",
+        "input": "_inputdata",
+        "mapped": "mapped_input_df",
+        "processed": "processed",
+        "mic": "mic_df",
+        "results": "results",
+        "figures": "_resultfigures",
+    }
+    _plateheatmaps_file_basename = "{measurement}_plateheatmaps"
+
     def __init__(
         self,
         rawfiles_folderpath,
@@ -904,16 +1414,21 @@ class MIC(Experiment):  # Minimum Inhibitory Concentration
             f"{row}24" for row in string.ascii_uppercase[:16]
         ],
         precip_exclude_outlier: bool = False,
+        precip_loq_per_plate: bool = False,
         precip_conc_multiplicator: float = 2.0,
         molecule_df: pd.DataFrame | None = None,
         molecule_external_id_column: str = "External ID",
         molecule_column: str = "mol",
         cyt10_matrixheader_mapping: Dict[str, str] = {"Results": "Raw Optical Density"},
+        cache_dir: str | None = None,
+        trace_memory: bool = False,
     ):
         super().__init__(
             rawfiles_folderpath,
             plate_type,
             resultmatrix_header_mapping=cyt10_matrixheader_mapping,
+            cache_dir=cache_dir,
+            trace_memory=trace_memory,
         )
         self._measurement_labels = cyt10_matrixheader_mapping.values()
         self._inputfile_path = inputfile_path
@@ -922,6 +1437,7 @@ class MIC(Experiment):  # Minimum Inhibitory Concentration
         self._measurement_label = measurement_label
         self._mp_barcode_header = mp_barcode_header
         self._mp_position_header = mp_position_header
+        self._substance_id = substance_id
         self._molecule_df = molecule_df
         self._molecule_external_id_column = molecule_external_id_column
         self._molecule_column = molecule_column
@@ -932,37 +1448,101 @@ class MIC(Experiment):  # Minimum Inhibitory Concentration
                 precipitation_rawfilepath,
                 background_locations=precip_background_locations,
                 exclude_outlier=precip_exclude_outlier,
+                loq_per_plate=precip_loq_per_plate,
             )
         )
+        if self.precipitation is not None:
+            # Record the precipitation stages in the profile of this experiment
+            self.precipitation._profiler = self._profiler
+            self.precipitation._profile_prefix = "precipitation_"
         self.precip_conc_multiplicator = precip_conc_multiplicator
-        self.rawdata = (  # Overwrite rawdata if precipitation data is available
-            self.rawdata
-            if self.precipitation is None
-            else add_precipitation(
-                self.rawdata, self.precipitation.results, self._mapping_dict
-            )
-        )
-        self._substances_unmapped, self._organisms, self._dilutions, self._controls = (
-            read_inputfile(inputfile_path, substance_id)
-        )
-
         self._negative_controls = negative_controls
         self._blanks = blanks
         self._norm_by_barcode = norm_by_barcode
         if thresholds is None:
             thresholds = [50.0]
         self.thresholds = thresholds
-        self._processed_only_substances = (
-            self.processed[  # Negative Control is still there!
-                (self.processed["Dataset"] != "Reference")
-                & (self.processed["Dataset"] != "Positive Control")
-                & (self.processed["Dataset"] != "Blank")
-            ]
+        self._exclude_negative_zfactor = exclude_negative_zfactors
+
+    @cached_property
+    def rawdata(self) -> pd.DataFrame:
+        return (  # Add precipitation to the rawdata if precipitation data is available
+            self._readerdata[0]
+            if self.precipitation is None
+            else add_precipitation(
+                self._readerdata[0], self.precipitation.results, self._mapping_dict
+            )
         )
-        self._references_results = self.processed.loc[
-            self.processed["Dataset"] == "Reference"
+
+    def _stage_inputs(self, name: str) -> dict | None:
+        if name == "input":
+            return {
+                "inputfile": _as_path(self._inputfile_path),
+                "substance_id": self._substance_id,
+            }
+        if name == "mapped":
+            return {
+                "rawdata": self._stage_key("rawdata"),
+                "input": self._stage_key("input"),
+                "mp_ast_mappingfile": _as_path(self._mp_ast_mapping_filepath),
+                "ast_acd_mappingfile": _as_path(self._ast_acd_mapping_filepath),
+                "precipitation": None if self.precipitation is None else self.precipitation._cache_inputs,
+                "mp_barcode_header": self._mp_barcode_header,
+                "mp_position_header": self._mp_position_header,
+                "molecule_df": self._molecule_df,
+                "molecule_external_id_column": self._molecule_external_id_column,
+                "molecule_column": self._molecule_column,
+            }
+        if name == "processed":
+            return {
+                "mapped": self._stage_key("mapped"),
+                "negative_controls": self._negative_controls,
+                "blanks": self._blanks,
+                "norm_by_barcode": self._norm_by_barcode,
+            }
+        if name == "mic":
+            return {
+                "processed": self._stage_key("processed"),
+                "input": self._stage_key("input"),
+                "thresholds": self.thresholds,
+            }
+        return super()._stage_inputs(name)
+
+    @stage("input")
+    def _inputdata(self) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        return read_inputfile(self._inputfile_path, self._substance_id)
+
+    @cached_property
+    def _substances_unmapped(self) -> pd.DataFrame:
+        return self._inputdata[0]
+
+    @cached_property
+    def _organisms(self) -> pd.DataFrame:
+        return self._inputdata[1]
+
+    @cached_property
+    def _dilutions(self) -> pd.DataFrame:
+        return self._inputdata[2]
+
+    @cached_property
+    def _controls(self) -> pd.DataFrame:
+        return self._inputdata[3]
+
+    @cached_property
+    def _processed_only_substances(self) -> pd.DataFrame:
+        return self.processed[  # Negative Control is still there!
+            (self.processed["Dataset"] != "Reference")
+            & (self.processed["Dataset"] != "Positive Control")
+            & (self.processed["Dataset"] != "Blank")
         ]
-        self.substances_precipitation = (
+
+    @cached_property
+    def _references_results(self) -> pd.DataFrame:
+        return self.processed.loc[self.processed["Dataset"] == "Reference"]
+
+    @cached_property
+    def substances_precipitation(self) -> pd.DataFrame | None:
+        return (
             None
             if self.precipitation is None or self.precipitation.results.empty
             else (
@@ -986,35 +1566,26 @@ class MIC(Experiment):  # Minimum Inhibitory Concentration
                 .reset_index(drop=True)
             )
         )
-        def get_min_precip_conc_df(self):
-            if (self.precipitation is None or self.precipitation.results.empty) and (not self.substances_precipitation):
-                return None
-            else:
-                precip_grps = []
-                # precip_df = self.substances_precipitation
-                for (int_id, ast_barcode), grp in self.substances_precipitation.groupby(
-                    ["Internal ID", "AsT Barcode 384"]
-                    ):
-                    grp = grp.sort_values("Concentration")
-                    min_precip_conc = None
-                    if grp.Precipitated.any():
-                        min_precip_conc = grp["Concentration"][grp["Precipitated"].idxmax()] * self.precip_conc_multiplicator
-                    grp["Minimum Precipitation Concentration"] = min_precip_conc
-                    precip_grps.append(grp)
-                precip_df = pd.concat(precip_grps)
-                precip_df = precip_df[["Internal ID", "Minimum Precipitation Concentration"]]
-                return precip_df
-        self.substances_minimum_precipitation_conc = get_min_precip_conc_df(self)
-        self._exclude_negative_zfactor = exclude_negative_zfactors
-        self.mic_df = self.get_mic_df(
-                # self.processed.copy()
-            df = self.processed[
+
+    @cached_property
+    def substances_minimum_precipitation_conc(self) -> pd.DataFrame | None:
+        """
+        Minimum precipitation concentration (times `precip_conc_multiplicator`) per substance.
+        """
+        if self.substances_precipitation is None:
+            return None
+        return minimum_precipitation_concentrations(
+            self.substances_precipitation, self.precip_conc_multiplicator
+        )
+
+    @stage("mic")
+    def mic_df(self) -> pd.DataFrame:
+        return self.get_mic_df(
+            df=self.processed[
                 (self.processed["Dataset"] != "Negative Control") & (self.processed["Dataset"] != "Blank")
             ].dropna(subset=["Concentration"]).copy()
         ).reset_index(drop=True)
 
-
-
     def _validate_mapping_dicts(self, mp_ast_mapping_dict, ast_acd_mapping_dict):
         invalid_mp_ast = sorted(
             {
@@ -1113,18 +1684,13 @@ class MIC(Experiment):  # Minimum Inhibitory Concentration
             mapping_dict[mp_barcode] = tmp_dict
         return mapping_dict
 
-    @cached_property
+    @stage("mapped")
     def mapped_input_df(self):
         """
         Does mapping of the inputfile describing the tested substances with the
         corresponding mappingfile(s).
         """
 
-        # Sorting of organisms via Rack is **very** important, otherwise data gets attributed to wrong organisms
-        organisms = list(self._organisms.sort_values(by="Rack")["Organism"])
-        formatted_organisms = list(self._organisms.sort_values(by="Rack")["Organism formatted"])
-
-
         orig_barcodes = list(map(str, self._substances_unmapped[self._mp_barcode_header].unique()))
         with open(self._mp_ast_mapping_filepath) as file:
             filecontents = file.read().splitlines()
@@ -1182,52 +1748,14 @@ class MIC(Experiment):  # Minimum Inhibitory Concentration
         )
         num_replicates = list(set(replicates_dict.values()))[0]
 
-        single_subst_concentrations = []
-        for dataset in self._substances_unmapped["Dataset"].unique():
-            for substance, subst_row in self._substances_unmapped[self._substances_unmapped["Dataset"] == dataset].groupby("Internal ID"):
-                # Collect the concentrations each as rows for a single substance:
-                single_subst_conc_rows = []
-                init_pos = int(subst_row["Col_384"].iloc[0]) - 1
-                col_positions_384 = [list(range(1, 23, 2)), list(range(2, 23, 2))]
-                # Check if Input.xlsx "Dilutions" sheet contains "Dataset" column (different concentrations per dataset)
-                if "Dataset" in self._dilutions:
-                    dataset_concentrations = list(self._dilutions[self._dilutions["Dataset"] == dataset]["Concentration"].unique())
-                else:  # The same concentrations are used for all datasets
-                    dataset_concentrations = list(self._dilutions["Concentration"].unique())
-                for col_i, conc in enumerate(
-                    dataset_concentrations
-                ):
-                    # Add concentration:
-                    subst_row["Concentration"] = conc
-                    # Add corresponding column:
-                    subst_row["Col_384"] = int(col_positions_384[init_pos][col_i])
-                    single_subst_conc_rows.append(subst_row.copy())
-
-                # Concatenate all concentrations rows for a substance in a dataframe
-                if single_subst_conc_rows:
-                    single_subst_concentrations.append(pd.concat(single_subst_conc_rows))
-        # Concatenate all self._substances_unmapped dataframes to one whole
-        input_w_concentrations = pd.concat(single_subst_concentrations)
-
-        acd_dfs_list = []
-        for ast_barcode, ast_plate in input_w_concentrations.groupby("AsT Barcode 384"):
-            controls_with_barcode = self._controls.assign(**{"AsT Barcode 384": ast_barcode})
-            ast_plate = pd.concat([ast_plate, controls_with_barcode], ignore_index=True)
-
-            for org_i, organism in enumerate(organisms):
-                for replicate in range(num_replicates):
-                    # Add the AcD barcode
-                    ast_plate["AcD Barcode 384"] = acd_platemapping[ast_barcode][
-                        replicate
-                    ][org_i]
-
-                    ast_plate["Replicate"] = replicate + 1
-                    # Add the scientific Organism name
-                    ast_plate["Organism formatted"] = formatted_organisms[org_i]
-                    ast_plate["Organism"] = organism
-                    acd_dfs_list.append(ast_plate.copy())
-                    # Add concentrations:
-        acd_single_concentrations_df = pd.concat(acd_dfs_list)
+        acd_single_concentrations_df = expand_mic_layout(
+            self._substances_unmapped,
+            self._dilutions,
+            self._controls,
+            self._organisms,
+            acd_platemapping,
+            num_replicates,
+        )
 
         # merge rawdata with input specifications
         df = pd.merge(self.rawdata, acd_single_concentrations_df, how="outer").dropna(subset=["Internal ID"])
@@ -1237,10 +1765,11 @@ class MIC(Experiment):  # Minimum Inhibitory Concentration
                 self._molecule_df,
                 external_id=self._molecule_external_id_column,
                 mol_column=self._molecule_column,
+                cache=self._molecule_cache,
             )
         return df
 
-    @cached_property
+    @stage("processed")
     def processed(self):
         return preprocess(
             self.mapped_input_df,
@@ -1255,6 +1784,8 @@ class MIC(Experiment):  # Minimum Inhibitory Concentration
 
     # @cached_property
     def plateheatmap(self, df, measurement="Raw Optical Density"):
+        from .plot import plateheatmaps
+
         return plateheatmaps(
             df,
             substance_id="Internal ID",
@@ -1266,33 +1797,35 @@ class MIC(Experiment):  # Minimum Inhibitory Concentration
     # def lineplots_facet(self):
     #    return lineplots_facet(self.processed)
 
-    @cached_property
+    @stage("figures")
     def _resultfigures(self) -> list[Result]:
+        return [self._build_figure(name) for name in self.figure_names]
 
-        result_figures = []
-        for measurement_label in self._measurement_labels:
+    def _figure_builders(self):
+        from .plot import UpSetAltair, lineplots_facet, potency_distribution, get_zfactor_heatmap
 
-            result_figures.append(
-                Result("QualityControl", f"{measurement_label}_plateheatmaps", figure=self.plateheatmap(
-                    self.processed[self.processed["Measurement Type"] == measurement_label],
-                    measurement=measurement_label)
-                )
+        def upset(sub_df, title):
+            intersections = get_upset_intersections(
+                sub_df,
+                counts_column="Internal ID",
+                set_column="Organism",
+            )
+            return UpSetAltair(intersections, title=title, counts="count")
+
+        builders = {}
+        for measurement_label in self._measurement_labels:
+            measurement_processed = self.processed[self.processed["Measurement Type"] == measurement_label]
+            file_basename = self._plateheatmaps_file_basename.format(measurement=measurement_label)
+            builders["QualityControl", file_basename] = functools.partial(
+                self.plateheatmap, measurement_processed, measurement=measurement_label
             )
-            result_figures.append(
-                Result("QualityControl", f"{measurement_label}_zfactor_heatmap", figure=get_zfactor_heatmap(
-                    self.processed[self.processed["Measurement Type"] == measurement_label]
-                ))
+            builders["QualityControl", f"{measurement_label}_zfactor_heatmap"] = functools.partial(
+                get_zfactor_heatmap, measurement_processed
             )
         if (self.substances_precipitation is not None) and (
             not self.substances_precipitation.empty
         ):
-            result_figures.append(
-                Result(
-                    "QualityControl",
-                    "Precipitation_Heatmap",
-                    figure=self.precipitation.plateheatmap(),
-                )
-            )
+            builders["QualityControl", "Precipitation_Heatmap"] = self.precipitation.plateheatmap
 
         for measurement_label in self._measurement_labels:
             measurement_processed_only_substances = self._processed_only_substances[self._processed_only_substances["Measurement Type"] == measurement_label]
@@ -1341,29 +1874,27 @@ class MIC(Experiment):  # Minimum Inhibitory Concentration
                 ]
                 if not lineplots_input_df.empty:
                     for threshold in self.thresholds:
-                        result_figures.append(
-                            Result(
-                                dataset_name,
-                                f"{dataset_name}_{measurement_label}_lineplots_facet_thrsh{threshold}_InternalID",
-                                figure=lineplots_facet(
-                                    lineplots_input_df,
-                                    by_id="Internal ID",
-                                    exclude_negative_zfactors=self._exclude_negative_zfactor,
-                                    threshold=threshold,
-                                ),
-                            )
+                        builders[
+                            dataset_name,
+                            f"{dataset_name}_{measurement_label}_lineplots_facet_thrsh{threshold}_InternalID",
+                        ] = functools.partial(
+                            lineplots_facet,
+                            lineplots_input_df,
+                            by_id="Internal ID",
+                            exclude_negative_zfactors=self._exclude_negative_zfactor,
+                            threshold=threshold,
+                            aggregate=True,
                         )
-                        result_figures.append(
-                            Result(
-                                dataset_name,
-                                f"{dataset_name}_{measurement_label}_lineplots_facet_thrsh{threshold}_ExternalID",
-                                figure=lineplots_facet(
-                                    lineplots_input_df,
-                                    by_id="External ID",
-                                    exclude_negative_zfactors=self._exclude_negative_zfactor,
-                                    threshold=threshold,
-                                ),
-                            )
+                        builders[
+                            dataset_name,
+                            f"{dataset_name}_{measurement_label}_lineplots_facet_thrsh{threshold}_ExternalID",
+                        ] = functools.partial(
+                            lineplots_facet,
+                            lineplots_input_df,
+                            by_id="External ID",
+                            exclude_negative_zfactors=self._exclude_negative_zfactor,
+                            threshold=threshold,
+                            aggregate=True,
                         )
 
             # Save plots per threshold:
@@ -1379,27 +1910,13 @@ class MIC(Experiment):  # Minimum Inhibitory Concentration
                             f"No MICs for dataset: {dataset_name}, measurement: {measurement_label}, threshold: {threshold}"
                         )
                         continue
-                    dummy_df = get_upsetplot_df(
-                        sub_df,
-                        counts_column="Internal ID",
-                        set_column="Organism",
+                    builders[dataset_name, f"{dataset_name}_{measurement_label}_UpSetPlot"] = functools.partial(
+                        upset, sub_df, dataset_name
                     )
-
-                    result_figures.append(
-                        Result(
-                            dataset_name,
-                            f"{dataset_name}_{measurement_label}_UpSetPlot",
-                            figure=UpSetAltair(dummy_df, title=dataset_name),
-                        )
+                    builders[dataset_name, f"{dataset_name}_{measurement_label}_PotencyDistribution"] = (
+                        functools.partial(potency_distribution, sub_df, threshold, dataset_name)
                     )
-                    result_figures.append(
-                        Result(
-                            dataset_name,
-                            f"{dataset_name}_{measurement_label}_PotencyDistribution",
-                            figure=potency_distribution(sub_df, threshold, dataset_name),
-                        )
-                    )
-        return result_figures
+        return builders
 
     def get_mic_df(self, df):
 
@@ -1628,7 +2145,7 @@ class MIC(Experiment):  # Minimum Inhibitory Concentration
 
         return result_tables
 
-    @cached_property
+    @stage("results")
     def results(self):
         """
         Retrieves result tables (from self._resulttables)
@@ -1637,16 +2154,66 @@ class MIC(Experiment):  # Minimum Inhibitory Concentration
         """
         return {tbl.file_basename: tbl.table for tbl in self._resulttables}
 
-    def save_figures(self, result_path, fileformats: list[str] = ["svg", "html"]):
-        _save_figures(result_path, self._resultfigures, fileformats=fileformats)
+    def save_figures(
+        self,
+        result_path,
+        fileformats: list[str] = ["svg", "html"],
+        n_jobs: int | None = 1,
+        skip_unchanged: bool = False,
+        data_files: bool = False,
+        include: str | Sequence[str] | None = None,
+        exclude: str | Sequence[str] | None = None,
+        budget: FigureBudget | None = None,
+    ) -> pd.DataFrame:
+        """
+        Saves the figures, optionally rendered by `n_jobs` processes, skipping unchanged figures
+        and with the data of "html" and "json" figures in shared files (see `utility._save_figures`).
+        With `include`/`exclude` patterns, only the matching figures are built and saved (see `figures`),
+        e.g. `include="QualityControl/*"` for the quality control figures only.
+        Figures exceeding the `budget` are reported, too large plate heatmaps are saved as raster images.
+        Returns the build and rendering time, the data rows and the specification size of each file.
+        """
+        resultfigures = self.figures(include=include, exclude=exclude)
+        with self._profiler.stage("save_figures") as record:
+            timings = _save_figures(
+                result_path,
+                resultfigures,
+                fileformats=fileformats,
+                n_jobs=n_jobs,
+                skip_unchanged=skip_unchanged,
+                data_files=data_files,
+                budget=budget,
+            )
+            record["rows"] = len(resultfigures)
+        return timings
 
     def save_tables(
-        self, result_path, processed_path, fileformats: list[str] = ["xlsx", "csv"]
+        self,
+        result_path,
+        processed_path,
+        fileformats: list[str] = ["xlsx", "csv"],
+        skip_unchanged: bool = False,
+        workbook_per_dataset: bool = False,
     ):
-        # Create folder if not existent:
-        pathlib.Path(processed_path).mkdir(parents=True, exist_ok=True)
-        self.processed.to_csv(os.path.join(processed_path, "processed.csv"))
-        _save_tables(result_path, self._resulttables, fileformats=fileformats)
+        """
+        Saves the result tables in `fileformats` ("xlsx", "csv", "parquet", "feather"), optionally skipping
+        tables that did not change since the last save (see `utility._save_tables`), and the processed data.
+        With `workbook_per_dataset`, the Excel tables of each dataset are saved as sheets of one workbook.
+        """
+        self.run(until="results")
+        processed, resulttables = self.processed, self._resulttables
+        with self._profiler.stage("save_tables") as record:
+            # Create folder if not existent:
+            pathlib.Path(processed_path).mkdir(parents=True, exist_ok=True)
+            processed.to_csv(os.path.join(processed_path, "processed.csv"))
+            _save_tables(
+                result_path,
+                resulttables,
+                fileformats=fileformats,
+                skip_unchanged=skip_unchanged,
+                workbook_per_dataset=workbook_per_dataset,
+            )
+            record["rows"] = len(resulttables)
 
     def save_results(
         self,
@@ -1655,6 +2222,34 @@ class MIC(Experiment):  # Minimum Inhibitory Concentration
         processed_path: str,
         figureformats: list[str] = ["svg", "html"],
         tableformats: list[str] = ["xlsx", "csv"],
+        save_profile: bool = False,
+        n_jobs: int | None = 1,
+        skip_unchanged_figures: bool = False,
+        skip_unchanged_tables: bool = False,
+        workbook_per_dataset: bool = False,
+        figure_data_files: bool = False,
+        figure_budget: FigureBudget | None = None,
     ):
-        self.save_figures(figures_path, fileformats=figureformats)
-        self.save_tables(tables_path, processed_path, fileformats=tableformats)
+        """
+        Saves figures and tables. With `save_profile`, the profile of all stages is saved
+        as `profile.json` next to the result tables.
+        `n_jobs`, `skip_unchanged_figures`, `figure_data_files` (as `data_files`) and `figure_budget` (as `budget`)
+        are passed on to `save_figures`, `skip_unchanged_tables` and `workbook_per_dataset` to `save_tables`.
+        """
+        self.save_figures(
+            figures_path,
+            fileformats=figureformats,
+            n_jobs=n_jobs,
+            skip_unchanged=skip_unchanged_figures,
+            data_files=figure_data_files,
+            budget=figure_budget,
+        )
+        self.save_tables(
+            tables_path,
+            processed_path,
+            fileformats=tableformats,
+            skip_unchanged=skip_unchanged_tables,
+            workbook_per_dataset=workbook_per_dataset,
+        )
+        if save_profile:
+            self.save_profile(os.path.join(tables_path, "profile.json"))
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Persistent cache for molecule identifiers (InChI, InChIKey) and rendered structure images.
+
+Entries are keyed by a hash of the canonical SMILES of a molecule (and the render options for images),
+so each structure is converted and drawn by RDKit only once, also across experiments and runs.
+The cache is a SQLite database with least recently used (LRU) eviction.
+Conversions of many molecules can be run in chunks by worker processes (see `map_molecules`).
+"""
+
+import concurrent.futures
+import functools
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+import warnings
+from collections.abc import Callable, Iterable, Sequence
+from typing import Any
+
+# RDKit is imported in the functions using it (see utility.py)
+
+# SQLite limits the number of parameters of a query
+_QUERY_CHUNKSIZE = 500
+
+
+class MoleculeCache:
+    """
+    Persistent LRU cache of bytes values in a SQLite database at `path`.
+
+    When more than `max_entries` entries or `max_bytes` bytes are stored,
+    the least recently used entries are removed (None disables the limit).
+    The database is opened on first use, the cache can be shared between threads.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        max_entries: int | None = 100_000,
+        max_bytes: int | None = 1 << 30,
+    ):
+        self.path = pathlib.Path(path)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Connections can not be pickled (e.g. for worker processes), reopen on first use
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        state["_lock"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries "
+                "(key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, bytes]:
+        """
+        Returns the cached values of `keys` (missing keys are left out) and marks them as used.
+        """
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            connection = self._connect()
+            for start in range(0, len(keys), _QUERY_CHUNKSIZE):
+                chunk = keys[start : start + _QUERY_CHUNKSIZE]
+                rows = connection.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                )
+                found.update(rows)
+            if found:
+                now = time.time()
+                connection.executemany(
+                    "UPDATE entries SET last_used = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                connection.commit()
+        return found
+
+    def set_many(self, items: dict[str, bytes]) -> None:
+        """
+        Stores the values of `items` and evicts the least recently used entries if the cache is full.
+        """
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.executemany(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                [(key, value, len(value), now) for key, value in items.items()],
+            )
+            self._evict(connection)
+            connection.commit()
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        if self.max_entries is not None:
+            connection.execute(
+                "DELETE FROM entries WHERE key IN "
+                "(SELECT key FROM entries ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        if self.max_bytes is not None:
+            connection.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM "
+                "(SELECT key, SUM(size) OVER (ORDER BY last_used DESC, key) AS total FROM entries) "
+                "WHERE total > ?)",
+                (self.max_bytes,),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def clear(self) -> None:
+        """
+        Removes all entries.
+        """
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM entries")
+            connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+def _cache_key(kind: str, smiles: str, **options) -> str:
+    from rdkit import rdBase
+
+    description = json.dumps([kind, smiles, options, rdBase.rdkitVersion], sort_keys=True)
+    return hashlib.sha256(description.encode()).hexdigest()
+
+
+def _apply_chunk(function: Callable, molecules: list, from_binary: bool) -> list[tuple[Any, str | None]]:
+    """
+    Applies `function` to each molecule of a chunk, returns (result, error) pairs.
+    """
+    from rdkit import Chem
+
+    results = []
+    for molecule in molecules:
+        if molecule is None:
+            results.append((None, None))
+            continue
+        try:
+            results.append((function(Chem.Mol(molecule) if from_binary else molecule), None))
+        except Exception as exc:
+            results.append((None, f"{type(exc).__name__}: {exc}"))
+    return results
+
+
+def map_molecules(
+    function: Callable,
+    mols: Sequence,
+    n_jobs: int | None = 1,
+    chunksize: int = 1000,
+) -> tuple[list, dict[int, str]]:
+    """
+    Applies `function(mol)` to each RDKit molecule in `mols`.
+
+    With `n_jobs` > 1 (None: number of CPUs), chunks of at most `chunksize` molecules are processed by spawned
+    worker processes (`function` has to be picklable, e.g. a module level function or `functools.partial`).
+    Molecules are sent to the workers in RDKit's binary format (without properties).
+    A molecule that fails does not stop the others.
+    Returns the results in the order of `mols` (None for missing or failed molecules)
+    and the errors of the failed molecules by position.
+    """
+    if chunksize < 1:
+        raise ValueError(f"chunksize has to be positive, got {chunksize}.")
+    n_jobs = n_jobs or os.cpu_count() or 1
+    # At most `chunksize` molecules per chunk, but at least one chunk per worker
+    chunksize = max(1, min(chunksize, -(-len(mols) // n_jobs)))
+    chunks = [list(mols[start : start + chunksize]) for start in range(0, len(mols), chunksize)]
+    n_jobs = min(n_jobs, len(chunks))
+    if n_jobs <= 1:
+        chunk_results = [_apply_chunk(function, chunk, from_binary=False) for chunk in chunks]
+    else:
+        binary_chunks = [[None if mol is None else mol.ToBinary() for mol in chunk] for chunk in chunks]
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=n_jobs, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            chunk_results = list(
+                executor.map(functools.partial(_apply_chunk, function, from_binary=True), binary_chunks)
+            )
+    results, errors = [], {}
+    for position, (result, error) in enumerate(pair for chunk in chunk_results for pair in chunk):
+        results.append(result)
+        if error is not None:
+            errors[position] = error
+    return results, errors
+
+
+def _cached(
+    mols: Sequence,
+    compute: Callable,
+    kind: str,
+    cache: MoleculeCache | None,
+    n_jobs: int | None = 1,
+    **options,
+) -> list[bytes | None]:
+    """
+    Applies `compute(mol) -> bytes` once per unique structure (canonical SMILES) of `mols`
+    (see `map_molecules` for `n_jobs`), reusing and filling `cache`.
+    Returns None for missing and failed molecules, failures are reported as a warning.
+    """
+    from rdkit import Chem
+
+    smiles = [None if mol is None else Chem.MolToSmiles(mol) for mol in mols]
+    keys = {smi: _cache_key(kind, smi, **options) for smi in smiles if smi is not None}
+    found = {} if cache is None else cache.get_many(keys.values())
+    missing = {}  # first molecule of each structure that is not cached
+    for mol, smi in zip(mols, smiles):
+        if smi is not None and keys[smi] not in found:
+            missing.setdefault(keys[smi], mol)
+    values, errors = map_molecules(compute, list(missing.values()), n_jobs=n_jobs)
+    computed = {key: value for key, value in zip(missing, values) if value is not None}
+    if errors:
+        first_error = next(iter(errors.values()))
+        warnings.warn(
+            f"Could not compute {kind} of {len(errors)} molecule(s), e.g. {first_error}",
+            RuntimeWarning,
+            stacklevel=3,
+        )
+    if cache is not None:
+        cache.set_many(computed)
+    values = found | computed
+    return [None if smi is None else values.get(keys[smi]) for smi in smiles]
+
+
+def _identifiers(mol) -> bytes:
+    from rdkit import Chem
+
+    return json.dumps([Chem.MolToInchi(mol), Chem.MolToInchiKey(mol)]).encode()
+
+
+def _image(mol, size: tuple[int, int], image_format: str) -> bytes:
+    from rdkit.Chem import Draw
+
+    buffer = io.BytesIO()
+    Draw.MolToImage(mol, size=size).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def molecule_identifiers(
+    mols: Sequence, cache: MoleculeCache | None = None, n_jobs: int | None = 1
+) -> list[tuple[str, str] | tuple[None, None]]:
+    """
+    Returns (InChI, InChIKey) for each RDKit molecule in `mols` ((None, None) for missing molecules).
+    """
+    return [
+        (None, None) if value is None else tuple(json.loads(value))
+        for value in _cached(mols, _identifiers, "identifiers", cache, n_jobs=n_jobs)
+    ]
+
+
+def molecule_images(
+    mols: Sequence,
+    cache: MoleculeCache | None = None,
+    size: tuple[int, int] = (300, 300),
+    image_format: str = "png",
+    n_jobs: int | None = 1,
+) -> list[bytes | None]:
+    """
+    Returns the structure image (`Draw.MolToImage`) of each RDKit molecule in `mols`
+    as encoded bytes in `image_format` (None for missing molecules).
+    """
+    compute = functools.partial(_image, size=tuple(size), image_format=image_format)
+    return _cached(
+        mols, compute, "image", cache, n_jobs=n_jobs, size=list(size), image_format=image_format
+    )
@@ -6,7 +6,7 @@ import pathlib
 from typing import Sequence, Mapping, TypeAlias
 from .utility import (
     prepare_visualization,
-    get_upsetplot_df,
+    get_upset_intersections,
 )
 from .process import (
     get_thresholded_subset,
@@ -23,20 +23,52 @@ ChartLike: TypeAlias = (  # type alias for various Altair chart subtypes
 )
 
 
-def get_heatmap(
+# Columns shown in the tooltips of the plate heatmaps by default (if present)
+HEATMAP_TOOLTIP_COLUMNS = [
+    "Internal ID",
+    "External ID",
+    "Organism",
+    "Dataset",
+    "Concentration",
+    "Replicate",
+    "AsT Barcode 384",
+    "AcD Barcode 384",
+    "Row_384",
+    "Col_384",
+    "Measurement",
+    "Relative Measurement",
+    "Z-Factor",
+    "Limit of Quantification",
+    "Precipitated",
+]
+
+
+def _tooltip_columns(
+    df: pd.DataFrame, tooltip: Sequence[str] | None, required: Sequence[str] = ()
+) -> list[str]:
+    """
+    Columns of `df` which are in `tooltip` (default: HEATMAP_TOOLTIP_COLUMNS) or `required`, in the order of `df`.
+    """
+    selected = set(HEATMAP_TOOLTIP_COLUMNS if tooltip is None else tooltip) | set(required)
+    return [column for column in df.columns if column in selected]
+
+
+def _heatmap_layers(
+    base: alt.Chart,
     subdf: pd.DataFrame,
     substance_id: str,
     measurement: str,
     negative_controls: str,
     blanks: str,
+    tooltip: list[str],
 ) -> alt.LayerChart:
-    subdf = subdf.round({"Measurement": 1})  # round the data to 1 decimal place
-    base = alt.Chart(
-        subdf,
-    ).encode(
+    """
+    Heatmap and text layers of plates, the color scale is derived from the controls in `subdf`.
+    """
+    base = base.encode(
         alt.X("Col_384:O").axis(labelAngle=0, orient="top").title(None),
         alt.Y("Row_384:O").title(None),
-        tooltip=list(subdf.columns),
+        tooltip=tooltip,
     )
     blank_mean = subdf[subdf[substance_id] == blanks]["Measurement"].mean()
     negative_mean = subdf[subdf[substance_id] == negative_controls]["Measurement"].mean()
@@ -57,6 +89,25 @@ def get_heatmap(
     return alt.layer(heatmap, text)
 
 
+def get_heatmap(
+    subdf: pd.DataFrame,
+    substance_id: str,
+    measurement: str,
+    negative_controls: str,
+    blanks: str,
+) -> alt.LayerChart:
+    subdf = subdf.round({"Measurement": 1})  # round the data to 1 decimal place
+    return _heatmap_layers(
+        alt.Chart(subdf),
+        subdf,
+        substance_id,
+        measurement,
+        negative_controls,
+        blanks,
+        tooltip=list(subdf.columns),
+    )
+
+
 def plateheatmaps(
     df: pd.DataFrame,
     substance_id: str = "ID",
@@ -64,6 +115,7 @@ def plateheatmaps(
     barcode: str = "Barcode",
     negative_control: str = "Negative Control",
     blank: str = "Medium",
+    tooltip: Sequence[str] | None = None,
 ) -> alt.HConcatChart:
     """
     Parameters:
@@ -72,34 +124,45 @@ def plateheatmaps(
         measurement (str): column name in df with the measurements to colorize via heatmaps
         negative_control (str): controls with organism + medium
         blank (str): controls with only medium (no organism and therefore no growth)
+        tooltip (list): columns shown in the tooltips (default: HEATMAP_TOOLTIP_COLUMNS)
 
     Plots heatmaps of the plates from df in a gridlike manner.
     Exclude unwanted plates, for example Blanks from the df outside this function, like so
     `df[df["Organism"] != "Blank"]`
     before plotting, otherwise it will appear as an extra plate.
+    Only the plotted and tooltip columns are embedded into the chart, as a single dataset
+    shared by all organisms (each organism filters the shared data).
     """
-    df = df.copy()
-    df["Col_384"] = df["Col_384"].astype(int)
+    tooltip = _tooltip_columns(
+        df, tooltip, required=[substance_id, barcode, "Organism", "Replicate", "Row_384", "Col_384", "Measurement"]
+    )
+    data = df[tooltip].copy()
+    data["Col_384"] = data["Col_384"].astype(int)
+    data = data.round({"Measurement": 1})  # round the data to 1 decimal place
     plots = []
-    for _, _organism_df in df.groupby("Organism"):
+    for organism, _organism_df in data.groupby("Organism"):
         plots.append(
-            get_heatmap(
+            _heatmap_layers(
+                alt.Chart(),
                 _organism_df,
                 substance_id,
                 measurement,
                 negative_control,
                 blank,
+                tooltip,
             )
             .facet(
+                data=data,
                 row=alt.Row(f"{barcode}:N"),
                 column=alt.Column("Replicate:N"),
                 title=alt.Title(
-                    _organism_df["Organism"].unique()[0],
+                    organism,
                     orient="top",
                     anchor="middle",
                     dx=-20,
                 ),
             )
+            .transform_filter(alt.datum["Organism"] == organism)
             .resolve_scale(color="shared")
             .resolve_axis(x="independent", y="independent")
         )
@@ -136,6 +199,8 @@ def get_zfactor_heatmap(
     y_rows: str = "AsT Barcode 384",
     x_cols: str = "Organism",
 ) -> ChartLike:
+    # One row per heatmap cell instead of one per well
+    df = df[[y_rows, x_cols, "Z-Factor", "Robust Z-Factor"]].drop_duplicates()
     base = alt.Chart(
         df,
         width=600,
@@ -239,6 +304,7 @@ def UpSetAltair(
     vertical_bar_label_size: int = 16,
     vertical_bar_padding: int = 20,
     set_labelstyle: str = "normal",
+    counts: str | None = None,
 ) -> ChartLike | None:
     """This function generates Altair-based interactive UpSet plots.
 
@@ -262,15 +328,21 @@ def UpSetAltair(
           vertical_bar_label_size (int): Font size of texts in the vertical bar chart on the top.
           vertical_bar_padding (int): Gap between a pair of bars in the vertical bar charts.
           set_labelstyle (str): "normal" (default) or "italic"
+          counts (str): Column with the number of elements of each row, if the rows are already aggregated intersections.
 
-    Run rda.utility.get_upsetplot_df() on the df before trying this function.
+    Run rda.utility.get_upsetplot_df() (one row per element)
+    or rda.utility.get_upset_intersections() (one row per intersection, with counts="count") on the df before trying this function.
     """
 
     if data is None:
         print("No data and/or a list of sets are provided")
         return None
     if sets is None:
-        sets = list(data.columns[1:])
+        sets = (
+            list(data.columns[1:])
+            if counts is None
+            else [column for column in data.columns if column not in (counts, "degree")]
+        )
 
     if (height_ratio < 0) or (1 < height_ratio):
         print("height_ratio set to 0.5")
@@ -312,9 +384,9 @@ def UpSetAltair(
     Data Preprocessing
     """
     data = data.copy()
-    data["count"] = 0
+    data["count"] = 1 if counts is None else data[counts]
     data = data[list(sets) + ["count"]]
-    data = data.groupby(list(sets)).count().reset_index()
+    data = data.groupby(list(sets))["count"].sum().reset_index()
 
     data["intersection_id"] = data.index
     data["degree"] = data[sets].sum(axis=1)
@@ -602,7 +674,7 @@ def UpSet_per_dataset(
 ) -> None:
     """
     UpsetPlot wrapper function which applies threshold to processed data (without controls, references etc.).
-    For each dataset present in the given df, create a dummy_df for rda.UpSetAltair() and save the UpSetPlot.
+    For each dataset present in the given df, count the intersections for rda.UpSetAltair() and save the UpSetPlot.
     """
     subset = get_thresholded_subset(
         df,
@@ -614,13 +686,13 @@ def UpSet_per_dataset(
 
     for dataset, sub_df in subset.groupby("Dataset"):
         dataset_name = str(dataset)
-        dummy_df = get_upsetplot_df(sub_df, counts_column=id_column)
+        intersections = get_upset_intersections(sub_df, counts_column=id_column)
         # Create dataset folder if non-existent
         pathlib.Path(f"../figures/{dataset_name}").mkdir(parents=True, exist_ok=True)
         for save_format in save_formats:
             filename = f"../figures/{dataset_name}/UpSetPlot_{dataset_name}.{save_format}"
             print("Saving", filename)
-            dataset_upsetplot = UpSetAltair(dummy_df, title=dataset_name)
+            dataset_upsetplot = UpSetAltair(intersections, title=dataset_name, counts="count")
             if dataset_upsetplot is not None:
                 dataset_upsetplot.save(filename)
 
@@ -632,12 +704,17 @@ def lineplots_facet(
     whisker_width: int = 10,
     exclude_negative_zfactors: bool = True,
     threshold: float = 50.0,
+    aggregate: bool = False,
+    show_replicates: bool = False,
 ) -> alt.HConcatChart:
     """
     Assay: MIC
     Input: processed_df
     Output: Altair Chart with faceted lineplots.
     Negative controls and blanks are dropped inside the function.
+    With `aggregate`, the layers share one row per substance, organism and concentration of each plot
+    (see `aggregate_lineplot_data`) instead of one row per replicate, which makes the charts a lot smaller.
+    The measurements of the single replicates are then only shown (as points) with `show_replicates`.
     """
     df = prepare_visualization(
         df, by_id=by_id, exclude_negative_zfactors=exclude_negative_zfactors, threshold=threshold
@@ -649,7 +726,24 @@ def lineplots_facet(
         alt.Color(f"{by_id}:N"),
         alt.value("lightgray"),
     )
+    tooltip = [
+        "Internal ID",
+        "External ID",
+        "Organism",
+        "Dataset",
+        "Concentration",
+        "Used Replicates",
+        "Relative Measurement",
+        "Mean Relative Measurement",
+        r"Std\. Relative Measurement",
+        "Z-Factor",
+    ]
+    if aggregate:
+        tooltip.remove("Relative Measurement")
+        tooltip[tooltip.index("Z-Factor")] = r"Min\. Z-Factor"
     for organism, org_data in df.groupby(["Organism"]):
+        if aggregate:
+            org_data = aggregate_lineplot_data(org_data, by_id=by_id, replicates=show_replicates)
         base = alt.Chart(org_data).encode(color=color)  # , title=organism)
         lineplot = base.mark_line(point=True, size=0.8).encode(
             x=alt.X(
@@ -663,18 +757,7 @@ def lineplots_facet(
                 scale=alt.Scale(domain=[-20, 160], clamp=True),
             ),
             shape=alt.Shape(f"{by_id}:N", legend=None),
-            tooltip=[
-                "Internal ID",
-                "External ID",
-                "Organism",
-                "Dataset",
-                "Concentration",
-                "Used Replicates",
-                "Relative Measurement",
-                "Mean Relative Measurement",
-                r"Std\. Relative Measurement",
-                "Z-Factor",
-            ],
+            tooltip=tooltip,
         )
 
         error_bars = base.mark_rule().encode(
@@ -697,8 +780,20 @@ def lineplots_facet(
             color=alt.value("black"),
         )
 
+        layers = [lineplot, error_bars, uerror_whiskers, lerror_whiskers, hline]
+        if aggregate and show_replicates:
+            # The replicates are stored as a list per row of the shared data
+            layers.append(
+                base.transform_flatten(["Replicate Measurements"], as_=["Replicate Measurement"])
+                .mark_point(size=20, opacity=0.5)
+                .encode(
+                    x="Concentration:O",
+                    y="Replicate Measurement:Q",
+                    tooltip=[by_id, "Concentration", "Replicate Measurement:Q"],
+                )
+            )
         org_column = (
-            alt.layer(lineplot, error_bars, uerror_whiskers, lerror_whiskers, hline)
+            alt.layer(*layers)
             .facet(
                 row="AsT Barcode 384",
                 column="AsT Plate Subgroup",
@@ -713,6 +808,39 @@ def lineplots_facet(
     return alt.hconcat(*organism_columns).configure_point(size=60)
 
 
+def aggregate_lineplot_data(
+    df: pd.DataFrame, by_id: str = "Internal ID", replicates: bool = False
+) -> pd.DataFrame:
+    """
+    Reduces the output of `prepare_visualization` to one row per substance, organism and concentration
+    of each plot (AsT plate and subgroup), with the mean, standard deviation and error bounds of the replicates.
+    The replicates are on different plates, their lowest Z-factor is kept ("Min. Z-Factor").
+    With `replicates`, the relative measurements of the replicates are kept as a list ("Replicate Measurements").
+    """
+    keys = [by_id, "Organism", "Concentration", "AsT Barcode 384", "AsT Plate Subgroup"]
+    # The statistics are already the same for all replicates
+    columns = [
+        "Internal ID",
+        "External ID",
+        "Dataset",
+        "Used Replicates",
+        "Mean Relative Measurement",
+        "Std. Relative Measurement",
+        "uerror",
+        "lerror",
+        "max_conc_below_threshold",
+        "at_all_conc_bigger_50",
+    ]
+    columns = [column for column in columns if column in df.columns and column not in keys]
+    groups = df.groupby(keys, sort=False, dropna=False)
+    aggregated = groups[columns].first()
+    if "Z-Factor" in df.columns:
+        aggregated["Min. Z-Factor"] = groups["Z-Factor"].min()
+    if replicates:
+        aggregated["Replicate Measurements"] = groups["Relative Measurement"].agg(list)
+    return aggregated.reset_index()
+
+
 def mic_hitstogram(
     data: pd.DataFrame, mic_col: str, title: str = "Count Distribution of Hits over Concentration"
 ) -> alt.LayerChart:
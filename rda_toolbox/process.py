@@ -6,7 +6,6 @@ import os
 import pathlib
 import warnings
 
-from scipy.stats import median_abs_deviation
 
 from .parser import (
     read_platemapping,
@@ -14,7 +13,7 @@ from .parser import (
     parse_readerfiles,
     read_inputfile,
 )
-from .utility import mic_assaytransfer_mapping, mapapply_96_to_384
+from .utility import mic_assaytransfer_mapping, mapapply_96_to_384, map_primary_layout
 
 
 def zfactor(positive_controls, negative_controls):
@@ -490,7 +489,7 @@ def primary_process_inputs(
     q_name="Quadrant",
 ):
     substances, organisms, dilutions, controls = read_inputfile(inputfile_path)
-    rawdata = parse_readerfiles(rawfiles_path)
+    rawdata, _ = parse_readerfiles(rawfiles_path)
     mapapply_96_to_384(
         substances, rowname=map_rowname, colname=map_colname, q_name=q_name
     )
@@ -502,25 +501,14 @@ def primary_process_inputs(
         childplate_column="AcD Barcode 384",
     )
 
-    control_wbarcodes = []
-    # multiply controls with number of AsT plates to later merge them with substances df
-    for origin_barcode in list(substances["AsT Barcode 384"].unique()):
-        controls_subdf = controls.copy()
-        controls_subdf["AsT Barcode 384"] = origin_barcode
-        control_wbarcodes.append(controls_subdf)
-    controls_n_barcodes = pd.concat(control_wbarcodes)
-
-    ast_plate_df = pd.merge(
-        pd.concat([substances, controls_n_barcodes]), dilutions, how="outer"
-    )
-
-    mapped_organisms = pd.merge(mapping_df, organisms)
-
-    result_df = pd.concat(
-        [
-            pd.merge(org_df, ast_plate_df)
-            for _, org_df in pd.merge(mapped_organisms, rawdata).groupby("Organism")
-        ]
+    result_df = map_primary_layout(
+        rawdata,
+        mapping_df,
+        organisms,
+        substances,
+        controls,
+        dilutions,
+        organism_column="Organism",
     )
 
     for ast_barcode, ast_plate in result_df.groupby("AsT Barcode 384"):
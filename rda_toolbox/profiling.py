@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Per-stage profiling of experiments (wall time, CPU time, peak memory and row counts).
+"""
+
+import contextlib
+import json
+import time
+import tracemalloc
+
+import pandas as pd
+
+
+def count_rows(value) -> int | None:
+    """
+    Number of rows of a stage output: DataFrames (first one of a tuple) and lists/dicts (number of entries).
+    """
+    if isinstance(value, pd.DataFrame):
+        return len(value)
+    if isinstance(value, tuple) and value and isinstance(value[0], pd.DataFrame):
+        return len(value[0])
+    if isinstance(value, (list, dict)):
+        return len(value)
+    return None
+
+
+class StageProfiler:
+    """
+    Records wall time, CPU time, peak memory and the number of rows of each stage.
+
+    Times are exclusive: if a stage triggers the computation of another stage
+    (e.g. `processed` computing `mapped_input_df` on first access),
+    the nested stage is recorded separately and its time is not counted for the outer stage.
+    Peak memory (MiB above the traced memory at the start of the stage) is only recorded
+    if `trace_memory` is set or `tracemalloc` is already tracing, since tracing slows down the computation.
+    """
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.records: list[dict] = []
+        self._stack: list[dict] = []
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """
+        Context manager profiling a single stage. Yields a dict where the caller can set
+        `rows` and `from_cache` of the stage.
+        """
+        started_tracing = False
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            if self._stack:  # keep the peak of the outer stage up to here
+                self._stack[-1]["peak"] = max(
+                    self._stack[-1]["peak"],
+                    tracemalloc.get_traced_memory()[1] - self._stack[-1]["memory_start"],
+                )
+            tracemalloc.reset_peak()
+        frame = {
+            "rows": None,
+            "from_cache": False,
+            "child_wall": 0.0,
+            "child_cpu": 0.0,
+            "peak": 0,
+            "memory_start": tracemalloc.get_traced_memory()[0] if tracing else 0,
+        }
+        self._stack.append(frame)
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield frame
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            self._stack.pop()
+            if tracing and tracemalloc.is_tracing():
+                frame["peak"] = max(
+                    frame["peak"], tracemalloc.get_traced_memory()[1] - frame["memory_start"]
+                )
+                tracemalloc.reset_peak()
+            if started_tracing:
+                tracemalloc.stop()
+            if self._stack:
+                self._stack[-1]["child_wall"] += wall
+                self._stack[-1]["child_cpu"] += cpu
+        self.records.append(
+            {
+                "Stage": name,
+                "Wall Time (s)": wall - frame["child_wall"],
+                "CPU Time (s)": cpu - frame["child_cpu"],
+                "Peak Memory (MiB)": frame["peak"] / 2**20 if tracing else None,
+                "Rows": frame["rows"],
+                "From Cache": frame["from_cache"],
+            }
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame.from_records(
+            self.records,
+            columns=[
+                "Stage",
+                "Wall Time (s)",
+                "CPU Time (s)",
+                "Peak Memory (MiB)",
+                "Rows",
+                "From Cache",
+            ],
+        )
+
+    def to_json(self, filepath: str, **info) -> None:
+        """
+        Writes the records (and additional `info`, e.g. the toolbox version) to a JSON file.
+        """
+        with open(filepath, "w") as file:
+            json.dump({**info, "stages": self.records}, file, indent=2)
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Raster plate heatmaps for quality control of whole campaigns.
+
+The Vega based heatmaps (`plot.plateheatmaps`) embed every well as a data row and become slow to render
+for hundreds of plates. Here the wells of all plates are colored as one plates x rows x cols NumPy array
+and written as a single PNG mosaic (or as tiles of a fixed number of plates),
+with the barcode and Z-factors of each plate written above it.
+Writing PNGs requires Pillow (installed with RDKit).
+"""
+
+import base64
+import io
+import os
+import string
+import warnings
+from collections.abc import Sequence
+
+import numpy as np
+import pandas as pd
+
+# Anchor colors of the Vega color schemes used by the heatmaps in plot.py
+COLORMAPS = {
+    "yellowgreenblue": [
+        "#ffffd9", "#edf8b1", "#c7e9b4", "#7fcdbb", "#41b6c4", "#1d91c0", "#225ea8", "#253494", "#081d58",
+    ],
+    "redyellowblue": [
+        "#a50026", "#d73027", "#f46d43", "#fdae61", "#fee090", "#ffffbf",
+        "#e0f3f8", "#abd9e9", "#74add1", "#4575b4", "#313695",
+    ],
+}
+MISSING_COLOR = "#d9d9d9"  # wells without a measurement
+BACKGROUND_COLOR = "#ffffff"
+
+
+def _rgb(color: str) -> tuple[int, int, int]:
+    color = color.lstrip("#")
+    return tuple(int(color[i : i + 2], 16) for i in (0, 2, 4))
+
+
+def _lookup_table(colormap: str | Sequence[str], reverse: bool = False, n: int = 256) -> np.ndarray:
+    """
+    (n, 3) uint8 RGB lookup table linearly interpolated between the anchor colors of `colormap`.
+    """
+    colors = COLORMAPS[colormap] if isinstance(colormap, str) else list(colormap)
+    anchors = np.array([_rgb(color) for color in colors], dtype=float)
+    if reverse:
+        anchors = anchors[::-1]
+    positions = np.linspace(0, 1, len(anchors))
+    steps = np.linspace(0, 1, n)
+    return np.stack(
+        [np.interp(steps, positions, anchors[:, channel]) for channel in range(3)], axis=1
+    ).round().astype(np.uint8)
+
+
+def row_labels(n_rows: int) -> list[str]:
+    """
+    Row labels of a plate with `n_rows` rows (A, B, ..., Z, AA, AB, ...).
+    """
+    letters = string.ascii_uppercase
+    return [letters[i] if i < 26 else letters[i // 26 - 1] + letters[i % 26] for i in range(n_rows)]
+
+
+def plate_array(
+    df: pd.DataFrame,
+    plate: str | Sequence[str] = "AsT Barcode 384",
+    measurement: str = "Measurement",
+    shape: tuple[int, int] = (16, 24),
+) -> tuple[np.ndarray, pd.DataFrame]:
+    """
+    Arranges the wells of `df` (columns Row_384 and Col_384) as a plates x rows x cols float array.
+
+    Plates are the unique values of the `plate` column(s) in order of appearance,
+    wells without a row in `df` are NaN.
+    Returns the array and a DataFrame of the `plate` columns with one row per plate.
+    """
+    plate = [plate] if isinstance(plate, str) else list(plate)
+    codes = df.groupby(plate, sort=False, dropna=False).ngroup().to_numpy()
+    plates = df[plate].drop_duplicates().reset_index(drop=True)
+    rows = df["Row_384"].map({label: i for i, label in enumerate(row_labels(shape[0]))})
+    cols = pd.to_numeric(df["Col_384"], errors="coerce") - 1
+    valid = rows.notna().to_numpy() & cols.between(0, shape[1] - 1).to_numpy()
+    values = np.full((len(plates), *shape), np.nan)
+    values[codes[valid], rows[valid].astype(int), cols[valid].astype(int)] = pd.to_numeric(
+        df.loc[valid, measurement], errors="coerce"
+    )
+    return values, plates
+
+
+def colorize(
+    values: np.ndarray,
+    vmin: float | np.ndarray | None = None,
+    vmax: float | np.ndarray | None = None,
+    colormap: str | Sequence[str] = "yellowgreenblue",
+    reverse: bool = False,
+) -> np.ndarray:
+    """
+    Maps a plates x rows x cols array to RGB colors (uint8, shape plates x rows x cols x 3).
+
+    `vmin` and `vmax` are the ends of the color scale, either for all plates or per plate
+    (default: minimum and maximum of all values), values outside are clipped. NaN is MISSING_COLOR.
+    If `vmin` is above `vmax`, the scale is reversed (like a descending Vega domain): `vmin` gets the first color.
+    """
+    with warnings.catch_warnings():  # all values NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        vmin = np.nanmin(values) if vmin is None else vmin
+        vmax = np.nanmax(values) if vmax is None else vmax
+    # Per plate limits are broadcast over the wells of the plate
+    vmin = np.reshape(np.asarray(vmin, dtype=float), (-1, 1, 1))
+    vmax = np.reshape(np.asarray(vmax, dtype=float), (-1, 1, 1))
+    descending = vmin > vmax
+    vmin, vmax = np.where(descending, vmax, vmin), np.where(descending, vmin, vmax)
+    span = np.where(vmax > vmin, vmax - vmin, 1.0)
+    lookup_table = _lookup_table(colormap, reverse=reverse)
+    with np.errstate(invalid="ignore"):
+        scaled = np.clip((values - vmin) / span, 0, 1)
+        scaled = np.where(descending, 1 - scaled, scaled) * (len(lookup_table) - 1)
+    missing = np.isnan(scaled)
+    colors = lookup_table[np.where(missing, 0, scaled).round().astype(np.intp)]
+    colors[missing] = _rgb(MISSING_COLOR)
+    return colors
+
+
+def plate_mosaic(
+    colors: np.ndarray,
+    labels: Sequence[str] | None = None,
+    cell_size: int = 4,
+    columns: int | None = None,
+    gap: int = 6,
+    label_lines: int = 3,
+) -> np.ndarray:
+    """
+    Arranges colored plates (plates x rows x cols x 3, see `colorize`) in a grid of `columns` plates per row
+    (default: about square), each well `cell_size` pixels wide.
+    Above each plate, up to `label_lines` lines of its label are written (cut to the width of the plate).
+    Returns the image as a height x width x 3 uint8 array.
+    """
+    n_plates, n_rows, n_cols, _ = colors.shape
+    columns = columns or max(1, int(np.ceil(np.sqrt(n_plates * n_rows / n_cols))))
+    grid_rows = max(1, -(-n_plates // columns))
+    label_height = 11 * label_lines if labels is not None else 0
+    plate_height, plate_width = n_rows * cell_size, n_cols * cell_size
+    tile_height, tile_width = label_height + plate_height + gap, plate_width + gap
+
+    # All plates are placed with one reshape of a grid_rows x columns x tile array
+    tiles = np.empty((grid_rows * columns, tile_height, tile_width, 3), dtype=np.uint8)
+    tiles[:] = _rgb(BACKGROUND_COLOR)
+    tiles[:n_plates, label_height : label_height + plate_height, :plate_width] = colors.repeat(
+        cell_size, axis=1
+    ).repeat(cell_size, axis=2)
+    image = (
+        tiles.reshape(grid_rows, columns, tile_height, tile_width, 3)
+        .transpose(0, 2, 1, 3, 4)
+        .reshape(grid_rows * tile_height, columns * tile_width, 3)
+    )
+    if labels is not None:
+        from PIL import Image, ImageDraw, ImageFont
+
+        canvas = Image.fromarray(image)
+        draw = ImageDraw.Draw(canvas)
+        # The bitmap font is much faster to draw than the default TrueType font (6 x 11 pixels per character)
+        font = ImageFont.load_default_imagefont()
+        max_characters = plate_width // 6
+        for position, label in enumerate(labels[:n_plates]):
+            row, column = divmod(position, columns)
+            lines = [line[:max_characters] for line in str(label).split("\n")[:label_lines]]
+            draw.multiline_text(
+                (column * tile_width, row * tile_height), "\n".join(lines), fill=(0, 0, 0), font=font, spacing=0
+            )
+        image = np.asarray(canvas)
+    return image
+
+
+def to_png(image: np.ndarray, compress_level: int = 1) -> bytes:
+    """
+    Encodes an RGB image array as PNG (low compression levels are much faster for large mosaics).
+    """
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format="png", compress_level=compress_level)
+    return buffer.getvalue()
+
+
+def plate_labels(
+    plates: pd.DataFrame,
+    df: pd.DataFrame | None = None,
+    zfactors: Sequence[str] = ("Z-Factor", "Robust Z-Factor"),
+) -> list[str]:
+    """
+    Label per plate: the value of the first plate column, the values of the other plate columns
+    (second line) and the Z-factor columns of `df` (last line, first value per plate).
+    """
+    labels = plates.iloc[:, 0].astype(str)
+    if len(plates.columns) > 1:
+        second_line = plates.iloc[:, 1].astype(str)
+        for column in plates.columns[2:]:
+            second_line = second_line + " " + plates[column].astype(str)
+        labels = labels + "\n" + second_line
+    zfactors = [column for column in zfactors if df is not None and column in df.columns]
+    if zfactors:
+        plate_columns = list(plates.columns)
+        per_plate = plates.merge(
+            df.groupby(plate_columns, sort=False, dropna=False)[zfactors].first().reset_index(),
+            on=plate_columns,
+            how="left",
+        )
+        abbreviations = {"Z-Factor": "Z", "Robust Z-Factor": "rZ"}
+        zfactor_line = pd.Series("", index=per_plate.index)
+        for column in zfactors:
+            values = per_plate[column].map("{:.2f}".format).astype(str)  # also without plates
+            zfactor_line = zfactor_line + f"{abbreviations.get(column, column)}=" + values + " "
+        labels = labels + "\n" + zfactor_line.str.rstrip()
+    return labels.tolist()
+
+
+def raster_plateheatmaps(
+    df: pd.DataFrame,
+    substance_id: str = "ID",
+    barcode: str = "AsT Barcode 384",
+    negative_control: str = "Negative Control",
+    blank: str = "Medium",
+    plates_per_tile: int | None = None,
+    cell_size: int = 4,
+    columns: int | None = None,
+    colormap: str | Sequence[str] = "yellowgreenblue",
+) -> list[np.ndarray]:
+    """
+    Raster version of `plot.plateheatmaps` for many plates.
+
+    One plate per `barcode` (and Replicate if present), each colored between the mean of its organisms
+    `blank` and `negative_control` wells (like the Vega heatmaps) and labeled with barcode and Z-factors.
+    Returns one mosaic image, or one per `plates_per_tile` plates (use `to_png` or `save_plate_mosaics`),
+    no images if `df` has no rows.
+    """
+    if df.empty:
+        return []
+    plate_columns = [column for column in (barcode, "Organism", "Replicate") if column in df.columns]
+    values, plates = plate_array(df, plate_columns)
+    if "Organism" in df.columns:
+        # Color scale per organism, as in plateheatmaps
+        measurement = pd.to_numeric(df["Measurement"], errors="coerce")
+        blank_means = measurement[df[substance_id] == blank].groupby(df["Organism"]).mean()
+        negative_means = measurement[df[substance_id] == negative_control].groupby(df["Organism"]).mean()
+        vmin = plates["Organism"].map(blank_means).to_numpy(dtype=float)
+        vmax = plates["Organism"].map(negative_means).to_numpy(dtype=float)
+        # Organisms without controls fall back to their plates range (NaN for plates without measurements)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            vmin = np.where(np.isnan(vmin), np.nanmin(values, axis=(1, 2)), vmin)
+            vmax = np.where(np.isnan(vmax), np.nanmax(values, axis=(1, 2)), vmax)
+    else:
+        vmin, vmax = None, None
+    colors = colorize(values, vmin, vmax, colormap=colormap)
+    labels = plate_labels(plates, df)
+    plates_per_tile = plates_per_tile or max(1, len(plates))
+    return [
+        plate_mosaic(
+            colors[start : start + plates_per_tile],
+            labels[start : start + plates_per_tile],
+            cell_size=cell_size,
+            columns=columns,
+        )
+        for start in range(0, len(plates), plates_per_tile)
+    ]
+
+
+def save_plate_mosaics(images: Sequence[np.ndarray], filepath_prefix: str | os.PathLike) -> list[str]:
+    """
+    Writes `images` as `<filepath_prefix>.png` (a single image) or `<filepath_prefix>_<i>.png` (tiles),
+    returns the written filepaths.
+    """
+    filepaths = []
+    for i, image in enumerate(images, start=1):
+        filepath = f"{filepath_prefix}.png" if len(images) == 1 else f"{filepath_prefix}_{i}.png"
+        with open(filepath, "wb") as file:
+            file.write(to_png(image))
+        filepaths.append(filepath)
+    return filepaths
+
+
+def image_chart(image: np.ndarray, title: str | None = None):
+    """
+    Altair chart showing a mosaic image (as embedded PNG) with a `mark_image` layer,
+    e.g. to show raster heatmaps in notebooks or next to other figures.
+    """
+    import altair as alt
+
+    height, width, _ = image.shape
+    url = "data:image/png;base64," + base64.b64encode(to_png(image, compress_level=6)).decode()
+    return (
+        alt.Chart(pd.DataFrame({"url": [url]}), title=title or "")
+        .mark_image(width=width, height=height, align="left", baseline="top")
+        .encode(x=alt.value(0), y=alt.value(0), url="url:N")
+        .properties(width=width, height=height)
+    )
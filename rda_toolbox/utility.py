@@ -5,22 +5,29 @@ import pandas as pd
 import string
 
 import base64
+import concurrent.futures
+import contextlib
+import gzip
+import hashlib
 import io
-import rdkit
-from rdkit.Chem import Draw
-from rdkit import Chem
+import json
 import math
+import multiprocessing
 import pathlib
 import os
+import time
+import warnings
 
-from io import BytesIO
-import xlsxwriter
 import re
 
-import altair as alt
+from collections.abc import Callable, Iterator, Sequence
+from dataclasses import dataclass
+from typing import Tuple, Any, TYPE_CHECKING
 
-from collections.abc import Sequence
-from typing import Tuple, Any
+# RDKit and Altair are slow to import and only needed for molecules and charts,
+# they are imported in the functions using them
+if TYPE_CHECKING:
+    from .molecules import MoleculeCache
 
 
 def get_rows_cols(platetype: int) -> tuple[int, int]:
@@ -175,48 +182,58 @@ def get_selection(df, threshold_value, x_column="Relative Measurement"):
     return selection_results
 
 
+def _set_memberships(df, set_column, counts_column):
+    """
+    Encodes the sets each element (`counts_column`) is in as integer bitmasks (bit i: i-th set of the sorted sets).
+    Returns the elements, their bitmasks and the set names.
+    """
+    pairs = df[[counts_column, set_column]].dropna().drop_duplicates()
+    element_codes, elements = pd.factorize(pairs[counts_column], sort=True)
+    set_codes, set_names = pd.factorize(pairs[set_column], sort=True)
+    if len(set_names) > 64:
+        raise ValueError(f"At most 64 sets are supported, got {len(set_names)}.")
+    masks = np.zeros(len(elements), dtype=np.uint64)
+    np.bitwise_or.at(masks, element_codes, np.left_shift(np.uint64(1), set_codes.astype(np.uint64)))
+    # remove any dots as they interfere with altairs plotting (and underscores like get_dummies prefixes)
+    set_names = [str(name).replace("_", "").replace(".", "") for name in set_names]
+    return elements, masks, set_names
+
+
+def _membership_matrix(masks: np.ndarray, n_sets: int) -> np.ndarray:
+    return ((masks[:, None] >> np.arange(n_sets, dtype=np.uint64)) & np.uint64(1)).astype(int)
+
+
 def get_upsetplot_df(df, set_column="Organism", counts_column="ID"):
     """
     Function to obtain a correctly formatted DataFrame.
     According to [UpSetR-shiny](https://github.com/hms-dbmi/UpSetR-shiny)
     this table is supposed to be encoded in binary and set up so that each column represents a set, and each row represents an element.
     If an element is in the set it is represented as a 1 in that position. If an element is not in the set it is represented as a 0.
-
-    *Thanks to: https://stackoverflow.com/questions/37381862/get-dummies-for-pandas-column-containing-list*
+    Use `get_upset_intersections` to directly count the elements of each intersection.
     """
-    tmp_df = (
-        df.groupby(counts_column)[set_column].apply(lambda x: x.unique()).reset_index()
-    )
-    dummies_df = (
-        pd.get_dummies(
-            tmp_df.join(
-                pd.Series(
-                    tmp_df[set_column]
-                    .apply(pd.Series)
-                    .stack()
-                    .reset_index(1, drop=True),
-                    name=set_column + "1",
-                )
-            )
-            .drop(set_column, axis=1)
-            .rename(columns={set_column + "1": set_column}),
-            columns=[set_column],
-        )
-        .groupby(counts_column, as_index=False)
-        .sum()
-    )
-    # remove "{set_column}_" from set column labels
-    dummies_df.columns = list(
-        map(
-            lambda x: "".join(x.split("_")[1:]) if x.startswith(set_column) else x,
-            dummies_df.columns,
-        )
-    )
-    # remove any dots as they interfere with altairs plotting.
-    dummies_df.columns = dummies_df.columns.str.replace(".", "")
+    elements, masks, set_names = _set_memberships(df, set_column, counts_column)
+    dummies_df = pd.DataFrame(_membership_matrix(masks, len(set_names)), columns=set_names)
+    dummies_df.insert(0, counts_column, elements)
     return dummies_df.drop(columns=["count"], errors="ignore")
 
 
+def get_upset_intersections(df, set_column="Organism", counts_column="ID") -> pd.DataFrame:
+    """
+    Counts the elements (`counts_column`) of each intersection of sets (`set_column`),
+    i.e. of each combination of sets the elements are exclusively in.
+    Returns one row per (non-empty) intersection with the membership of each set (0 or 1),
+    the number of elements ("count") and the number of sets ("degree"),
+    which can be plotted by `UpSetAltair(..., counts="count")`.
+    """
+    _, masks, set_names = _set_memberships(df, set_column, counts_column)
+    intersections, counts = np.unique(masks, return_counts=True)
+    membership = _membership_matrix(intersections, len(set_names))
+    intersections_df = pd.DataFrame(membership, columns=set_names)
+    intersections_df["count"] = counts
+    intersections_df["degree"] = membership.sum(axis=1)
+    return intersections_df
+
+
 def chunks(l, n):
     """
     Useful function if you want to put a certain amount
@@ -372,7 +389,191 @@ def mic_assaytransfer_mapping(
     return str(row_384), str(col_384), str(barcode_384_ast)
 
 
+def expand_mic_layout(
+    substances: pd.DataFrame,
+    dilutions: pd.DataFrame,
+    controls: pd.DataFrame,
+    organisms: pd.DataFrame,
+    acd_platemapping: dict,
+    num_replicates: int,
+    ast_barcode_header: str = "AsT Barcode 384",
+    acd_barcode_header: str = "AcD Barcode 384",
+) -> pd.DataFrame:
+    """
+    Expands MIC substances (already mapped to their AsT plate, `Row_384` and starting `Col_384`)
+    into the complete assay layout of all AcD plates.
+
+    The layout is built from a few cross joins instead of copying every plate:
+    - substances x dilution columns (every second column, one concentration per column)
+    - substances + controls for each AsT plate
+    - AsT plate x organisms (sorted by Rack) x replicates -> AcD barcode from `acd_platemapping`
+
+    `acd_platemapping` is the first return value of `read_platemapping` for the AsT -> AcD mappingfile,
+    i.e. `acd_platemapping[ast_barcode][replicate][organism_index]` is an AcD barcode.
+    """
+    # 11 concentrations fit on an AsT plate, the substance pairs alternate between odd and even columns
+    col_positions_384 = [list(range(1, 23, 2)), list(range(2, 23, 2))]
+
+    substances = substances.drop(columns=["Concentration"], errors="ignore").reset_index(drop=True)
+    substances["_row_order"] = np.arange(len(substances))
+    substances["_dataset_order"] = substances["Dataset"].map(
+        {dataset: i for i, dataset in enumerate(substances["Dataset"].unique())}
+    )
+    substances = substances[substances["Internal ID"].notna()]
+    # All rows of a substance (e.g. references used multiple times) use the columns of the first occurrence
+    start_col = (
+        substances.groupby(["Dataset", "Internal ID"], sort=False)["Col_384"]
+        .transform("first")
+        .astype(int)
+    )
+
+    # Check if Input.xlsx "Dilutions" sheet contains "Dataset" column (different concentrations per dataset)
+    if "Dataset" in dilutions:
+        concentrations = dilutions[["Dataset", "Concentration"]].drop_duplicates()
+        concentrations["_conc_idx"] = concentrations.groupby("Dataset", dropna=False).cumcount()
+        subst_conc = pd.merge(substances, concentrations, on="Dataset", how="inner")
+    else:  # The same concentrations are used for all datasets
+        concentrations = dilutions[["Concentration"]].drop_duplicates()
+        concentrations["_conc_idx"] = np.arange(len(concentrations))
+        subst_conc = pd.merge(substances, concentrations, how="cross")
+    if not concentrations.empty and concentrations["_conc_idx"].max() >= len(col_positions_384[0]):
+        raise ValueError(
+            f"At most {len(col_positions_384[0])} concentrations fit on an AsT plate, "
+            "please check the 'Dilutions' sheet of the input file."
+        )
+
+    subst_conc["Col_384"] = (
+        start_col.loc[subst_conc["_row_order"]].to_numpy() + 2 * subst_conc["_conc_idx"].to_numpy()
+    ).astype(int)
+    subst_conc = subst_conc.sort_values(
+        ["_dataset_order", "Internal ID", "_conc_idx", "_row_order"], kind="stable"
+    ).drop(columns=["_dataset_order", "_conc_idx", "_row_order"])
+    # Keep the concentration right behind the substance columns
+    subst_conc = subst_conc[
+        [col for col in subst_conc.columns if col != "Concentration"] + ["Concentration"]
+    ]
+
+    # Controls are placed on every AsT plate
+    ast_barcodes = sorted(subst_conc[ast_barcode_header].unique())
+    controls_per_plate = pd.merge(
+        pd.DataFrame({ast_barcode_header: ast_barcodes}), controls, how="cross"
+    )
+    controls_per_plate = controls_per_plate[
+        list(controls.columns) + [ast_barcode_header]
+    ]
+    ast_plates = pd.concat(
+        [subst_conc.assign(_is_control=False), controls_per_plate.assign(_is_control=True)],
+        ignore_index=True,
+    )
+    ast_plates["_plate_order"] = np.arange(len(ast_plates))
+    ast_plates = ast_plates.sort_values(
+        [ast_barcode_header, "_is_control", "_plate_order"], kind="stable"
+    ).drop(columns=["_is_control", "_plate_order"])
+
+    # Sorting of organisms via Rack is **very** important, otherwise data gets attributed to wrong organisms
+    organisms = organisms.sort_values(by="Rack")
+    acd_plates = pd.DataFrame(
+        [
+            (
+                ast_barcode,
+                acd_platemapping[ast_barcode][replicate][org_i],
+                replicate + 1,
+                organism_formatted,
+                organism,
+            )
+            for ast_barcode in ast_barcodes
+            for org_i, (organism, organism_formatted) in enumerate(
+                zip(organisms["Organism"], organisms["Organism formatted"])
+            )
+            for replicate in range(num_replicates)
+        ],
+        columns=[
+            ast_barcode_header,
+            acd_barcode_header,
+            "Replicate",
+            "Organism formatted",
+            "Organism",
+        ],
+    )
+    layout = pd.merge(acd_plates, ast_plates, on=ast_barcode_header, how="inner")
+    return layout[
+        list(ast_plates.columns)
+        + [acd_barcode_header, "Replicate", "Organism formatted", "Organism"]
+    ].reset_index(drop=True)
+
+
+# Columns of the plate lineage and the AsT plate layout which may also be in the rawdata of a primary screen
+PRIMARY_LINEAGE_COLUMNS = ("Replicate", "Rack", "Organism", "Organism formatted")
+PRIMARY_LAYOUT_COLUMNS = ("Dataset", "Internal ID", "External ID", "Concentration", "Unit")
+
+
+def _join_keys(
+    left: pd.DataFrame, right: pd.DataFrame, keys: list[str], optional_keys: Sequence[str] = ()
+) -> list[str]:
+    """
+    Join keys for merging `left` and `right`: the `keys` and the `optional_keys` present in both.
+    Raises a ValueError if the frames share any other column (instead of joining on it or duplicating it).
+    """
+    shared = [column for column in left.columns if column in right.columns]
+    unexpected = [column for column in shared if column not in keys and column not in optional_keys]
+    if unexpected:
+        raise ValueError(f"Unexpected columns {unexpected} in both tables, expected join keys {keys}.")
+    return keys + [column for column in optional_keys if column in shared]
+
+
+def map_primary_layout(
+    rawdata: pd.DataFrame,
+    mapping_df: pd.DataFrame,
+    organisms: pd.DataFrame,
+    substances: pd.DataFrame,
+    controls: pd.DataFrame,
+    dilutions: pd.DataFrame,
+    ast_barcode_header: str = "AsT Barcode 384",
+    acd_barcode_header: str = "AcD Barcode 384",
+    organism_column: str = "Organism formatted",
+) -> pd.DataFrame:
+    """
+    Attributes the rawdata of a primary screen to the substances and controls on the AsT plates.
+
+    A plate lineage table (AsT barcode -> AcD barcode, Replicate, Rack, Organism) is joined
+    to the rawdata via the AcD barcode, the AsT plate layout (substances, controls and dilutions)
+    is then joined in a single merge on the AsT barcode and well (`Row_384`, `Col_384`).
+    Plate or substance columns which are also in the rawdata (e.g. "Replicate" or "Dataset") are join keys
+    as well, any other column in both tables raises a ValueError.
+    The controls are repeated for every AsT plate via a cross join.
+    """
+    controls_n_barcodes = pd.merge(
+        pd.DataFrame({ast_barcode_header: substances[ast_barcode_header].unique()}),
+        controls,
+        how="cross",
+    )
+    ast_plate_df = pd.merge(
+        pd.concat([substances, controls_n_barcodes]),  # concatenate substances and controls
+        dilutions,  # merge with dilutions on column "Dataset"
+        how="outer",
+        on="Dataset",
+    )
+    lineage = pd.merge(mapping_df, organisms, on="Rack")
+    rawdata_lineage = pd.merge(
+        lineage,
+        rawdata,
+        on=_join_keys(lineage, rawdata, [acd_barcode_header], PRIMARY_LINEAGE_COLUMNS),
+        validate="one_to_many",
+    )
+    well_keys = [ast_barcode_header, "Row_384", "Col_384"]
+    result_df = pd.merge(
+        rawdata_lineage,
+        ast_plate_df,
+        how="inner",
+        on=_join_keys(rawdata_lineage, ast_plate_df, well_keys, PRIMARY_LAYOUT_COLUMNS),
+        validate="many_to_one",
+    )
+    return result_df.sort_values(organism_column, kind="stable").reset_index(drop=True)
+
+
 def mol_to_bytes(mol, format="png"):
+    from rdkit.Chem import Draw
+
     img = Draw.MolToImage(mol)
     buffer = io.BytesIO()
     img.save(buffer, format=format)
@@ -389,28 +590,85 @@ def imgbuffer_to_imgstr(imgbuffer, prefix="data:image/png;base64,", suffix=""):
     return img_tag
 
 
-def write_excel_MolImages(df: pd.DataFrame, filename: str, molcol_header: str):
+def write_excel_MolImages(
+    df: pd.DataFrame,
+    filename: str,
+    molcol_header: str,
+    image_size: int = 300,
+    image_scale: float = 0.5,
+    image_format: str = "png",
+    cache: "MoleculeCache | None" = None,
+    n_jobs: int | None = 1,
+):
     """
     Writes images (.png) of molecules structures into an excel file derived from the given dataframe.
+    See `_write_molimages_xlsx` for the image options.
     """
     if molcol_header not in df:
         raise ValueError(
             f"Missing {molcol_header} column in df."
         )
+    _write_molimages_xlsx(
+        filename,
+        df.drop(columns=[molcol_header]),
+        list(df[molcol_header]),
+        image_size=image_size,
+        image_scale=image_scale,
+        image_format=image_format,
+        cache=cache,
+        n_jobs=n_jobs,
+    )
 
-    df["img_buf"] = df[molcol_header].apply(lambda x: mol_to_bytes(x) if x else None)
-    writer = pd.ExcelWriter(filename, engine="xlsxwriter")
 
-    workbook = writer.book
+def _write_molimages_xlsx(
+    filename: str,
+    table: pd.DataFrame,
+    mols: list,
+    image_size: int = 300,
+    image_scale: float = 0.5,
+    image_format: str = "png",
+    cache: "MoleculeCache | None" = None,
+    n_jobs: int | None = 1,
+    chunksize: int = 10_000,
+) -> None:
+    """
+    Writes `table` into an Excel file (starting at column B) with the structure images of `mols` in column A.
+    Images are drawn with `image_size` pixels in `image_format` ("png", "jpeg", ...) and shown scaled by `image_scale`.
+    Rows are streamed in chunks of `chunksize` (xlsxwriter constant memory mode), each unique structure
+    is drawn once (see `molecules.molecule_images` for `cache` and `n_jobs`) and stored once in the file.
+    """
+    import xlsxwriter
+
+    from .molecules import molecule_images
+
+    shown_size = image_size * image_scale  # pixels
+    workbook = xlsxwriter.Workbook(filename, {"constant_memory": True, "strings_to_urls": False})
     worksheet = workbook.add_worksheet()
-    for i, imgbuf in enumerate(list(df["img_buf"]), start=1):
-        worksheet.set_column(0, 0, 20)
-        worksheet.set_row(i, 120)
-        worksheet.insert_image(
-            f"A{i+1}", "img.png", {"image_data": imgbuf, "x_scale": 0.5, "y_scale": 0.5}
+    worksheet.set_column(0, 0, shown_size / 7.5)  # character widths
+    header_format = workbook.add_format(XLSX_HEADER_FORMAT)
+    worksheet.write_row(0, 1, [str(column) for column in table.columns], header_format)
+    for start in range(0, len(table), chunksize):
+        chunk = table.iloc[start : start + chunksize]
+        images = molecule_images(
+            mols[start : start + chunksize],
+            cache=cache,
+            size=(image_size, image_size),
+            image_format=image_format,
+            n_jobs=n_jobs,
         )
 
-    df.drop(columns=["img_buf", molcol_header]).to_excel(writer, startcol=1, index=False)
+        def add_image(row_nr, images=images, start=start):
+            worksheet.set_row(row_nr, shown_size * 0.8)  # points
+            image = images[row_nr - start - 1]
+            if image is not None:
+                worksheet.insert_image(
+                    row_nr,
+                    0,
+                    f"molecule.{image_format}",
+                    {"image_data": io.BytesIO(image), "x_scale": image_scale, "y_scale": image_scale},
+                )
+
+        _write_xlsx_rows(workbook, worksheet, chunk, first_row=start + 1, first_col=1, before_row=add_image)
     workbook.close()
 
 
@@ -420,7 +678,16 @@ def add_molecule_data(
     external_id: str,
     mol_column: str = "mol",
     relevant_columns: list[str] = ["InChI", "InChI-Key", "mol_img"],
+    cache: "MoleculeCache | None" = None,
+    n_jobs: int | None = 1,
 ) -> pd.DataFrame:
+    """
+    Merges InChI, InChIKey and a base64 encoded structure image ("mol_img") of the molecules in `mol_df`
+    onto `data_df` via the "External ID".
+    Every unique structure is only converted once, with a `cache` (`molecules.MoleculeCache`)
+    also only once across runs. With `n_jobs` > 1, the molecules are converted by worker processes
+    (see `molecules.map_molecules`).
+    """
     if "External ID" not in data_df.columns:
         raise ValueError("Missing 'External ID' column in data_df.")
     if external_id not in mol_df.columns:
@@ -428,26 +695,20 @@ def add_molecule_data(
     if mol_column not in mol_df.columns:
         raise ValueError(f"Missing '{mol_column}' column in mol_df.")
 
-    mol_df = mol_df.copy().rename(columns={external_id: "External ID"})
-
-    def _mol_to_inchi(mol):
-        if mol is None:
-            return None
-        return Chem.MolToInchi(mol)
-
-    def _mol_to_inchi_key(mol):
-        if mol is None:
-            return None
-        return Chem.MolToInchiKey(mol)
-
-    def _mol_to_img(mol):
-        if mol is None:
-            return None
-        return imgbuffer_to_imgstr(mol_to_bytes(mol))
+    from .molecules import molecule_identifiers, molecule_images
 
-    mol_df["InChI"] = mol_df[mol_column].apply(_mol_to_inchi)
-    mol_df["InChI-Key"] = mol_df[mol_column].apply(_mol_to_inchi_key)
-    mol_df["mol_img"] = mol_df[mol_column].apply(_mol_to_img)
+    mol_df = mol_df.copy().rename(columns={external_id: "External ID"})
+    mols = list(mol_df[mol_column])
+
+    if {"InChI", "InChI-Key"} & set(relevant_columns):
+        identifiers = molecule_identifiers(mols, cache=cache, n_jobs=n_jobs)
+        mol_df["InChI"] = [inchi for inchi, _ in identifiers]
+        mol_df["InChI-Key"] = [inchi_key for _, inchi_key in identifiers]
+    if "mol_img" in relevant_columns:
+        mol_df["mol_img"] = [
+            None if image is None else imgbuffer_to_imgstr(io.BytesIO(image))
+            for image in molecule_images(mols, cache=cache, n_jobs=n_jobs)
+        ]
 
     data_mol_df = pd.merge(
         data_df, mol_df[["External ID"] + relevant_columns], on="External ID", how="left"
@@ -456,24 +717,40 @@ def add_molecule_data(
     return data_mol_df
 
 
-def smiles_to_imgstr(smiles):
+def smiles_to_imgstr(smiles, cache: "MoleculeCache | None" = None):
     """
     Converts a smiles string to a base64 encoded image string (e.g. for plotting in altair).
     It's a convenience function consisting of rda.utility.mol_to_bytes() and rda.utility.imgbuffer_to_imgstr(),
     use these if you want more fine grained control over the format of the returned string.
+    Images are reused from `cache` (`molecules.MoleculeCache`) if given.
     Example: df["image"] = df["smiles"].apply(lambda smiles: smiles_to_imgstr(smiles))
     """
-    return imgbuffer_to_imgstr(mol_to_bytes(Chem.MolFromSmiles(smiles)))
+    from rdkit import Chem
+
+    from .molecules import molecule_images
+
+    mol = Chem.MolFromSmiles(smiles)
+    if mol is None:
+        raise ValueError(f"Invalid SMILES: {smiles}")
+    return imgbuffer_to_imgstr(io.BytesIO(molecule_images([mol], cache=cache)[0]))
 
 
-def inchi_to_imgstr(inchi):
+def inchi_to_imgstr(inchi, cache: "MoleculeCache | None" = None):
     """
     Converts a inchi string to a base64 encoded image string (e.g. for plotting in altair).
     It's a convenience function consisting of rda.utility.mol_to_bytes() and rda.utility.imgbuffer_to_imgstr(),
     use these if you want more fine grained control over the format of the returned string.
+    Images are reused from `cache` (`molecules.MoleculeCache`) if given.
     Example: df["image"] = df["inchi"].apply(lambda inchi: inchi_to_imgstr(inchi))
     """
-    return imgbuffer_to_imgstr(mol_to_bytes(Chem.MolFromInchi(inchi)))
+    from rdkit import Chem
+
+    from .molecules import molecule_images
+
+    mol = Chem.MolFromInchi(inchi)
+    if mol is None:
+        raise ValueError(f"Invalid InChI: {inchi}")
+    return imgbuffer_to_imgstr(io.BytesIO(molecule_images([mol], cache=cache)[0]))
 
 
 def prepare_visualization(
@@ -489,62 +766,52 @@ def prepare_visualization(
     df = df.copy()
     if exclude_negative_zfactors:
         df = df[df["Z-Factor"] > 0]
-    df.loc[:, "Used Replicates"] = df.groupby([by_id, "Concentration", "Organism"])[
-        ["Replicate"]
-    ].transform("count")
-    df.loc[:, "Mean Relative Measurement"] = (
-        df.groupby([by_id, "Concentration", "Organism"])[["Relative Measurement"]]
-        .transform("mean")
-        .round(2)
-    )
-    df.loc[:, "Std. Relative Measurement"] = (
-        df.groupby([by_id, "Concentration", "Organism"])[["Relative Measurement"]]
-        .transform("std")
-        .round(2)
+    substance_keys = [by_id, "Organism"]
+    df = df.dropna(subset=substance_keys).sort_values(substance_keys, kind="stable")
+
+    stats = df.groupby([by_id, "Concentration", "Organism"]).agg(
+        **{
+            "Used Replicates": ("Replicate", "count"),
+            "Mean Relative Measurement": ("Relative Measurement", "mean"),
+            "Std. Relative Measurement": ("Relative Measurement", "std"),
+        }
     )
+    stats[["Mean Relative Measurement", "Std. Relative Measurement"]] = stats[
+        ["Mean Relative Measurement", "Std. Relative Measurement"]
+    ].round(2)
+    df = df.join(stats, on=[by_id, "Concentration", "Organism"])
     df.loc[:, "uerror"] = (
         df["Mean Relative Measurement"] + df["Std. Relative Measurement"]
     )
     df.loc[:, "lerror"] = (
         df["Mean Relative Measurement"] - df["Std. Relative Measurement"]
     )
-    tmp_list: list[pd.DataFrame] = []
-    for _, grp in df.groupby([by_id, "Organism"]):
-        # use replicate == 1 as the meaned OD is the same in all 3 replicates anyways
-        # print(grp)
-        maxconc_below_threshold = (
-            grp[
-                (grp["Replicate"] == 1)
-                & (grp["Concentration"] == grp["Concentration"].max())
-            ]["Mean Relative Measurement"]
-            < threshold
-        )
-        grp["max_conc_below_threshold"] = list(maxconc_below_threshold)[0]
-        tmp_list.append(grp)
-    df = pd.concat(tmp_list)
 
-    df["at_all_conc_bigger_50"] = df.groupby([by_id, "Organism"])[
-        ["Mean Relative Measurement"]
-    ].transform(lambda meas_per_conc: all([x > 50 for x in list(meas_per_conc)]))
+    # Mean at the highest concentration of each substance and organism,
+    # taken from replicate 1 if present (the mean is the same for all replicates anyways)
+    at_max_conc = df["Concentration"].eq(df.groupby(substance_keys)["Concentration"].transform("max"))
+    max_conc = df.loc[at_max_conc, substance_keys + ["Replicate", "Mean Relative Measurement"]]
+    max_conc = (
+        max_conc.assign(_other_replicate=max_conc["Replicate"].ne(1))
+        .sort_values("_other_replicate", kind="stable")
+        .drop_duplicates(substance_keys)
+        .set_index(substance_keys)["Mean Relative Measurement"]
+    )
+    df["max_conc_below_threshold"] = (max_conc < threshold).reindex(
+        pd.MultiIndex.from_frame(df[substance_keys]), fill_value=False
+    ).to_numpy()
+
+    df["at_all_conc_bigger_50"] = (
+        df["Mean Relative Measurement"].gt(50).groupby([df[by_id], df["Organism"]]).transform("all")
+    )
     # Bin observations into artificial categories for plotting later:
-    plot_groups = pd.DataFrame()
-    for _, grp in df.groupby(["AsT Barcode 384"]):
-        # divide the observations per plate into chunks
-        # number of chunks is defined by using a maximum of 10 colors/observations per plot
-        num_chunks = math.ceil(len(grp[by_id].unique()) / 10)
-        for nr, chunk in enumerate(list(chunks(grp[by_id].unique(), num_chunks))):
-            plot_groups = pd.concat(
-                [
-                    plot_groups,
-                    pd.DataFrame(
-                        {
-                            by_id: chunk,
-                            "AsT Plate Subgroup": sum([[nr] * len(chunk)], []),
-                        }
-                    ),
-                ]
-            ).reset_index(drop=True)
-    df = pd.merge(df, plot_groups)
+    # the substances of each plate are striped into chunks (see `chunks`),
+    # the number of chunks is defined by using a maximum of 10 colors/observations per plot
+    plot_groups = df[["AsT Barcode 384", by_id]].dropna().drop_duplicates()
+    per_plate = plot_groups.groupby("AsT Barcode 384")
+    num_chunks = np.ceil(per_plate[by_id].transform("size") / 10).astype(int)
+    plot_groups["AsT Plate Subgroup"] = per_plate.cumcount() % num_chunks
+    df = pd.merge(df, plot_groups, on=["AsT Barcode 384", by_id])
     return df
 
 
@@ -657,69 +924,589 @@ def get_minimum_precipitation_conc(
         return None
 
 
+def minimum_precipitation_concentrations(
+    df: pd.DataFrame,
+    precip_conc_multiplicator: float,
+    substance_id: str = "Internal ID",
+) -> pd.DataFrame:
+    """
+    Minimum concentration at which each substance precipitated (times `precip_conc_multiplicator`),
+    computed for all substances at once. Expects the columns `substance_id`, "Concentration" and "Precipitated".
+    Returns one row per substance (NaN if the substance never precipitated),
+    if a substance is on several plates the lowest concentration over all plates is used.
+    """
+    precipitated_conc = df["Concentration"].where(df["Precipitated"].eq(True))
+    return (
+        (precipitated_conc.groupby(df[substance_id]).min() * precip_conc_multiplicator)
+        .rename("Minimum Precipitation Concentration")
+        .reset_index()
+    )
+
+
+TABLE_FORMATS = {"xlsx": "xlsx", "excel": "xlsx", "csv": "csv", "parquet": "parquet", "feather": "feather"}
+TABLE_HASHES_FILENAME = ".table_hashes.json"
+# Header cells like pandas.DataFrame.to_excel
+XLSX_HEADER_FORMAT = {"bold": True, "border": 1, "align": "center", "valign": "top"}
+XLSX_DATETIME_FORMAT = {"num_format": "yyyy-mm-dd hh:mm:ss"}  # as DataFrame.to_excel
+
+
+def _write_xlsx_rows(
+    workbook,
+    worksheet,
+    table: pd.DataFrame,
+    first_row: int = 1,
+    first_col: int = 0,
+    before_row: Callable[[int], None] | None = None,
+) -> None:
+    """
+    Writes the values of `table` row by row (e.g. in xlsxwriter constant memory mode) like `DataFrame.to_excel`:
+    missing values as empty cells, infinite values as "inf"/"-inf" and datetimes with a date format.
+    `before_row` is called with the number of each row before it is written.
+    """
+    datetime_positions = [
+        i for i, dtype in enumerate(table.dtypes) if pd.api.types.is_datetime64_any_dtype(dtype)
+    ]
+    datetime_format = workbook.add_format(XLSX_DATETIME_FORMAT) if datetime_positions else None
+    values = table.astype(object).where(table.notna(), None).replace({np.inf: "inf", -np.inf: "-inf"})
+    for row_nr, row in enumerate(values.itertuples(index=False, name=None), start=first_row):
+        if before_row is not None:
+            before_row(row_nr)
+        worksheet.write_row(row_nr, first_col, row)
+        for i in datetime_positions:
+            if row[i] is not None:
+                worksheet.write_datetime(row_nr, first_col + i, row[i], datetime_format)
+
+
+def _sheet_names(names: list[str], prefix: str = "", reserved: Sequence[str] = ()) -> list[str]:
+    """
+    Deterministic, unique Excel sheet names for the given table names:
+    the common `prefix` (e.g. the dataset name) is removed, invalid characters are replaced
+    and names are truncated to 31 characters (duplicates get a "~2", "~3", ... suffix).
+    """
+    used = {name.lower() for name in reserved}  # Excel sheet names are case insensitive
+    sheet_names = []
+    for name in names:
+        if prefix and name.startswith(f"{prefix}_"):
+            name = name[len(prefix) + 1 :]
+        name = re.sub(r"[\[\]:*?/\\']", "_", name).strip() or "Sheet"
+        sheet_name = name[:31]
+        number = 2
+        while sheet_name.lower() in used:
+            suffix = f"~{number}"
+            sheet_name = name[: 31 - len(suffix)] + suffix
+            number += 1
+        used.add(sheet_name.lower())
+        sheet_names.append(sheet_name)
+    return sheet_names
+
+
+def _write_xlsx(
+    filepath: str,
+    sheets: list[tuple[str, str, pd.DataFrame, bool]],
+    index_sheet: bool = False,
+) -> None:
+    """
+    Writes tables (sheet name, table name, table, index) into one Excel workbook in a single pass.
+    Tables are written row by row with xlsxwriter in constant memory mode, unless a table has
+    multiple column levels (written by pandas with merged header cells).
+    With `index_sheet`, the first sheet ("Index") lists all tables with links to their sheets.
+    """
+    constant_memory = all(table.columns.nlevels == 1 for _, _, table, _ in sheets)
+    with pd.ExcelWriter(
+        filepath,
+        engine="xlsxwriter",
+        engine_kwargs={"options": {"constant_memory": constant_memory, "strings_to_urls": False}},
+    ) as writer:
+        workbook = writer.book
+        header_format = workbook.add_format(XLSX_HEADER_FORMAT)
+        if index_sheet:
+            worksheet = workbook.add_worksheet("Index")
+            worksheet.write_row(0, 0, ["Sheet", "Table", "Rows", "Columns"], header_format)
+            for row_nr, (sheet_name, table_name, table, _) in enumerate(sheets, start=1):
+                worksheet.write_url(row_nr, 0, f"internal:'{sheet_name}'!A1", string=sheet_name)
+                worksheet.write_row(row_nr, 1, [table_name, len(table), len(table.columns)])
+        for sheet_name, _, table, index in sheets:
+            if table.columns.nlevels > 1:
+                table.to_excel(writer, sheet_name=sheet_name, index=index)
+                continue
+            if index:
+                table = table.reset_index()
+            worksheet = workbook.add_worksheet(sheet_name)
+            worksheet.write_row(0, 0, [str(column) for column in table.columns], header_format)
+            _write_xlsx_rows(workbook, worksheet, table)
+
+
+def _write_table(table: pd.DataFrame, filepath: str, file_format: str, index: bool = False) -> None:
+    match file_format:
+        case "xlsx":
+            _write_xlsx(filepath, [("Sheet1", "", table, index)])
+        case "csv":
+            table.to_csv(filepath, index=index)
+        case "parquet":
+            table.to_parquet(filepath, index=index)
+        case "feather":
+            # Feather stores neither an index nor multiple column levels
+            if table.columns.nlevels > 1:
+                table = table.set_axis(
+                    [" ".join(str(level) for level in column if str(level)) for column in table.columns],
+                    axis=1,
+                )
+            (table.reset_index() if index else table.reset_index(drop=True)).to_feather(filepath)
+
+
+def _table_hash(table: pd.DataFrame, file_format: str) -> str:
+    from .cache import fingerprint
+
+    return hashlib.sha256(f"{file_format}|{fingerprint(table)}".encode()).hexdigest()
+
+
 def _save_tables(
-    resultpath: str, resulttables, fileformats: list[str] = ["xlsx", "csv"]
+    resultpath: str,
+    resulttables,
+    fileformats: list[str] = ["xlsx", "csv"],
+    n_jobs: int | None = None,
+    skip_unchanged: bool = False,
+    workbook_per_dataset: bool = False,
 ):
     """
     Save result tables to "<resultpath>".
     Creates corresponding folders for each dataset.
+    Supported formats: "xlsx" (or "excel"), "csv", "parquet" and "feather" (the latter two require pyarrow).
+    Tables are written concurrently by `n_jobs` threads (default: chosen by `concurrent.futures`).
+    With `skip_unchanged`, files are only written if the table changed since the last save
+    (the hashes are stored in "<resultpath>/.table_hashes.json").
+    With `workbook_per_dataset`, the "xlsx" tables of a dataset are written as sheets of one workbook
+    "<resultpath>/<dataset>/<dataset>_results.xlsx" (with an "Index" sheet) instead of one file per table.
     """
+    unknown_formats = [file_format for file_format in fileformats if file_format not in TABLE_FORMATS]
+    if unknown_formats:
+        raise ValueError(
+            f"Unknown table format(s) {unknown_formats}, expected one of: {', '.join(TABLE_FORMATS)}"
+        )
+    extensions = list(dict.fromkeys(TABLE_FORMATS[file_format] for file_format in fileformats))
+
+    hashes_path = os.path.join(resultpath, TABLE_HASHES_FILENAME)
+    previous_hashes = {}
+    if skip_unchanged and os.path.isfile(hashes_path):
+        with open(hashes_path) as file:
+            previous_hashes = json.load(file)
+    hashes = dict(previous_hashes)
+
+    def is_unchanged(filepath, table_hash):
+        key = os.path.relpath(filepath, resultpath)
+        hashes[key] = table_hash
+        return table_hash == previous_hashes.get(key) and os.path.exists(filepath)
+
+    tasks = []
+    workbooks = {}
     for result in resulttables:  # cached property of subclasses
         filedir = os.path.join(resultpath, result.dataset)
         pathlib.Path(filedir).mkdir(parents=True, exist_ok=True)
-        multiindex = False
-        if result.table.columns.nlevels > 1:  # Check whether multiple levels are on the columns
-            multiindex = True
-        if "xlsx" or "excel" in fileformats:
-            result.table.to_excel(
-                os.path.join(filedir, f"{result.file_basename}.xlsx"), index=multiindex
-            )
-        if "csv" in fileformats:
-            result.table.to_csv(
-                os.path.join(filedir, f"{result.file_basename}.csv"), index=multiindex
-            )
+        # Keep the index only if there are multiple levels on the columns
+        multiindex = result.table.columns.nlevels > 1
+        for extension in extensions:
+            if workbook_per_dataset and extension == "xlsx":
+                workbooks.setdefault(result.dataset, []).append((result.file_basename, result.table, multiindex))
+                continue
+            filepath = os.path.join(filedir, f"{result.file_basename}.{extension}")
+            if skip_unchanged and is_unchanged(filepath, _table_hash(result.table, extension)):
+                continue
+            tasks.append((_write_table, result.table, filepath, extension, multiindex))
+
+    for dataset, tables in workbooks.items():
+        filepath = os.path.join(resultpath, dataset, f"{dataset}_results.xlsx")
+        sheet_names = _sheet_names([name for name, _, _ in tables], prefix=dataset, reserved=["Index"])
+        sheets = [(sheet_name, *table) for sheet_name, table in zip(sheet_names, tables)]
+        if skip_unchanged:
+            workbook_hash = hashlib.sha256(
+                "|".join(f"{name}:{_table_hash(table, 'xlsx')}" for name, _, table, _ in sheets).encode()
+            ).hexdigest()
+            if is_unchanged(filepath, workbook_hash):
+                continue
+        tasks.append((_write_xlsx, filepath, sheets, True))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        futures = [executor.submit(*task) for task in tasks]
+        for future in concurrent.futures.as_completed(futures):
+            future.result()  # raise errors of the threads
+
+    if skip_unchanged:
+        with open(hashes_path, "w") as file:
+            json.dump(hashes, file, indent=2, sort_keys=True)
+
+
+FIGURE_HASHES_FILENAME = ".figure_hashes.json"
+FIGURE_SUMMARY_FILENAME = "figure_summary.csv"
+FIGURE_STATS_COLUMNS = ["Build Seconds", "Data Rows", "Spec Bytes", "Downgraded"]
+
+
+def _figure_spec_stats(chart) -> tuple[str, int, int]:
+    """
+    Measures the Vega-Lite specification of a chart (including the inlined data).
+    Returns the hash of the specification and the Altair version, the number of data rows and the size in bytes.
+    """
+    import altair as alt
+
+    with alt.data_transformers.enable("default"), alt.data_transformers.disable_max_rows():
+        spec = chart.to_dict(validate=False, context={"pre_transform": False})
+    serialized = json.dumps(spec, sort_keys=True, default=str).encode()
+    # The inline data of all (sub)charts is consolidated into the "datasets"
+    data_rows = sum(len(values) for values in spec.get("datasets", {}).values())
+    spec_hash = hashlib.sha256(alt.__version__.encode() + serialized).hexdigest()
+    return spec_hash, data_rows, len(serialized)
+
+
+@dataclass(frozen=True)
+class FigureBudget:
+    """
+    Limits for the size of result figures (None: not limited), checked by `_save_figures`.
+    Figures exceeding a limit are reported with a warning and, with `downgrade`, replaced by their fallback
+    figure if they have one (e.g. raster images instead of the Vega-Lite plate heatmaps).
+    """
+
+    max_spec_mb: float | None = 20.0
+    max_data_rows: int | None = None
+    downgrade: bool = True
+
+    def violations(self, data_rows: int, spec_bytes: int) -> list[str]:
+        violations = []
+        if self.max_spec_mb is not None and spec_bytes > self.max_spec_mb * 1e6:
+            violations.append(f"{spec_bytes / 1e6:.1f} MB > {self.max_spec_mb:g} MB")
+        if self.max_data_rows is not None and data_rows > self.max_data_rows:
+            violations.append(f"{data_rows} data rows > {self.max_data_rows}")
+        return violations
+
+
+FIGURE_DATA_DIRNAME = "data"
+FIGURE_DATA_MANIFEST_FILENAME = ".figure_data.json"
+# Formats which load the data in the browser, the other formats are rendered with the data inlined
+DATA_FILE_FORMATS = ("html", "json")
+
+
+def _externalize_datasets(spec: dict, data_dir: str, filedir: str) -> list[str]:
+    """
+    Moves the inline datasets of a Vega-Lite `spec` into JSON files in `data_dir` named by the hash of their content
+    (identical data of several figures is written once) and references them by URLs relative to `filedir`.
+    Returns the filenames of the data files used by the spec.
+    """
+    urls, filenames = {}, []
+    for name, values in spec.pop("datasets", {}).items():
+        content = json.dumps(values, separators=(",", ":"), default=str).encode()
+        filename = f"{hashlib.sha256(content).hexdigest()[:32]}.json"
+        filepath = os.path.join(data_dir, filename)
+        if not os.path.exists(filepath):
+            # Written under a temporary name, other workers may write the same file
+            temporary_path = f"{filepath}.{os.getpid()}.tmp"
+            with open(temporary_path, "wb") as file:
+                file.write(content)
+            os.replace(temporary_path, filepath)
+        urls[name] = pathlib.Path(os.path.relpath(filepath, filedir)).as_posix()
+        filenames.append(filename)
+
+    def replace_references(node):
+        if isinstance(node, dict):
+            name = node.get("name")
+            if isinstance(name, str) and name in urls and set(node) <= {"name", "format"}:
+                return {"url": urls[name], "format": {"type": "json"}}
+            return {key: replace_references(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [replace_references(value) for value in node]
+        return node
+
+    spec.update(replace_references(spec))
+    return filenames
+
+
+def _save_with_data_files(chart, filepath: str, data_dir: str) -> list[str]:
+    """
+    Saves a chart as "html" or "json" with its data in separate files (see `_externalize_datasets`).
+    """
+    import altair as alt
+
+    # The data is inlined and consolidated into the "datasets" of the spec first, as in `chart.save`
+    with alt.data_transformers.enable("default"), alt.data_transformers.disable_max_rows():
+        spec = chart.to_dict(context={"pre_transform": False})
+    filenames = _externalize_datasets(spec, data_dir, os.path.dirname(filepath))
+    if filepath.endswith(".html"):
+        content = alt.utils.spec_to_html(
+            spec,
+            mode="vega-lite",
+            vega_version=alt.VEGA_VERSION,
+            vegaembed_version=alt.VEGAEMBED_VERSION,
+            vegalite_version=alt.VEGALITE_VERSION,
+        )
+    else:
+        content = json.dumps(spec)
+    with open(filepath, "w", encoding="utf-8") as file:
+        file.write(content)
+    return filenames
+
+
+def _render_figure(
+    chart, filepath: str, previous_hash: str | None, spec_hash: str | None, data_dir: str | None = None
+) -> dict:
+    """
+    Saves a single figure (runs in a worker process), with the data in files in `data_dir` if given.
+    The figure is skipped if its `spec_hash` equals the `previous_hash` and the file exists.
+    Errors are returned instead of raised, so that a failing figure does not stop the others.
+    """
+    start = time.perf_counter()
+    record = {
+        "File": filepath,
+        "Seconds": None,
+        "Skipped": False,
+        "Spec Hash": spec_hash,
+        "Error": None,
+        "Data Files": None,
+    }
+    try:
+        if spec_hash is not None and spec_hash == previous_hash and os.path.exists(filepath):
+            record["Skipped"] = True
+        if not record["Skipped"]:
+            if data_dir is not None and filepath.endswith(DATA_FILE_FORMATS):
+                record["Data Files"] = _save_with_data_files(chart, filepath, data_dir)
+            else:
+                chart.save(filepath)
+    except Exception as exc:
+        record["Error"] = f"{type(exc).__name__}: {exc}"
+    record["Seconds"] = time.perf_counter() - start
+    return record
+
+
+def _failed_figure(task: tuple, exc: Exception) -> dict:
+    """
+    Record (as returned by `_render_figure`) of a figure whose rendering task failed in the worker pool.
+    """
+    _, filepath, _, spec_hash, _ = task
+    return {
+        "File": filepath,
+        "Seconds": None,
+        "Skipped": False,
+        "Spec Hash": spec_hash,
+        "Error": f"{type(exc).__name__}: {exc}",
+        "Data Files": None,
+    }
 
 
 def _save_figures(
-    resultpath: str, resultfigures, fileformats: list[str] = ["svg", "html"]
-):
+    resultpath: str,
+    resultfigures,
+    fileformats: list[str] = ["svg", "html"],
+    n_jobs: int | None = 1,
+    skip_unchanged: bool = False,
+    data_files: bool = False,
+    budget: FigureBudget | None = None,
+) -> pd.DataFrame:
+    """
+    Save result figures to "<resultpath>/<dataset>/<file_basename>.<format>".
+
+    With `n_jobs` > 1 (None: number of CPUs), figures are rendered in parallel by worker processes.
+    Worker processes are spawned, scripts have to guard their entry point with `if __name__ == "__main__":`.
+    A figure that fails to render does not stop the others, failures are reported as warnings.
+    With `skip_unchanged`, figures are only rendered if their Vega-Lite specification (or `data_files`) changed
+    since the last save (the hashes are stored in "<resultpath>/.figure_hashes.json").
+    With `data_files`, "html" and "json" figures load their data from JSON files in "<resultpath>/data/"
+    (named by content hash and shared between figures) instead of inlining it.
+    Browsers only load these files if the figures are served, e.g. by `python -m http.server` in `resultpath`.
+    Data files no longer used by any figure are removed.
+    Figures exceeding the `budget` are reported and downgraded to their fallback (see `FigureBudget`).
+    Returns the build and rendering time ("Seconds"), the number of data rows and the specification size
+    of each file, which are also written to "<resultpath>/figure_summary.csv".
+    """
+    hashes_path = os.path.join(resultpath, FIGURE_HASHES_FILENAME)
+    previous_hashes = {}
+    if skip_unchanged and os.path.isfile(hashes_path):
+        with open(hashes_path) as file:
+            previous_hashes = json.load(file)
+    data_dir = os.path.join(resultpath, FIGURE_DATA_DIRNAME) if data_files else None
+    if data_dir is not None:
+        pathlib.Path(data_dir).mkdir(parents=True, exist_ok=True)
+
+    tasks, figure_stats = [], {}
     for result in resultfigures:  # cached property of subclasses
         filedir = os.path.join(resultpath, result.dataset)
         pathlib.Path(filedir).mkdir(parents=True, exist_ok=True)
+        chart, stats = _budgeted_figure(result, budget)
         for file_format in fileformats:
-            print(f"Saving figure {result.file_basename}.{file_format} in {filedir}")
-            result.figure.save(
-                os.path.join(filedir, f"{result.file_basename}.{file_format}"),
-            )
+            filepath = os.path.join(filedir, f"{result.file_basename}.{file_format}")
+            key = os.path.relpath(filepath, resultpath)
+            spec_hash = stats["Spec Hash"] if skip_unchanged else None
+            if spec_hash is not None and data_dir is not None and file_format in DATA_FILE_FORMATS:
+                # Files with data files differ from files with inlined data of the same spec
+                spec_hash = f"{spec_hash}+data"
+            tasks.append((chart, filepath, previous_hashes.get(key), spec_hash, data_dir))
+            figure_stats[filepath] = stats
+
+    n_jobs = min(n_jobs or os.cpu_count() or 1, len(tasks))
+    records = []
+    if n_jobs <= 1:
+        for task in tasks:
+            records.append(_render_figure(*task))
+            _report_figure(records[-1])
+    else:
+        # spawn: forking after vl-convert started its threads can deadlock
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=n_jobs, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            # Bounded number of submitted figures, to not hold all pickled charts in the queue
+            pending, future_tasks = set(), {}
+
+            def collect(future):
+                try:
+                    records.append(future.result())
+                except Exception as exc:  # e.g. the chart could not be pickled or a worker crashed
+                    records.append(_failed_figure(future_tasks[future], exc))
+                _report_figure(records[-1])
+
+            for task in tasks:
+                if len(pending) >= 2 * n_jobs:
+                    done, pending = concurrent.futures.wait(
+                        pending, return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    for future in done:
+                        collect(future)
+                try:
+                    future = executor.submit(_render_figure, *task)
+                except Exception as exc:  # the pool is broken
+                    records.append(_failed_figure(task, exc))
+                    _report_figure(records[-1])
+                    continue
+                future_tasks[future] = task
+                pending.add(future)
+            for future in concurrent.futures.as_completed(pending):
+                collect(future)
+
+    if skip_unchanged:
+        hashes = dict(previous_hashes)
+        for record in records:
+            key = os.path.relpath(record["File"], resultpath)
+            if record["Error"] is None:
+                hashes[key] = record["Spec Hash"]
+            else:
+                hashes.pop(key, None)
+        with open(hashes_path, "w") as file:
+            json.dump(hashes, file, indent=2, sort_keys=True)
+    if data_dir is not None:
+        _update_figure_data_files(resultpath, records)
+
+    for record in records:
+        stats = figure_stats[record["File"]]
+        record.update({column: stats[column] for column in FIGURE_STATS_COLUMNS})
+    columns = ["File", "Build Seconds", "Seconds", *FIGURE_STATS_COLUMNS[1:], "Skipped", "Spec Hash", "Error"]
+    summary = pd.DataFrame.from_records(records, columns=columns)
+    summary.assign(File=[os.path.relpath(filepath, resultpath) for filepath in summary["File"]]).to_csv(
+        os.path.join(resultpath, FIGURE_SUMMARY_FILENAME), index=False
+    )
+    return summary
+
+
+def _budgeted_figure(result, budget: FigureBudget | None) -> tuple[Any, dict]:
+    """
+    Measures the figure of a result (see `_figure_spec_stats`) and replaces it by its fallback
+    if it exceeds the `budget`. Returns the chart to save and its statistics.
+    """
+    name = f"{result.dataset}/{result.file_basename}"
+    chart = result.figure
+    stats = {"Build Seconds": result.build_seconds, "Data Rows": None, "Spec Bytes": None, "Downgraded": False}
+    try:
+        stats["Spec Hash"], stats["Data Rows"], stats["Spec Bytes"] = _figure_spec_stats(chart)
+    except Exception:
+        # Reported when the figure fails to render
+        stats["Spec Hash"] = None
+        return chart, stats
+    violations = budget.violations(stats["Data Rows"], stats["Spec Bytes"]) if budget is not None else []
+    if not violations:
+        return chart, stats
+    message = f"Figure {name} exceeds the figure budget ({', '.join(violations)})"
+    if not budget.downgrade or result.fallback is None:
+        warnings.warn(f"{message}.", RuntimeWarning, stacklevel=4)
+        return chart, stats
+    start = time.perf_counter()
+    try:
+        fallback = result.fallback()
+        fallback_stats = _figure_spec_stats(fallback)
+    except Exception as exc:
+        # The budget check never stops the saving, the original figure is saved instead
+        warnings.warn(
+            f"{message}, its fallback failed ({type(exc).__name__}: {exc}) and it is saved unchanged.",
+            RuntimeWarning,
+            stacklevel=4,
+        )
+        return chart, stats
+    warnings.warn(f"{message}, it is saved as its fallback.", RuntimeWarning, stacklevel=4)
+    stats["Build Seconds"] = (stats["Build Seconds"] or 0.0) + time.perf_counter() - start
+    stats["Spec Hash"], stats["Data Rows"], stats["Spec Bytes"] = fallback_stats
+    stats["Downgraded"] = True
+    return fallback, stats
+
+
+def _update_figure_data_files(resultpath: str, records: list[dict]) -> None:
+    """
+    Records the data files used by each figure in "<resultpath>/.figure_data.json"
+    and removes the data files which are not used by any figure.
+    """
+    manifest_path = os.path.join(resultpath, FIGURE_DATA_MANIFEST_FILENAME)
+    manifest = {}
+    if os.path.isfile(manifest_path):
+        with open(manifest_path) as file:
+            manifest = json.load(file)
+    for record in records:
+        key = os.path.relpath(record["File"], resultpath)
+        if record["Data Files"] is not None:
+            manifest[key] = record["Data Files"]
+        elif not record["Skipped"] and record["Error"] is None:  # saved with inline data
+            manifest.pop(key, None)
+        # A failed figure keeps the data files of its previous version
+    with open(manifest_path, "w") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+
+    used = {filename for filenames in manifest.values() for filename in filenames}
+    data_dir = pathlib.Path(resultpath) / FIGURE_DATA_DIRNAME
+    for path in data_dir.glob("*.json"):
+        if path.name not in used:
+            path.unlink()
+
+
+def _report_figure(record: dict) -> None:
+    if record["Error"] is not None:
+        warnings.warn(
+            f"Could not save figure {record['File']} ({record['Error']}).",
+            RuntimeWarning,
+            stacklevel=3,
+        )
+    elif record["Skipped"]:
+        print(f"Skipping unchanged figure {record['File']}")
+    else:
+        print(f"Saved figure {record['File']} ({record['Seconds']:.2f} s)")
 
 
 def to_excel_molimages(
-    df: pd.DataFrame, filename: str, desired_columns: list[str], mol_col: str = "mol"
+    df: pd.DataFrame,
+    filename: str,
+    desired_columns: list[str],
+    mol_col: str = "mol",
+    image_size: int = 300,
+    image_scale: float = 0.5,
+    image_format: str = "png",
+    cache: "MoleculeCache | None" = None,
+    n_jobs: int | None = 1,
 ):
     """
     Writes a dataframe containing RDKit molecule objects to an excel file containing the molecular structures as PNG images.
     Needs a column in df with RDKit mol object (e.g. rdkit.Chem.MolFromInchi, MolFromMolBlock, MolFromSmiles etc.)
+    Each unique structure is drawn once, see `_write_molimages_xlsx` for the image options.
+    With `n_jobs` > 1, the molecules are drawn by worker processes (see `molecules.map_molecules`).
     """
-    writer = pd.ExcelWriter(filename, engine="xlsxwriter")
-    workbook = writer.book
-    # workbook = xlsxwriter.Workbook("images_bytesio.xlsx")
-    worksheet = workbook.add_worksheet()
-    df["PIL_img"] = df[mol_col].map(Draw.MolToImage)
-
-    def get_imgbuffer(image):
-        stream = BytesIO()
-        image.save(stream, format="PNG")
-        return stream
-
-    for i, imgbuf in enumerate(df["PIL_img"].map(get_imgbuffer), start=1):
-        worksheet.set_column(0, 0, 20)
-        worksheet.set_row(i, 120)
-        worksheet.insert_image(
-            f"A{i+1}", "img.png", {"image_data": imgbuf, "x_scale": 0.5, "y_scale": 0.5}
-        )
-
-    df.loc[:, desired_columns].to_excel(writer, startcol=1, index=False)
-    workbook.close()
+    _write_molimages_xlsx(
+        filename,
+        df.loc[:, desired_columns],
+        list(df[mol_col]),
+        image_size=image_size,
+        image_scale=image_scale,
+        image_format=image_format,
+        cache=cache,
+        n_jobs=n_jobs,
+    )
 
 
 def check_activity_conditions(
@@ -764,7 +1551,10 @@ def read_sdf_withproperties(sdf_filepath: str) -> pd.DataFrame:
     """
     Reads a SDF file and returns a DataFrame containing the molecules as rdkit molobjects
     as well as all the encoded properties in the SDF block.
+    Use `read_sdf_chunks` for large files.
     """
+    from rdkit import Chem
+
     suppl = Chem.SDMolSupplier(sdf_filepath)
     mols = []
     nonmol_counter = 0
@@ -783,6 +1573,115 @@ def read_sdf_withproperties(sdf_filepath: str) -> pd.DataFrame:
 
 
 
+def _sdf_records(file) -> Iterator[str]:
+    """
+    Yields the text of each record ("$$$$" separated) of an opened SDF file.
+    """
+    lines = []
+    for line in file:
+        if line.startswith("$$$$"):
+            yield "".join(lines)
+            lines = []
+        else:
+            lines.append(line)
+    if any(line.strip() for line in lines):
+        yield "".join(lines)
+
+
+def _sdf_record_properties(record: str) -> dict[str, str]:
+    """
+    Parses the data items ("> <name>" followed by the value lines) of a SDF record.
+    """
+    properties = {}
+    name, values = None, []
+    for line in record.partition("M  END")[2].splitlines():
+        if line.startswith(">"):
+            match = re.search(r"<([^>]*)>", line)
+            name, values = (match.group(1) if match else None), []
+        elif name is not None:
+            if line.strip():
+                values.append(line)
+            else:
+                properties[name] = "\n".join(values)
+                name = None
+    if name is not None:
+        properties[name] = "\n".join(values)
+    return properties
+
+
+def read_sdf_chunks(
+    sdf_filepath: str,
+    chunksize: int = 10_000,
+    properties: list[str] | None = None,
+    molblocks: bool = False,
+    n_threads: int = 1,
+) -> Iterator[pd.DataFrame]:
+    """
+    Reads a SDF file (optionally gzipped, ".gz") and yields DataFrames of at most `chunksize` molecules
+    with the molecules as rdkit molobjects ("mol") and the properties in the SDF blocks,
+    only holding one chunk in memory at a time (like `read_sdf_withproperties` for large files).
+
+    `properties` selects the properties to keep (default: all).
+    With `molblocks`, the molecules are not parsed and the molblocks are returned as text ("molblock")
+    instead, use e.g. `Chem.MolFromMolBlock` on the rows that are needed.
+    With `n_threads` > 1, the molecules are parsed by RDKit's multithreaded supplier
+    (uncompressed files only, the order of the molecules is not preserved).
+
+    Example: joining the structures of a compound library to screening results
+    ids = set(results["External ID"])
+    mol_df = pd.concat(chunk[chunk["ID"].isin(ids)] for chunk in read_sdf_chunks(sdf_filepath, properties=["ID"]))
+    """
+    if chunksize < 1:
+        raise ValueError(f"chunksize has to be positive, got {chunksize}.")
+    compressed = str(sdf_filepath).endswith(".gz")
+    if compressed and n_threads > 1:
+        raise ValueError("The multithreaded SDF supplier can not read gzipped files, use n_threads=1.")
+    opener = gzip.open if compressed else open
+    columns = None if properties is None else ["molblock" if molblocks else "mol", *properties]
+
+    def mol_rows(supplier):
+        nonmol_counter = 0
+        for mol in supplier:
+            if not mol:
+                # the multithreaded supplier ends with an empty entry
+                nonmol_counter += not (n_threads > 1 and supplier.atEnd())
+                continue
+            names = mol.GetPropNames() if properties is None else properties
+            yield {"mol": mol, **{name: mol.GetProp(name) if mol.HasProp(name) else None for name in names}}
+        if nonmol_counter > 0:
+            print(f"Ignored molecules: {nonmol_counter}")
+
+    def molblock_rows(file):
+        for record in _sdf_records(file):
+            record_properties = _sdf_record_properties(record)
+            names = record_properties if properties is None else properties
+            yield {
+                "molblock": record.partition("M  END")[0] + "M  END\n",
+                **{name: record_properties.get(name) for name in names},
+            }
+
+    with contextlib.ExitStack() as stack:
+        if molblocks:
+            rows = molblock_rows(stack.enter_context(opener(sdf_filepath, "rt")))
+        else:
+            from rdkit import Chem
+
+            if n_threads > 1:
+                supplier = Chem.MultithreadedSDMolSupplier(str(sdf_filepath), numWriterThreads=n_threads)
+            else:
+                supplier = Chem.ForwardSDMolSupplier(stack.enter_context(opener(sdf_filepath, "rb")))
+            rows = mol_rows(supplier)
+
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunksize:
+                yield pd.DataFrame(chunk, columns=columns)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=columns)
+
+
 def smiles_grid_altair(
         df: pd.DataFrame,
         smiles_col: str = "smiles",
@@ -792,6 +1691,10 @@ def smiles_grid_altair(
         drop_invalid: bool = True,
         background: str | None = '#ffffff',
         gridtitle: str | None = "Molecule Grid",
+        cache: "MoleculeCache | None" = None,
+        n_jobs: int | None = 1,
+        image_dir: str | None = None,
+        image_url_prefix: str | None = None,
         ):
     """
     Render a grid of molecule images from a DataFrame using Altair.
@@ -808,38 +1711,118 @@ def smiles_grid_altair(
         Size (pixels) of each PNG image (square).
     tooltip_cols : list[str] | None
         If provided, use only these columns as tooltips. Otherwise include all non-internal columns.
+        Only the tooltip columns are included in the chart data.
     drop_invalid : bool
         If True, rows with invalid/unparsable SMILES are removed. If False, they'll be kept with empty images.
     background : str | None
         Optional CSS color (e.g., '#ffffff') for chart background.
+    cache : MoleculeCache | None
+        Optional persistent cache of the rendered images (see `rda_toolbox.molecules`).
+    n_jobs : int | None
+        Number of worker processes drawing the molecules (see `rda_toolbox.molecules.map_molecules`).
+    image_dir : str | None
+        If provided, the images are written as PNG files (one per unique image, named by its hash)
+        into this folder and referenced by URL instead of being embedded into the chart (HTML output).
+    image_url_prefix : str | None
+        URL of `image_dir` as seen from the saved chart (default: `image_dir`).
 
     Returns
     -------
     alt.Chart
     """
+    data = _molecule_grid_data(df, smiles_col, drop_invalid, cache, n_jobs, image_dir, image_url_prefix)
+    return _molecule_grid_chart(data, n_cols, img_size, tooltip_cols, background, gridtitle)
+
+
+def smiles_grid_pages(
+        df: pd.DataFrame,
+        image_dir: str,
+        page_size: int = 120,
+        smiles_col: str = "smiles",
+        n_cols: int = 6,
+        img_size: int = 128,
+        tooltip_cols: list[str] | None = None,
+        drop_invalid: bool = True,
+        background: str | None = '#ffffff',
+        gridtitle: str = "Molecule Grid",
+        cache: "MoleculeCache | None" = None,
+        n_jobs: int | None = 1,
+        image_url_prefix: str | None = None,
+        ) -> list:
+    """
+    Like `smiles_grid_altair` for large hit sets: returns one chart per page of `page_size` molecules,
+    with the images written as files into `image_dir` (each unique image once) instead of being embedded.
+    """
+    if page_size < 1:
+        raise ValueError(f"page_size has to be positive, got {page_size}.")
+    data = _molecule_grid_data(df, smiles_col, drop_invalid, cache, n_jobs, image_dir, image_url_prefix)
+    n_pages = math.ceil(len(data) / page_size)
+    return [
+        _molecule_grid_chart(
+            data.iloc[start : start + page_size],
+            n_cols,
+            img_size,
+            tooltip_cols,
+            background,
+            f"{gridtitle} ({page}/{n_pages})",
+        )
+        for page, start in enumerate(range(0, len(data), page_size), start=1)
+    ]
+
+
+def _write_image_files(
+        images: list[bytes | None], image_dir: str, url_prefix: str | None = None
+        ) -> list[str | None]:
+    """
+    Writes each unique image (PNG) once into `image_dir`, named by its hash, and returns the URLs of the images.
+    """
+    pathlib.Path(image_dir).mkdir(parents=True, exist_ok=True)
+    url_prefix = pathlib.Path(image_dir).as_posix() if url_prefix is None else url_prefix.rstrip("/")
+    filenames = {}
+    urls = []
+    for image in images:
+        if image is None:
+            urls.append(None)
+            continue
+        if image not in filenames:
+            filenames[image] = f"{hashlib.sha256(image).hexdigest()[:24]}.png"
+            filepath = os.path.join(image_dir, filenames[image])
+            if not os.path.exists(filepath):
+                with open(filepath, "wb") as file:
+                    file.write(image)
+        urls.append(f"{url_prefix}/{filenames[image]}")
+    return urls
+
+
+def _molecule_grid_data(
+        df: pd.DataFrame,
+        smiles_col: str,
+        drop_invalid: bool,
+        cache: "MoleculeCache | None",
+        n_jobs: int | None,
+        image_dir: str | None,
+        image_url_prefix: str | None,
+        ) -> pd.DataFrame:
+    """
+    Copy of `df` with the image URLs of the molecules ("_image_url", data URLs or files in `image_dir`).
+    """
+    from rdkit import Chem
+
+    from .molecules import molecule_images
 
     if smiles_col not in df.columns:
         raise ValueError(f"Column '{smiles_col}' not found in DataFrame.")
 
     data = df.copy()
-    # --- helper: SMILES -> data URL (PNG in-memory) ---
-    def _smiles_to_data_url(smi: str) -> str | None:
-        try:
-            mol = Chem.MolFromSmiles(str(smi))
-            if mol is None:
-                return None
-            # RDKit renders to PIL Image; save to BytesIO as PNG
-            img = Draw.MolToImage(mol)
-            buf = BytesIO()
-            img.save(buf, format="png")
-            encoded = base64.b64encode(buf.getvalue()).decode()
-            return f"data:image/png;base64,{encoded}"
-        except Exception:
-            print("Exception: ", smi)
-            return None
-
-    # Create image column
-    data["_image_url"] = data[smiles_col].apply(_smiles_to_data_url)
+    # SMILES -> PNG, each structure is only drawn once (and reused from `cache`)
+    mols = [Chem.MolFromSmiles(str(smi)) for smi in data[smiles_col]]
+    images = molecule_images(mols, cache=cache, n_jobs=n_jobs)
+    if image_dir is None:
+        data["_image_url"] = [
+            None if image is None else imgbuffer_to_imgstr(io.BytesIO(image)) for image in images
+        ]
+    else:
+        data["_image_url"] = _write_image_files(images, image_dir, image_url_prefix)
 
     # Handle invalids
     if drop_invalid:
@@ -847,18 +1830,30 @@ def smiles_grid_altair(
 
     if len(data) == 0:
         raise ValueError("No valid molecules to render (all SMILES failed to parse?).")
+    return data.reset_index(drop=True)
 
-    # Grid coordinates
-    data = data.reset_index(drop=True)
-    data["_idx"] = np.arange(len(data))
-    data["_col"] = (data["_idx"] % n_cols).astype(int)
-    data["_row"] = (data["_idx"] // n_cols).astype(int)
+
+def _molecule_grid_chart(
+        data: pd.DataFrame,
+        n_cols: int,
+        img_size: int,
+        tooltip_cols: list[str] | None,
+        background: str | None,
+        gridtitle: str | None,
+        ):
+    import altair as alt
 
     # Tooltips: include all user columns by default (exclude internal helpers)
     internal_cols = {"_image_url", "_idx", "_col", "_row", "smiles"}
     if tooltip_cols is None:
         tooltip_cols = [c for c in data.columns if c not in internal_cols]
 
+    # Grid coordinates, the chart data only contains the tooltip columns
+    data = data[list(dict.fromkeys([*tooltip_cols, "_image_url"]))].reset_index(drop=True)
+    idx = np.arange(len(data))
+    data["_col"] = (idx % n_cols).astype(int)
+    data["_row"] = (idx // n_cols).astype(int)
+
     # Build chart
     chart = (
             alt.Chart(data)
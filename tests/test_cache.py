@@ -0,0 +1,57 @@
+import pathlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from rda_toolbox.cache import StageCache
+
+
+def test_stage_cache_roundtrip_keeps_frames_and_dtypes(tmp_path):
+    cache = StageCache(tmp_path)
+    rawdata = pd.DataFrame(
+        {
+            "AcD Barcode 384": ["ACD-1", "ACD-2"],
+            "Col_384": [1, 2],
+            "Precipitated": [True, np.nan],
+        }
+    )
+    metadata = pd.DataFrame({"Key": ["Plate Type"], "Value": ["384 WELL PLATE"]})
+    key = cache.key("rawdata", {"rawfiles": "raw/"})
+
+    assert cache.load("rawdata", key) is None
+    assert cache.store("rawdata", key, (rawdata, metadata))
+
+    loaded_rawdata, loaded_metadata = cache.load("rawdata", key)
+    pd.testing.assert_frame_equal(loaded_rawdata, rawdata)
+    pd.testing.assert_frame_equal(loaded_metadata, metadata)
+
+
+def test_stage_cache_key_depends_on_file_contents_and_parameters(tmp_path):
+    cache = StageCache(tmp_path / "cache")
+    inputfile = tmp_path / "Input.txt"
+    inputfile.write_text("v1")
+    key = cache.key("input", {"inputfile": pathlib.Path(inputfile), "substance_id": "Internal ID"})
+
+    assert key == cache.key("input", {"inputfile": pathlib.Path(inputfile), "substance_id": "Internal ID"})
+    assert key != cache.key("input", {"inputfile": pathlib.Path(inputfile), "substance_id": "External ID"})
+    inputfile.write_text("v2")
+    assert key != cache.key("input", {"inputfile": pathlib.Path(inputfile), "substance_id": "Internal ID"})
+
+
+def test_stage_cache_key_depends_on_toolbox_code(tmp_path, monkeypatch):
+    from rda_toolbox import cache as cache_module
+
+    cache = StageCache(tmp_path)
+    key = cache.key("input", {"substance_id": "Internal ID"})
+    monkeypatch.setattr(cache_module, "_toolbox_code_digest", lambda: "edited")
+    assert key != cache.key("input", {"substance_id": "Internal ID"})
+
+
+def test_stage_cache_skips_values_that_are_not_dataframes(tmp_path):
+    cache = StageCache(tmp_path)
+
+    assert not cache.store("results", "key", {"table": pd.DataFrame()})
+    assert cache.load("results", "key") is None
@@ -1,6 +1,7 @@
+import pandas as pd
 import pytest
 
-from rda_toolbox.experiment_classes import MIC
+from rda_toolbox.experiment_classes import MIC, Precipitation
 
 
 def test_validate_mapping_dicts_accepts_consistent_mapping():
@@ -60,3 +61,95 @@ def test_validate_mapping_dicts_raises_for_badly_switched_entries():
     assert "Please check the mapping .txt files." in message
     assert "AsT barcodes missing in AsT -> AcD mapping" in message
     assert "AST-2" in message
+
+
+def test_experiment_stages_are_computed_lazily():
+    # Nothing is read on construction, so missing files only raise once a stage is computed
+    mic = MIC(
+        "does/not/exist/",
+        "does/not/exist/MIC_Input.xlsx",
+        "does/not/exist/MP_AsT.txt",
+        "does/not/exist/AsT_AcD.txt",
+    )
+    assert "rawdata" not in mic.__dict__
+    assert mic.stages[:3] == ["rawdata", "input", "mapped"]
+
+    with pytest.raises(FileNotFoundError):
+        mic.run(until="rawdata")
+
+
+def test_run_raises_for_unknown_stage():
+    mic = MIC.__new__(MIC)
+
+    with pytest.raises(ValueError, match="Unknown stage 'unknown'"):
+        mic.run(until="unknown")
+
+
+def test_figures_are_built_only_when_selected():
+    mic = MIC.__new__(MIC)
+    built = []
+
+    def build(name):
+        built.append(name)
+        return name
+
+    mic._figure_builders = lambda: {
+        ("QualityControl", "heatmap"): lambda: build("heatmap"),
+        ("Dataset 1", "lineplot"): lambda: build("lineplot"),
+    }
+    mic._figure_fallbacks = lambda: {}
+    assert mic.figure_names == ["QualityControl/heatmap", "Dataset 1/lineplot"]
+    assert built == []
+
+    (figure,) = mic.figures(include="QualityControl/*")
+    assert (figure.dataset, figure.file_basename, figure.figure) == ("QualityControl", "heatmap", "heatmap")
+    assert [result.figure for result in mic.figures(exclude=["*heat*"])] == ["lineplot"]
+    assert [result.figure for result in mic.figures(include="*")] == ["heatmap", "lineplot"]
+    assert built == ["heatmap", "lineplot"]  # built once
+
+    with pytest.warns(RuntimeWarning, match="No figure matches 'Dataset 2/[*]'"):
+        assert mic.figures(include="Dataset 2/*") == []
+
+
+def test_raster_plateheatmap_without_plates_raises():
+    mic = MIC.__new__(MIC)
+    mic._norm_by_barcode, mic._negative_controls, mic._blanks = "AcD Barcode 384", "Bacteria + Medium", "Medium"
+    empty = pd.DataFrame(
+        columns=["Internal ID", "AcD Barcode 384", "Row_384", "Col_384", "Measurement", "Z-Factor"]
+    )
+    with pytest.raises(ValueError, match="No plates with Optical Density"):
+        mic.raster_plateheatmap(empty, measurement="Optical Density")
+
+
+def _precipitation_with_rawdata(**kwargs) -> Precipitation:
+    precipitation = Precipitation("precipitation/", background_locations=["A24", "B24"], **kwargs)
+    # ACD-2 has a noisier background than ACD-1
+    precipitation.__dict__["rawdata_w_layout"] = pd.DataFrame(
+        {
+            "AcD Barcode 384": ["ACD-1"] * 3 + ["ACD-2"] * 3,
+            "Row_384": ["A", "B", "C"] * 2,
+            "Col_384": [24, 24, 1] * 2,
+            "Measurement": [0.04, 0.06, 0.5, 0.0, 0.2, 0.5],
+            "Measurement Type": "Optical Density",
+            "Layout": ["Background", "Background", "Substance"] * 2,
+        }
+    )
+    return precipitation
+
+
+def test_precipitation_uses_limit_of_quantification_over_all_plates():
+    precipitation = _precipitation_with_rawdata()
+    results = precipitation.results
+
+    background = pd.Series([0.04, 0.06, 0.0, 0.2])
+    assert precipitation.limit_of_quantification == round(background.mean() + 10 * background.std(), 3)
+    assert (results["Limit of Quantification"] == precipitation.limit_of_quantification).all()
+    assert not results["Precipitated"].any()
+
+
+def test_precipitation_uses_limit_of_quantification_per_plate():
+    results = _precipitation_with_rawdata(loq_per_plate=True).results
+
+    assert results["Limit of Quantification"].tolist() == [0.191] * 3 + [1.514] * 3
+    assert results["Precipitated"].tolist() == [False, False, True, False, False, False]
+    assert results["Precipitated at Optical Density"].iloc[2] == 0.5
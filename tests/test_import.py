@@ -0,0 +1,22 @@
+import subprocess
+import sys
+
+
+def test_import_does_not_load_plotting_and_chemistry_libraries():
+    code = (
+        "import sys, rda_toolbox as rda\n"
+        "rda.parse_readerfiles, rda.preprocess, rda.MIC\n"
+        "print(','.join(m for m in ('altair', 'rdkit', 'scipy') if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == ""
+
+
+def test_lazy_attributes_are_resolved():
+    import rda_toolbox as rda
+
+    assert rda.MIC.__name__ == "MIC"
+    assert rda.utility.get_rows_cols(96) == (8, 12)
+    assert "plateheatmaps" in dir(rda)
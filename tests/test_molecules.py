@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+
+from rda_toolbox.molecules import MoleculeCache, map_molecules, molecule_identifiers, molecule_images
+from rda_toolbox.utility import add_molecule_data
+
+Chem = pytest.importorskip("rdkit.Chem")
+
+
+def test_molecule_cache_evicts_least_recently_used(tmp_path):
+    cache = MoleculeCache(tmp_path / "molecules.sqlite", max_entries=2)
+    cache.set_many({"a": b"1"})
+    cache.set_many({"b": b"2"})
+    assert cache.get_many(["a"]) == {"a": b"1"}  # "b" is now the least recently used entry
+    cache.set_many({"c": b"3"})
+    assert cache.get_many(["a", "b", "c"]) == {"a": b"1", "c": b"3"}
+
+    reopened = MoleculeCache(tmp_path / "molecules.sqlite")
+    assert len(reopened) == 2
+
+
+def test_molecule_data_is_computed_once_per_structure(tmp_path):
+    cache = MoleculeCache(tmp_path / "molecules.sqlite")
+    # The same structure written as two different SMILES
+    mols = [Chem.MolFromSmiles("OCC"), Chem.MolFromSmiles("CCO"), None]
+
+    identifiers = molecule_identifiers(mols, cache=cache)
+    assert identifiers[0] == identifiers[1] == (Chem.MolToInchi(mols[0]), Chem.MolToInchiKey(mols[0]))
+    assert identifiers[2] == (None, None)
+    images = molecule_images(mols, cache=cache)
+    assert images[0] == images[1] and images[2] is None
+    assert len(cache) == 2  # identifiers and image of ethanol
+
+    data_df = pd.DataFrame({"External ID": ["E1", "E2", "E3", "E1"], "Measurement": [1.0, 2.0, 3.0, 4.0]})
+    mol_df = pd.DataFrame({"ID": ["E1", "E2", "E3"], "mol": mols})
+    result = add_molecule_data(data_df, mol_df, external_id="ID", cache=cache)
+    assert len(cache) == 2
+    assert result["InChI-Key"].tolist()[:2] == [identifiers[0][1]] * 2
+    assert result["mol_img"][0].startswith("data:image/png;base64,")
+    assert result["mol_img"][0] == result["mol_img"][1]
+    assert result["mol_img"].isna().tolist() == [False, False, True, False]
+
+
+def _atom_count(mol):
+    if mol.GetNumAtoms() > 2:
+        raise ValueError("too large")
+    return mol.GetNumAtoms()
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_map_molecules_keeps_order_and_reports_failures(n_jobs):
+    mols = [Chem.MolFromSmiles(smiles) for smiles in ["C", "CC", "CCC", "O"]] + [None]
+    results, errors = map_molecules(_atom_count, mols, n_jobs=n_jobs, chunksize=2)
+    assert results == [1, 2, None, 1, None]
+    assert errors == {2: "ValueError: too large"}
@@ -0,0 +1,37 @@
+import time
+
+import pandas as pd
+
+from rda_toolbox.profiling import StageProfiler, count_rows
+
+
+def test_stage_profiler_records_nested_stages_exclusively():
+    profiler = StageProfiler(trace_memory=True)
+
+    start = time.perf_counter()
+    with profiler.stage("outer") as outer:
+        with profiler.stage("inner") as inner:
+            time.sleep(0.05)
+            inner["rows"] = count_rows(pd.DataFrame({"a": range(3)}))
+        data = list(range(100_000))
+        outer["rows"] = count_rows(data)
+    total = time.perf_counter() - start
+
+    profile = profiler.to_frame().set_index("Stage")
+    # Stages are recorded in order of completion
+    assert list(profile.index) == ["inner", "outer"]
+    assert profile.loc["inner", "Rows"] == 3
+    assert profile.loc["outer", "Rows"] == 100_000
+    # The time of the nested stage is not counted for the outer stage
+    assert profile.loc["inner", "Wall Time (s)"] >= 0.05
+    assert profile.loc["outer", "Wall Time (s)"] <= total - profile.loc["inner", "Wall Time (s)"]
+    assert profile.loc["outer", "Peak Memory (MiB)"] > 0
+
+
+def test_stage_profiler_skips_memory_without_tracing():
+    profiler = StageProfiler()
+
+    with profiler.stage("stage"):
+        pass
+
+    assert profiler.to_frame()["Peak Memory (MiB)"].isna().all()
@@ -0,0 +1,98 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from rda_toolbox.raster import (
+    colorize,
+    plate_array,
+    plate_labels,
+    plate_mosaic,
+    raster_plateheatmaps,
+    to_png,
+)
+
+
+def test_plate_array_and_colors():
+    df = pd.DataFrame(
+        {
+            "AsT Barcode 384": ["P1", "P1", "P2"],
+            "Row_384": ["A", "P", "B"],
+            "Col_384": [1, 24, "2"],
+            "Measurement": [0.0, 1.0, 0.5],
+        }
+    )
+    values, plates = plate_array(df)
+    assert values.shape == (2, 16, 24)
+    assert plates["AsT Barcode 384"].tolist() == ["P1", "P2"]
+    assert values[0, 0, 0] == 0.0 and values[0, 15, 23] == 1.0 and values[1, 1, 1] == 0.5
+    assert np.isnan(values).sum() == 2 * 384 - 3
+
+    colors = colorize(values, colormap=["#000000", "#ffffff"])
+    assert colors.shape == (2, 16, 24, 3)
+    assert colors[0, 0, 0].tolist() == [0, 0, 0]
+    assert colors[0, 15, 23].tolist() == [255, 255, 255]
+    assert colors[0, 1, 1].tolist() == [217, 217, 217]  # missing
+    # Per plate color scales
+    colors = colorize(values, vmin=[0.0, 0.5], vmax=[1.0, 1.0], colormap=["#000000", "#ffffff"])
+    assert colors[1, 1, 1].tolist() == [0, 0, 0]
+    # Descending scale (e.g. blank above negative control) as in Vega
+    colors = colorize(values, vmin=1.0, vmax=0.0, colormap=["#000000", "#ffffff"])
+    assert colors[0, 0, 0].tolist() == [255, 255, 255]
+    assert colors[0, 15, 23].tolist() == [0, 0, 0]
+
+    image = plate_mosaic(colors, ["P1", "P2"], cell_size=2, columns=2, gap=4, label_lines=1)
+    assert image.shape == (11 + 32 + 4, 2 * (48 + 4), 3)
+    assert to_png(image).startswith(b"\x89PNG")
+
+
+def test_raster_plateheatmaps_tiles():
+    rows = []
+    for plate in range(5):
+        for substance, column in [("Negative Control", 1), ("Medium", 2), ("S1", 3)]:
+            rows.append(
+                {
+                    "ID": substance,
+                    "Organism": "E. coli",
+                    "AsT Barcode 384": f"P{plate}",
+                    "Row_384": "A",
+                    "Col_384": column,
+                    "Measurement": 1.0 if substance == "Negative Control" else 0.1,
+                    "Z-Factor": 0.8,
+                }
+            )
+    images = raster_plateheatmaps(pd.DataFrame(rows), plates_per_tile=2, columns=2)
+    assert len(images) == 3
+    assert images[0].shape == images[1].shape
+
+
+def test_raster_plateheatmaps_plate_without_measurements():
+    df = pd.DataFrame(
+        {
+            "ID": ["S1", "S2"],
+            "Organism": ["E. coli", "E. coli"],
+            "AsT Barcode 384": ["P1", "P2"],
+            "Row_384": ["A", "A"],
+            "Col_384": [1, 1],
+            "Measurement": [0.5, np.nan],
+        }
+    )
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        (image,) = raster_plateheatmaps(df, columns=2)
+    assert image.ndim == 3
+
+
+def test_raster_plateheatmaps_without_rows():
+    df = pd.DataFrame(
+        {
+            "ID": ["S1"],
+            "AsT Barcode 384": ["P1"],
+            "Row_384": ["A"],
+            "Col_384": [1],
+            "Measurement": [0.5],
+            "Z-Factor": [0.8],
+        }
+    )
+    assert raster_plateheatmaps(df.iloc[:0]) == []
+    assert plate_labels(df[["AsT Barcode 384"]].iloc[:0], df.iloc[:0]) == []
@@ -8,11 +8,27 @@
 #  and verify normalization/Z‑factor math, or verifying plateheatmaps leaves input untouched)
 # will catch the stability issues above before they regress again.
 
+import json
+import os
+
 import numpy as np
 import pandas as pd
+import pytest
 
 from rda_toolbox.utility import (
-    mapapply_96_to_384
+    _save_figures,
+    FigureBudget,
+    _save_tables,
+    mapapply_96_to_384,
+    expand_mic_layout,
+    get_upset_intersections,
+    get_upsetplot_df,
+    map_primary_layout,
+    minimum_precipitation_concentrations,
+    prepare_visualization,
+    read_sdf_chunks,
+    smiles_grid_pages,
+    to_excel_molimages,
 )
 
 
@@ -50,3 +66,528 @@ def test_mapapply_96_to_384_maps_quadrants():
     assert result["Row_384"].tolist() == expected_rows_384
     assert result["Col_384"].tolist() == expected_cols_384
 
+
+
+def test_expand_mic_layout_crossjoins_concentrations_controls_and_acd_plates():
+    substances = pd.DataFrame(
+        {
+            "Dataset": ["DS1", "DS1"],
+            "Internal ID": ["S1", "S2"],
+            "Row_384": ["A", "A"],
+            "Col_384": ["1", "2"],
+            "AsT Barcode 384": ["AST-1", "AST-1"],
+        }
+    )
+    dilutions = pd.DataFrame({"Concentration": [50.0, 25.0, 12.5]})
+    controls = pd.DataFrame(
+        {"Dataset": ["Negative Control"], "Internal ID": ["Medium"], "Row_384": ["A"], "Col_384": [24]}
+    )
+    organisms = pd.DataFrame(
+        {"Organism": ["Org B", "Org A"], "Organism formatted": ["O. b", "O. a"], "Rack": [2, 1]}
+    )
+    acd_platemapping = {"AST-1": [["ACD-1", "ACD-2"], ["ACD-3", "ACD-4"]]}
+
+    result = expand_mic_layout(
+        substances, dilutions, controls, organisms, acd_platemapping, num_replicates=2
+    )
+
+    # (2 substances x 3 concentrations + 1 control) x 2 organisms x 2 replicates
+    assert len(result) == 28
+    s1 = result[(result["Internal ID"] == "S1") & (result["AcD Barcode 384"] == "ACD-1")]
+    assert s1["Col_384"].tolist() == [1, 3, 5]
+    assert s1["Concentration"].tolist() == [50.0, 25.0, 12.5]
+    s2 = result[(result["Internal ID"] == "S2") & (result["AcD Barcode 384"] == "ACD-1")]
+    assert s2["Col_384"].tolist() == [2, 4, 6]
+    # Organisms are attributed to the AcD plates in Rack order
+    acd = result.drop_duplicates("AcD Barcode 384").set_index("AcD Barcode 384")
+    assert acd.loc["ACD-1", "Organism"] == "Org A"
+    assert acd.loc["ACD-2", "Organism"] == "Org B"
+    assert acd.loc["ACD-3", "Replicate"] == 2
+
+
+def test_expand_mic_layout_ignores_rows_without_internal_id():
+    substances = pd.DataFrame(
+        {
+            "Dataset": ["DS1", "DS1"],
+            "Internal ID": ["S1", np.nan],
+            "Row_384": ["A", np.nan],
+            "Col_384": ["1", np.nan],
+            "AsT Barcode 384": ["AST-1", "AST-1"],
+        }
+    )
+    result = expand_mic_layout(
+        substances,
+        pd.DataFrame({"Concentration": [50.0]}),
+        pd.DataFrame(columns=["Dataset", "Internal ID", "Row_384", "Col_384"]),
+        pd.DataFrame({"Organism": ["Org A"], "Organism formatted": ["O. a"], "Rack": [1]}),
+        {"AST-1": [["ACD-1"]]},
+        num_replicates=1,
+    )
+    assert result["Internal ID"].tolist() == ["S1"]
+    assert result["Col_384"].tolist() == [1]
+
+
+def test_map_primary_layout_joins_rawdata_through_plate_lineage():
+    rawdata = pd.DataFrame(
+        {
+            "AcD Barcode 384": ["ACD-1", "ACD-1", "ACD-2", "ACD-2"],
+            "Row_384": ["A", "A", "A", "A"],
+            "Col_384": [1, 24, 1, 24],
+            "Raw Optical Density": [0.1, 0.9, 0.2, 0.8],
+        }
+    )
+    mapping_df = pd.DataFrame(
+        {
+            "AsT Barcode 384": ["AST-1", "AST-1"],
+            "AcD Barcode 384": ["ACD-1", "ACD-2"],
+            "Replicate": [1, 1],
+            "Rack": [1, 2],
+        }
+    )
+    organisms = pd.DataFrame(
+        {"Organism": ["Org A", "Org B"], "Organism formatted": ["O. a", "O. b"], "Rack": [1, 2]}
+    )
+    substances = pd.DataFrame(
+        {
+            "Dataset": ["DS1"],
+            "Internal ID": ["S1"],
+            "AsT Barcode 384": ["AST-1"],
+            "Row_384": ["A"],
+            "Col_384": [1],
+        }
+    )
+    controls = pd.DataFrame(
+        {"Dataset": ["Negative Control"], "Internal ID": ["Bacteria + Medium"], "Row_384": ["A"], "Col_384": [24]}
+    )
+    dilutions = pd.DataFrame(
+        {"Dataset": ["DS1", "Negative Control"], "Concentration": [50.0, float("nan")]}
+    )
+
+    result = map_primary_layout(rawdata, mapping_df, organisms, substances, controls, dilutions)
+
+    assert len(result) == 4
+    s1 = result[result["Internal ID"] == "S1"].set_index("Organism")
+    assert s1.loc["Org A", "Raw Optical Density"] == 0.1
+    assert s1.loc["Org B", "Raw Optical Density"] == 0.2
+    assert (s1["Concentration"] == 50.0).all()
+    controls_result = result[result["Internal ID"] == "Bacteria + Medium"]
+    assert sorted(controls_result["AcD Barcode 384"]) == ["ACD-1", "ACD-2"]
+
+    # Expected columns shared by rawdata and layout are joined on, not duplicated
+    rawdata["Dataset"] = ["DS1", "Negative Control"] * 2
+    shared = map_primary_layout(rawdata, mapping_df, organisms, substances, controls, dilutions)
+    pd.testing.assert_frame_equal(shared, result[shared.columns])
+    assert not any(column.endswith(("_x", "_y")) for column in shared.columns)
+    # Unexpected shared columns are not silently used as join keys
+    rawdata["Plate Note"] = "x"
+    substances["Plate Note"] = "y"
+    with pytest.raises(ValueError, match="Plate Note"):
+        map_primary_layout(rawdata, mapping_df, organisms, substances, controls, dilutions)
+
+
+def test_minimum_precipitation_concentrations_one_row_per_substance():
+    precipitation = pd.DataFrame(
+        {
+            "Internal ID": ["S1"] * 3 + ["S2"] * 2 + ["REF"] * 4,
+            "AsT Barcode 384": ["AST-1"] * 5 + ["AST-1", "AST-1", "AST-2", "AST-2"],
+            "Concentration": [50.0, 25.0, 12.5, 50.0, 25.0, 50.0, 25.0, 50.0, 25.0],
+            "Precipitated": [True, True, False, False, np.nan, True, False, True, True],
+        }
+    )
+
+    result = minimum_precipitation_concentrations(precipitation, precip_conc_multiplicator=2.0)
+
+    assert result["Internal ID"].tolist() == ["REF", "S1", "S2"]
+    # REF is on two plates, the lowest concentration over both plates is used
+    assert result["Minimum Precipitation Concentration"].tolist()[:2] == [50.0, 50.0]
+    assert np.isnan(result["Minimum Precipitation Concentration"].iloc[2])
+
+
+class _BrokenChart:
+    def to_dict(self, **kwargs):
+        raise ValueError("broken spec")
+
+    def save(self, filepath):
+        raise ValueError("broken spec")
+
+
+def test_save_figures_skips_unchanged_figures_and_isolates_errors(tmp_path):
+    alt = pytest.importorskip("altair")
+    from rda_toolbox.experiment_classes import Result
+
+    chart = alt.Chart(pd.DataFrame({"x": [1, 2]})).mark_point().encode(x="x:Q")
+    figures = [Result("Dataset 1", "broken", figure=_BrokenChart()), Result("Dataset 1", "points", figure=chart)]
+
+    with pytest.warns(RuntimeWarning, match="broken"):
+        first = _save_figures(str(tmp_path), figures, fileformats=["json"], skip_unchanged=True)
+    assert (tmp_path / "Dataset 1" / "points.json").is_file()
+    assert first["Error"].notna().tolist() == [True, False]
+
+    with pytest.warns(RuntimeWarning, match="broken"):
+        second = _save_figures(str(tmp_path), figures, fileformats=["json"], skip_unchanged=True)
+    assert second["Skipped"].tolist() == [False, True]
+
+
+class _UnpicklableChart(_BrokenChart):
+    def __init__(self):
+        self.callback = lambda: None
+
+
+def test_save_figures_in_worker_pool_isolates_pickling_errors(tmp_path):
+    alt = pytest.importorskip("altair")
+    from rda_toolbox.experiment_classes import Result
+
+    chart = alt.Chart(pd.DataFrame({"x": [1, 2]})).mark_point().encode(x="x:Q")
+    figures = [
+        Result("Dataset 1", "unpicklable", figure=_UnpicklableChart()),
+        Result("Dataset 1", "points", figure=chart),
+    ]
+
+    with pytest.warns(RuntimeWarning, match="unpicklable"):
+        records = _save_figures(str(tmp_path), figures, fileformats=["json"], n_jobs=2)
+    assert records.set_index("File")["Error"].notna().to_dict() == {
+        str(tmp_path / "Dataset 1" / "unpicklable.json"): True,
+        str(tmp_path / "Dataset 1" / "points.json"): False,
+    }
+    assert (tmp_path / "Dataset 1" / "points.json").is_file()
+
+
+def test_save_figures_data_files_are_shared_and_cleaned_up(tmp_path):
+    alt = pytest.importorskip("altair")
+    from rda_toolbox.experiment_classes import Result
+
+    data = pd.DataFrame({"x": [1, 2], "y": [3, 4]})
+    figures = [
+        Result("Dataset 1", "points", figure=alt.Chart(data).mark_point().encode(x="x:Q")),
+        Result("Dataset 2", "lines", figure=alt.Chart(data).mark_line().encode(x="x:Q", y="y:Q")),
+    ]
+    _save_figures(str(tmp_path), figures, fileformats=["json", "svg"], data_files=True)
+    (data_file,) = (tmp_path / "data").iterdir()  # shared by both figures
+    spec = json.loads((tmp_path / "Dataset 1" / "points.json").read_text())
+    assert "datasets" not in spec
+    assert spec["data"] == {"url": f"../data/{data_file.name}", "format": {"type": "json"}}
+    assert json.loads(data_file.read_text()) == data.to_dict("records")
+    assert (tmp_path / "Dataset 1" / "points.svg").is_file()
+
+    other = pd.DataFrame({"x": [5]})
+    figures = [Result(figure.dataset, figure.file_basename, figure=alt.Chart(other).mark_point()) for figure in figures]
+    _save_figures(str(tmp_path), figures, fileformats=["json"], data_files=True)
+    assert [path.name for path in (tmp_path / "data").iterdir()] != [data_file.name]
+    assert len(list((tmp_path / "data").iterdir())) == 1
+
+
+def test_save_figures_data_files_survive_failures_and_mode_changes(tmp_path):
+    alt = pytest.importorskip("altair")
+    from rda_toolbox.experiment_classes import Result
+
+    chart = alt.Chart(pd.DataFrame({"x": [1, 2]})).mark_point().encode(x="x:Q")
+    figure_path = tmp_path / "Dataset 1" / "points.json"
+    _save_figures(str(tmp_path), [Result("Dataset 1", "points", figure=chart)], fileformats=["json"], data_files=True)
+    (data_file,) = (tmp_path / "data").iterdir()
+
+    # The previous file still references its data file
+    with pytest.warns(RuntimeWarning, match="broken"):
+        _save_figures(
+            str(tmp_path), [Result("Dataset 1", "points", figure=_BrokenChart())], fileformats=["json"], data_files=True
+        )
+    assert data_file.is_file()
+
+    # Switching data_files re-renders unchanged figures
+    figures = [Result("Dataset 1", "points", figure=chart)]
+    _save_figures(str(tmp_path), figures, fileformats=["json"], skip_unchanged=True, data_files=True)
+    assert "url" in json.loads(figure_path.read_text())["data"]
+    inline = _save_figures(str(tmp_path), figures, fileformats=["json"], skip_unchanged=True)
+    assert inline["Skipped"].tolist() == [False]
+    assert "datasets" in json.loads(figure_path.read_text())
+
+
+def test_save_figures_reports_sizes_and_downgrades_figures_over_budget(tmp_path):
+    alt = pytest.importorskip("altair")
+    from rda_toolbox.experiment_classes import Result
+
+    large = alt.Chart(pd.DataFrame({"x": range(1000)})).mark_point().encode(x="x:Q")
+    small = alt.Chart(pd.DataFrame({"x": [1]})).mark_point().encode(x="x:Q")
+    figures = [
+        Result("Dataset 1", "large", figure=large, build_seconds=0.5, fallback=lambda: small),
+        Result("Dataset 1", "large_without_fallback", figure=large),
+    ]
+    with pytest.warns(RuntimeWarning, match="exceeds the figure budget"):
+        summary = _save_figures(
+            str(tmp_path), figures, fileformats=["json"], budget=FigureBudget(max_data_rows=100)
+        )
+    assert summary["Data Rows"].tolist() == [1, 1000]
+    assert summary["Downgraded"].tolist() == [True, False]
+    assert summary["Build Seconds"].iloc[0] >= 0.5
+    assert summary["Spec Bytes"].iloc[0] < summary["Spec Bytes"].iloc[1]
+    spec = json.loads((tmp_path / "Dataset 1" / "large.json").read_text())
+    assert [len(values) for values in spec["datasets"].values()] == [1]
+    written = pd.read_csv(tmp_path / "figure_summary.csv")
+    assert written["File"].tolist() == [
+        os.path.join("Dataset 1", "large.json"),
+        os.path.join("Dataset 1", "large_without_fallback.json"),
+    ]
+
+    def failing_fallback():
+        raise ValueError("no measurements")
+
+    figures = [Result("Dataset 1", "large", figure=large, fallback=failing_fallback)]
+    with pytest.warns(RuntimeWarning, match="fallback failed"):
+        summary = _save_figures(str(tmp_path), figures, fileformats=["json"], budget=FigureBudget(max_data_rows=100))
+    assert summary["Downgraded"].tolist() == [False]
+    assert summary["Error"].isna().all()
+
+
+def test_save_tables_writes_only_requested_formats_and_skips_unchanged(tmp_path):
+    from rda_toolbox.experiment_classes import Result
+
+    table = pd.DataFrame({"Internal ID": ["S1", "S2"], "MIC50 in µM": [12.5, np.nan]})
+    results = [Result("Dataset 1", "MIC_results", table=table)]
+
+    _save_tables(str(tmp_path), results, fileformats=["csv"], skip_unchanged=True)
+    csv_path = tmp_path / "Dataset 1" / "MIC_results.csv"
+    assert csv_path.is_file()
+    assert not (tmp_path / "Dataset 1" / "MIC_results.xlsx").exists()
+
+    modified = csv_path.stat().st_mtime_ns
+    _save_tables(str(tmp_path), results, fileformats=["csv"], skip_unchanged=True)
+    assert csv_path.stat().st_mtime_ns == modified
+
+    _save_tables(str(tmp_path), results, fileformats=["xlsx"])
+    pd.testing.assert_frame_equal(pd.read_excel(tmp_path / "Dataset 1" / "MIC_results.xlsx"), table)
+
+    with pytest.raises(ValueError, match="Unknown table format"):
+        _save_tables(str(tmp_path), results, fileformats=["xls"])
+
+
+def test_save_tables_xlsx_writes_infinite_values_and_dates_like_pandas(tmp_path):
+    from rda_toolbox.experiment_classes import Result
+
+    table = pd.DataFrame(
+        {
+            "Relative Measurement": [1.5, np.inf, -np.inf, np.nan],
+            "Measured at": pd.to_datetime(["2024-01-01 08:00", "2024-01-02 09:30", None, "2024-01-03 10:00"]),
+        }
+    )
+    _save_tables(str(tmp_path), [Result("Dataset 1", "results", table=table)], fileformats=["xlsx"])
+    table.to_excel(tmp_path / "pandas.xlsx", index=False)
+    pd.testing.assert_frame_equal(
+        pd.read_excel(tmp_path / "Dataset 1" / "results.xlsx"), pd.read_excel(tmp_path / "pandas.xlsx")
+    )
+
+
+def test_save_tables_workbook_per_dataset(tmp_path):
+    from rda_toolbox.experiment_classes import Result
+
+    table = pd.DataFrame({"Internal ID": ["S1", "S2"], "MIC50 in µM": [12.5, np.nan]})
+    long_name = "Dataset 1_" + "x" * 40
+    results = [
+        Result("Dataset 1", "Dataset 1_MIC50_results", table=table),
+        Result("Dataset 1", long_name + "_a", table=table),
+        Result("Dataset 1", long_name + "_b", table=table.head(1)),
+    ]
+
+    _save_tables(str(tmp_path), results, fileformats=["xlsx", "csv"], workbook_per_dataset=True)
+    assert not (tmp_path / "Dataset 1" / "Dataset 1_MIC50_results.xlsx").exists()
+    assert (tmp_path / "Dataset 1" / "Dataset 1_MIC50_results.csv").is_file()
+
+    sheets = pd.read_excel(tmp_path / "Dataset 1" / "Dataset 1_results.xlsx", sheet_name=None)
+    assert list(sheets) == ["Index", "MIC50_results", "x" * 31, "x" * 29 + "~2"]
+    assert sheets["Index"]["Rows"].tolist() == [2, 2, 1]
+    assert sheets["Index"]["Table"].tolist() == [result.file_basename for result in results]
+    pd.testing.assert_frame_equal(sheets["MIC50_results"], table)
+
+
+def test_read_sdf_chunks(tmp_path):
+    Chem = pytest.importorskip("rdkit.Chem")
+
+    sdf_path = str(tmp_path / "library.sdf")
+    writer = Chem.SDWriter(sdf_path)
+    for i, smiles in enumerate(["C", "CC", "CCO", "c1ccccc1", "CCN"]):
+        mol = Chem.MolFromSmiles(smiles)
+        mol.SetProp("ID", f"E{i}")
+        mol.SetProp("Vendor", "ACME")
+        writer.write(mol)
+    writer.close()
+
+    chunks = list(read_sdf_chunks(sdf_path, chunksize=2, properties=["ID"]))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert list(chunks[0].columns) == ["mol", "ID"]
+    assert pd.concat(chunks)["ID"].tolist() == ["E0", "E1", "E2", "E3", "E4"]
+
+    molblocks = pd.concat(read_sdf_chunks(sdf_path, molblocks=True), ignore_index=True)
+    assert list(molblocks.columns) == ["molblock", "ID", "Vendor"]
+    assert Chem.MolToSmiles(Chem.MolFromMolBlock(molblocks["molblock"][2])) == "CCO"
+
+
+def test_to_excel_molimages_stores_each_structure_once(tmp_path):
+    import zipfile
+
+    Chem = pytest.importorskip("rdkit.Chem")
+
+    df = pd.DataFrame(
+        {
+            "mol": [Chem.MolFromSmiles(smiles) for smiles in ["CCO", "OCC", "c1ccccc1", "CCO"]],
+            "ID": ["E1", "E1", "E2", "E1"],
+            "MIC50 in µM": [1.0, 2.0, np.nan, 4.0],
+        }
+    )
+    original = df.copy()
+    filepath = tmp_path / "hits.xlsx"
+    to_excel_molimages(df, str(filepath), ["ID", "MIC50 in µM"], image_size=100, image_scale=1)
+
+    pd.testing.assert_frame_equal(df, original)
+    pd.testing.assert_frame_equal(
+        pd.read_excel(filepath, usecols=[1, 2]), original[["ID", "MIC50 in µM"]]
+    )
+    media = [name for name in zipfile.ZipFile(filepath).namelist() if name.startswith("xl/media/")]
+    assert len(media) == 2
+
+
+def test_to_excel_molimages_writes_infinite_values_and_dates(tmp_path):
+    Chem = pytest.importorskip("rdkit.Chem")
+
+    df = pd.DataFrame(
+        {
+            "mol": [Chem.MolFromSmiles("CCO"), Chem.MolFromSmiles("CCN")],
+            "Relative Measurement": [np.inf, 0.5],
+            "Measured at": pd.to_datetime(["2024-01-01 08:00", "2024-01-02 09:30"]),
+        }
+    )
+    filepath = tmp_path / "hits.xlsx"
+    to_excel_molimages(df, str(filepath), ["Relative Measurement", "Measured at"], image_size=50)
+
+    written = pd.read_excel(filepath, usecols=[1, 2])
+    assert written["Relative Measurement"].tolist() == [np.inf, 0.5]  # "inf" as written by to_excel
+    pd.testing.assert_series_equal(written["Measured at"], df["Measured at"], check_dtype=False)
+
+
+def test_smiles_grid_pages_reference_deduplicated_image_files(tmp_path):
+    pytest.importorskip("rdkit")
+    pytest.importorskip("altair")
+
+    df = pd.DataFrame(
+        {
+            "smiles": ["CCO", "OCC", "c1ccccc1", "CCN", "invalid"],
+            "ID": ["E1", "E2", "E3", "E4", "E5"],
+            "Notes": ["not in the chart"] * 5,
+        }
+    )
+    image_dir = tmp_path / "images"
+    pages = smiles_grid_pages(df, str(image_dir), page_size=3, tooltip_cols=["ID"], image_url_prefix="images")
+
+    assert len(pages) == 2
+    assert sorted(path.suffix for path in image_dir.iterdir()) == [".png"] * 3
+    first_page = pages[0].data
+    assert list(first_page.columns) == ["ID", "_image_url", "_col", "_row"]
+    assert first_page["ID"].tolist() == ["E1", "E2", "E3"]
+    assert first_page["_image_url"][0] == first_page["_image_url"][1]
+    assert first_page["_image_url"][0].startswith("images/")
+    assert pages[1].data["ID"].tolist() == ["E4"]
+
+
+def test_upset_memberships_and_intersections():
+    df = pd.DataFrame(
+        {
+            "ID": ["S1", "S1", "S2", "S3", "S3", "S3", "S4"],
+            "Organism": ["E. coli", "S_aureus", "E. coli", "E. coli", "S_aureus", "E. coli", "S_aureus"],
+        }
+    )
+
+    dummies = get_upsetplot_df(df)
+    assert list(dummies.columns) == ["ID", "E coli", "Saureus"]
+    assert dummies.values.tolist() == [["S1", 1, 1], ["S2", 1, 0], ["S3", 1, 1], ["S4", 0, 1]]
+
+    intersections = get_upset_intersections(df)
+    assert intersections.to_dict("list") == {
+        "E coli": [1, 0, 1],
+        "Saureus": [0, 1, 1],
+        "count": [1, 1, 2],
+        "degree": [1, 1, 2],
+    }
+
+
+def test_prepare_visualization_flags_and_subgroups():
+    rows = []
+    # S1 is measured on two AsT plates, replicate 1 of S2 at the highest concentration is missing
+    for substance, plate, replicates in [("S1", "AsT1", [1, 2]), ("S1", "AsT2", [1, 2]), ("S2", "AsT1", [2])]:
+        for concentration, measurement in [(1.0, 90.0), (10.0, 20.0)]:
+            for replicate in replicates:
+                if substance == "S2" and concentration == 1.0:
+                    replicate = 1
+                rows.append(
+                    {
+                        "Internal ID": substance,
+                        "Organism": "E. coli",
+                        "AsT Barcode 384": plate,
+                        "Concentration": concentration,
+                        "Replicate": replicate,
+                        "Relative Measurement": measurement,
+                        "Z-Factor": 0.8,
+                    }
+                )
+    df = pd.DataFrame(rows)
+
+    prepared = prepare_visualization(df)
+    assert len(prepared) == len(df)
+    assert prepared["max_conc_below_threshold"].all()
+    assert not prepared["at_all_conc_bigger_50"].any()
+    assert prepared.loc[prepared["Internal ID"] == "S1", "Used Replicates"].eq(4).all()
+    assert prepared["AsT Plate Subgroup"].eq(0).all()
+
+
+def test_plateheatmaps_share_slim_data_and_leave_input_untouched():
+    from rda_toolbox.plot import plateheatmaps
+
+    rows = []
+    for organism, barcode in [("E. coli", "P1"), ("S. aureus", "P2")]:
+        for row, substance in [("A", "Negative Control"), ("B", "Medium"), ("C", "S1")]:
+            rows.append(
+                {
+                    "ID": substance,
+                    "Organism": organism,
+                    "Barcode": barcode,
+                    "Replicate": 1,
+                    "Row_384": row,
+                    "Col_384": 1,
+                    "Measurement": 0.123,
+                    "Rawdata Filepath": "/very/long/path/to/the/rawfile.txt",
+                }
+            )
+    df = pd.DataFrame(rows)
+    original = df.copy()
+
+    spec = plateheatmaps(df).to_dict()
+    pd.testing.assert_frame_equal(df, original)
+    (dataset,) = spec["datasets"].values()  # one dataset for both organisms
+    assert len(dataset) == len(df)
+    assert set(dataset[0]) == {"ID", "Organism", "Barcode", "Replicate", "Row_384", "Col_384", "Measurement"}
+    assert dataset[0]["Measurement"] == 0.1
+
+
+def test_aggregate_lineplot_data_one_row_per_substance_and_concentration():
+    from rda_toolbox.plot import aggregate_lineplot_data
+
+    prepared = prepare_visualization(
+        pd.DataFrame(
+            {
+                "Internal ID": ["S1"] * 4,
+                "External ID": ["E1"] * 4,
+                "Organism": ["E. coli"] * 4,
+                "Dataset": ["D1"] * 4,
+                "AsT Barcode 384": ["AsT1"] * 4,
+                "Concentration": [1.0, 1.0, 10.0, 10.0],
+                "Replicate": [1, 2, 1, 2],
+                "Relative Measurement": [90.0, 100.0, 20.0, 30.0],
+                "Z-Factor": [0.8, 0.6, 0.8, 0.6],  # replicates on different plates
+            }
+        )
+    )
+    aggregated = aggregate_lineplot_data(prepared, replicates=True)
+    assert len(aggregated) == 2
+    assert aggregated["Min. Z-Factor"].tolist() == [0.6, 0.6]
+    assert "Z-Factor" not in aggregated.columns
+    assert aggregated["Mean Relative Measurement"].tolist() == [95.0, 25.0]
+    bounds = aggregated["Mean Relative Measurement"] + aggregated["Std. Relative Measurement"]
+    assert aggregated["uerror"].tolist() == bounds.tolist()
+    assert aggregated["Replicate Measurements"].tolist() == [[90.0, 100.0], [20.0, 30.0]]
+    assert "Relative Measurement" not in aggregate_lineplot_data(prepared).columns